@@ -0,0 +1,86 @@
+"""
+Micro-benchmarks comparing clone against duplicating a voice subgraph by a json round-trip, and
+against constructing it from scratch with init_custom or from a cached prototype. Run from the repository root with:
+    python -m benchmarks.bench_clone
+"""
+import timeit
+
+from noddb.clone import clone
+from noddb.json import JsonRegistry
+from noddb.node import Node, NodeArray
+from noddb.prototype import cache_prototype
+from noddb.std_value import InputFloat, OutputFloat
+
+
+class Oscillator(Node):
+    def init_custom(self):
+        InputFloat(self, 'frequency', 440.0)
+        InputFloat(self, 'detune')
+        OutputFloat(self, 'out')
+
+
+class Voice(Node):
+    def init_custom(self):
+        InputFloat(self, 'gain', 1.0)
+        OutputFloat(self, 'out')
+        oscillators = NodeArray(self, 'oscillators')
+        for _ in range(4):
+            Oscillator(oscillators)
+
+
+@cache_prototype
+class CachedVoice(Voice):
+    pass
+
+
+def json_duplicate(registry, template):
+    exported = registry.export_json(template)
+    exported['nodes'] = {'voice': exported['nodes'][template.name]}
+    exported['values'] = {
+        'voice' + path[len(template.name):]: value for path, value in exported['values'].items()
+    }
+    exported['sources'] = {
+        'voice' + dst[len(template.name):]: 'voice' + src[len(template.name):]
+        for dst, src in exported['sources'].items()
+    }
+    return registry.import_json(exported)['voice']
+
+
+def report(name, statement, number):
+    seconds = min(timeit.repeat(statement, number=number, repeat=5))
+    print(f'{name:<40} {seconds / number * 1e3:8.3f} ms')
+
+
+def main():
+    count = 1000
+    registry = JsonRegistry([Voice, Oscillator])
+    template = Voice(None, 'template')
+    print(f'{count} voices, each with 4 oscillators')
+
+    def construct():
+        voices = NodeArray(None, 'voices')
+        for _ in range(count):
+            Voice(voices)
+
+    def construct_cached():
+        voices = NodeArray(None, 'voices')
+        for _ in range(count):
+            CachedVoice(voices)
+
+    def cloned():
+        voices = NodeArray(None, 'voices')
+        for _ in range(count):
+            clone(template, voices)
+
+    def json_round_trip():
+        for _ in range(count):
+            json_duplicate(registry, template)
+
+    report('json round-trip', json_round_trip, 1)
+    report('construct with init_custom', construct, 1)
+    report('construct with cache_prototype', construct_cached, 1)
+    report('clone', cloned, 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Micro-benchmarks comparing path parsing and lookup against the original regex-based
+implementation. Run from the repository root with:
+    python -m benchmarks.bench_path
+"""
+import re
+import timeit
+
+from noddb.node import Node, NodeArray
+from noddb.path import ParsedPath, _parse_path, path_to_node, split_path
+from noddb.std_value import InputFloat
+
+
+def regex_split_path(path):
+    path_items = re.split('[.[]', path)
+    if path_items and not path_items[0]:
+        path_items.pop(0)
+
+    def int_if_possible(name):
+        if name[0].isdigit():
+            return int(name.strip(']'))
+        return name
+
+    return [int_if_possible(name) for name in path_items]
+
+
+def walk_path_to_node(root, path):
+    names = regex_split_path(path)
+    node = root
+    while names:
+        name_or_index = names.pop(0)
+        node = node[name_or_index]
+    return node
+
+
+def build_tree(depth, width):
+    root = Node(None, 'root')
+    parent = root
+    for level in range(depth):
+        array = NodeArray(parent, f'level{level}')
+        for _ in range(width):
+            parent = Node(array)
+    InputFloat(parent, 'gain')
+    return root, parent['gain'].path()[len('root.'):]
+
+
+def report(name, statement, number):
+    seconds = min(timeit.repeat(statement, number=number, repeat=5))
+    print(f'{name:<40} {seconds / number * 1e6:8.3f} us')
+
+
+def main():
+    path = 'voices[12].filter.stages[3][1].cutoff'
+    number = 100000
+
+    print('Parsing:', path)
+    report('regex split_path', lambda: regex_split_path(path), number)
+    report('tokeniser, uncached', lambda: _parse_path.__wrapped__(path), number)
+    report('split_path, cached', lambda: split_path(path), number)
+
+    root, deep_path = build_tree(depth=20, width=4)
+    parsed = ParsedPath(deep_path)
+    number = 20000
+
+    print('Lookup:', deep_path)
+    report('regex walk', lambda: walk_path_to_node(root, deep_path), number)
+    report('path_to_node', lambda: path_to_node(root, deep_path), number)
+    report('ParsedPath.resolve', lambda: parsed.resolve(root), number)
+    report('path_to_node, dict root', lambda: path_to_node({'root': root}, 'root.' + deep_path), number)
+
+
+if __name__ == '__main__':
+    main()
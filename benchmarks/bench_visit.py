@@ -0,0 +1,94 @@
+"""
+Micro-benchmarks comparing the iterative visit against the original recursive visit, on wide
+and deep hierarchies. Run from the repository root with:
+    python -m benchmarks.bench_visit
+"""
+import sys
+import timeit
+
+from noddb.node import Node, NodeArray, walk
+from noddb.std_value import InputFloat, OutputFloat
+from noddb.visitor import Visitor
+
+
+def recursive_visit(node, visitor):
+    if type(node) is Node:
+        visitor.on_node_enter(node)
+        for child in node._child_dict.values():
+            recursive_visit(child, visitor)
+        visitor.on_node_exit(node)
+    elif type(node) is NodeArray:
+        visitor.on_node_array_enter(node)
+        for child in node._child_list:
+            recursive_visit(child, visitor)
+        visitor.on_node_array_exit(node)
+    else:
+        node.visit(visitor)
+
+
+class CountValues(Visitor):
+    def __init__(self):
+        self.count = 0
+
+    def on_input(self, value):
+        self.count += 1
+
+    def on_output(self, value):
+        self.count += 1
+
+
+class CountNodes(Visitor):
+    def __init__(self):
+        self.count = 0
+
+    def on_node_enter(self, node):
+        self.count += 1
+
+    def on_input(self, value):
+        self.count += 1
+
+
+def build_wide(depth, width):
+    root = Node(None, 'root')
+    parents = [root]
+    for _ in range(depth):
+        parents = [Node(parent, f'n{index}') for parent in parents for index in range(width)]
+    for parent in parents:
+        InputFloat(parent, 'gain')
+        OutputFloat(parent, 'level')
+    return root
+
+
+def build_deep(depth):
+    root = Node(None, 'root')
+    parent = root
+    for _ in range(depth):
+        parent = Node(NodeArray(parent, 'stages'))
+        InputFloat(parent, 'gain')
+    return root
+
+
+def report(name, statement, number):
+    seconds = min(timeit.repeat(statement, number=number, repeat=30))
+    print(f'{name:<40} {seconds / number * 1e3:8.3f} ms')
+
+
+def main():
+    wide = build_wide(depth=5, width=6)
+    print('Wide: 6^5 nodes with 2 values each')
+    report('recursive visit', lambda: recursive_visit(wide, CountValues()), 10)
+    report('visit', lambda: wide.visit(CountValues()), 10)
+    report('recursive visit, entering nodes', lambda: recursive_visit(wide, CountNodes()), 10)
+    report('visit, entering nodes', lambda: wide.visit(CountNodes()), 10)
+    report('walk', lambda: sum(1 for _ in walk(wide)), 10)
+
+    depth = sys.getrecursionlimit() // 4
+    deep = build_deep(depth)
+    print(f'Deep: {depth} levels of Node in NodeArray')
+    report('recursive visit', lambda: recursive_visit(deep, CountValues()), 100)
+    report('visit', lambda: deep.visit(CountValues()), 100)
+    report('walk', lambda: sum(1 for _ in walk(deep)), 100)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,414 @@
+import struct
+import sys
+from array import array
+from typing import Dict, Iterator, List, Tuple, Union
+
+from .node import Node, NodeArray, NodeBase
+from .registry import ExportException, ImportException, Registry
+from .value import InputValue, OutputValue, ValueBase
+from .visitor import Visitor
+
+_MAGIC = b'NODDB'
+_VERSION = 1
+
+# Container types are implicit in every type table
+_NODE_TYPE = 0
+_NODE_ARRAY_TYPE = 1
+
+# Names are stored as an index into the name table plus one, so that zero is unnamed
+_NO_NAME = 0
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+# Kinds of stored value, also used for the kind column of snapshots
+_SKIP = 0
+_INT = 1
+_FLOAT = 2
+_BOOL = 3
+_STR = 4
+_ARRAY = 5
+_VALUE_KINDS = {int: _INT, float: _FLOAT, bool: _BOOL, str: _STR, array: _ARRAY}
+
+
+class BinaryRegistry(Registry):
+    """
+    A registry for a compact binary format, using the same registration of custom node types as
+    JsonRegistry, e.g. BinaryRegistry([FooNode, BarNode, CustomNode]).
+
+    Rather than keying everything by path, the format is a sequence of sections, each a table or
+    a column of numbers packed with array.array. Columns of integers are narrowed to the smallest
+    type that holds all of their values:
+     - A type table and a table of distinct node names.
+     - The hierarchy as a pre-order list of type and name indices, with a child count for each
+       Node and NodeArray. As with json, custom nodes are leaves and their children are implied.
+     - Values in columns by type, i.e. int, float, bool, string and value array. Each value is
+       referred to by its index in the visit order of all values, including those created by
+       custom nodes, which is reproduced on import by visiting the imported nodes.
+     - Sources as two columns of value indices, for the inputs and the outputs they source.
+    """
+    def export_binary(self, nodes: Union[NodeBase, list]) -> bytes:
+        # Allow roots to be a single node or list of nodes
+        if isinstance(nodes, NodeBase):
+            nodes = [nodes]
+
+        export = _BinaryExportVisitor(self)
+        for node in nodes:
+            node.visit(export)
+
+        writer = _SectionWriter()
+        writer.write_strings(export.type_names)
+        writer.write_strings(export.names)
+        writer.write_ints(export.record_types)
+        writer.write_ints(export.record_names)
+        writer.write_ints(export.child_counts)
+        _ValueColumns.from_values(export.values).write(writer)
+
+        value_indices = {value: index for index, value in enumerate(export.values)}
+        inputs = array('I')
+        outputs = array('I')
+        for index, value in enumerate(export.values):
+            if value.is_input() and value.is_sourced():
+                source = value.source()
+                if source not in value_indices:
+                    raise ExportException(
+                        f'Cannot export source of "{value.path()}" from "{source.path()}" outside exported nodes'
+                    )
+                inputs.append(index)
+                outputs.append(value_indices[source])
+        writer.write_ints(inputs)
+        writer.write_ints(outputs)
+
+        return _MAGIC + struct.pack('<B', _VERSION) + writer.getvalue()
+
+    def import_binary(self, data: bytes) -> Dict[str, NodeBase]:
+        if len(data) <= len(_MAGIC) or data[:len(_MAGIC)] != _MAGIC:
+            raise ImportException('Expecting binary data to start with NODDB header')
+
+        version = data[len(_MAGIC)]
+        if version != _VERSION:
+            raise ImportException(f'Unsupported binary version {version}')
+
+        reader = _SectionReader(data, len(_MAGIC) + 1)
+        type_names = reader.read_strings()
+        names = reader.read_strings()
+        record_types = reader.read_array()
+        record_names = reader.read_array()
+        child_counts = reader.read_array()
+
+        nodes = self._import_hierarchy(type_names, names, record_types, record_names, child_counts)
+
+        values = []
+        collector = _ValueCollector(values)
+        for node in nodes.values():
+            node.visit(collector)
+
+        try:
+            _ValueColumns.read(reader).apply(values)
+
+            inputs = reader.read_array()
+            outputs = reader.read_array()
+            for input_index, output_index in zip(inputs, outputs):
+                values[input_index].set_source(values[output_index])
+        except IndexError:
+            raise ImportException('Binary values do not match the imported nodes')
+
+        return nodes
+
+    def _import_hierarchy(self, type_names, names, record_types, record_names, child_counts):
+        type_classes = [Node, NodeArray]
+        for typename in type_names[2:]:
+            if typename not in self.type_dict:
+                raise ImportException(f"Unexpected node type '{typename}' during import")
+            type_classes.append(self.type_dict[typename])
+
+        # Stack of containers being populated, each with a count of children still to create
+        nodes = {}
+        stack = []
+        next_count = iter(child_counts)
+        try:
+            for type_index, name_index in zip(record_types, record_names):
+                parent = stack[-1][0] if stack else None
+                name = names[name_index - 1] if name_index != _NO_NAME else None
+                node = type_classes[type_index](parent, name)
+                if parent:
+                    stack[-1][1] -= 1
+                else:
+                    nodes[name] = node
+
+                if type_index in (_NODE_TYPE, _NODE_ARRAY_TYPE):
+                    stack.append([node, next(next_count)])
+
+                while stack and stack[-1][1] == 0:
+                    stack.pop()
+        except (IndexError, StopIteration):
+            # Type or name indices out of range, or fewer child counts than containers
+            raise ImportException('Binary hierarchy is corrupt')
+
+        if stack or len(record_types) != len(record_names):
+            raise ImportException('Binary hierarchy is corrupt')
+        return nodes
+
+
+class _BinaryExportVisitor(Visitor):
+    """
+    Accumulates the type and name tables, the pre-order hierarchy records, and every value in
+    visit order. Like _ExportVisitor, descendants of custom nodes are not recorded.
+    """
+    def __init__(self, registry: BinaryRegistry):
+        self.registry = registry
+        self.type_names = ['Node', 'NodeArray']
+        self.names = []
+        self.record_types = array('I')
+        self.record_names = array('I')
+        self.child_counts = array('I')
+        self.values = []
+
+        self._type_indices = {name: index for index, name in enumerate(self.type_names)}
+        self._name_indices = {}
+
+        # Stack of index into child counts for each container being visited, or None when
+        # not storing descendants. The bottom entry is for roots, which are not counted.
+        self._count_stack = [None]
+        self._storing = [True]
+
+    def on_node_enter(self, node: Node):
+        if self._storing[-1]:
+            if node.is_custom():
+                if node.typename not in self.registry.type_dict:
+                    raise ExportException(f"Unexpected node type '{node.typename}' during export")
+                self.add_record(node, node.typename)
+                self._storing.append(False)
+            else:
+                self.add_record(node, 'Node')
+                self.push_container()
+        else:
+            self._storing.append(False)
+
+    def on_node_exit(self, node: Node):
+        self.pop_container()
+
+    def on_node_array_enter(self, node: NodeArray):
+        if self._storing[-1]:
+            self.add_record(node, 'NodeArray')
+            self.push_container()
+        else:
+            self._storing.append(False)
+
+    def on_node_array_exit(self, node: NodeArray):
+        self.pop_container()
+
+    def on_input(self, value: InputValue):
+        self.add_value(value, 'input')
+
+    def on_output(self, value: OutputValue):
+        self.add_value(value, 'output')
+
+    def add_value(self, value: ValueBase, kind: str):
+        if self._storing[-1]:
+            if value.typename not in self.registry.type_dict:
+                raise ExportException(f"Unexpected {kind} value type '{value.typename}' during export")
+            self.add_record(value, value.typename)
+        self.values.append(value)
+
+    def add_record(self, node: NodeBase, typename: str):
+        if typename not in self._type_indices:
+            self._type_indices[typename] = len(self.type_names)
+            self.type_names.append(typename)
+        self.record_types.append(self._type_indices[typename])
+
+        # Array elements are not named, their names are derived from their index
+        parent_count = self._count_stack[-1]
+        if parent_count is not None and isinstance(node.parent, NodeArray):
+            self.record_names.append(_NO_NAME)
+        else:
+            if node.name not in self._name_indices:
+                self.names.append(node.name)
+                self._name_indices[node.name] = len(self.names)
+            self.record_names.append(self._name_indices[node.name])
+
+        if parent_count is not None:
+            self.child_counts[parent_count] += 1
+
+    def push_container(self):
+        self._count_stack.append(len(self.child_counts))
+        self.child_counts.append(0)
+        self._storing.append(True)
+
+    def pop_container(self):
+        if self._storing.pop():
+            self._count_stack.pop()
+
+
+class _ValueCollector(Visitor):
+    """
+    Collects every value in visit order, including those under custom nodes.
+    """
+    def __init__(self, values: list):
+        self.values = values
+
+    def on_input(self, value: InputValue):
+        self.values.append(value)
+
+    def on_output(self, value: OutputValue):
+        self.values.append(value)
+
+
+def _stored_values(values: List[ValueBase], exception: type, action: str) -> Iterator[Tuple[int, int, object]]:
+    """
+    The index, kind and stored value of each value that can be stored in 64-bit columns, skipping
+    sourced inputs, as their values come from their sources.
+    :param values: Values to store
+    :param exception: Type of exception to raise for a value that cannot be stored
+    :param action: What the values are stored for in exception messages, e.g. 'export'
+    :return: Iterator of index, kind and value
+    """
+    for index, value in enumerate(values):
+        if value.is_input() and value.is_sourced():
+            continue
+
+        stored = value.value()
+        kind = _VALUE_KINDS.get(type(stored))
+        if kind is None:
+            raise exception(f"Unsupported value type '{type(stored).__name__}' of \"{value.path()}\" during {action}")
+        if kind == _INT and not _INT64_MIN <= stored <= _INT64_MAX:
+            raise exception(f'Cannot {action} "{value.path()}", {stored} does not fit in 64 bits')
+        yield index, kind, stored
+
+
+class _ValueColumns:
+    """
+    Values grouped into typed columns, each with a column of the value indices they belong to.
+    Sourced inputs are skipped, as their values come from their sources.
+    """
+    def __init__(self):
+        self.int_indices, self.ints = array('I'), array('q')
+        self.float_indices, self.floats = array('I'), array('d')
+        self.bool_indices, self.bools = array('I'), array('B')
+        self.str_indices, self.strs = array('I'), []
+        self.array_indices, self.arrays = array('I'), []
+
+    @classmethod
+    def from_values(cls, values: List[ValueBase]):
+        columns = cls()
+        kind_columns = {
+            _INT: (columns.int_indices, columns.ints),
+            _FLOAT: (columns.float_indices, columns.floats),
+            _BOOL: (columns.bool_indices, columns.bools),
+            _STR: (columns.str_indices, columns.strs),
+            _ARRAY: (columns.array_indices, columns.arrays)
+        }
+        for index, kind, stored in _stored_values(values, ExportException, 'export'):
+            indices, column = kind_columns[kind]
+            indices.append(index)
+            column.append(stored)
+        return columns
+
+    def write(self, writer):
+        writer.write_ints(self.int_indices)
+        writer.write_ints(self.ints, signed=True)
+        writer.write_ints(self.float_indices)
+        writer.write_array(self.floats)
+        writer.write_ints(self.bool_indices)
+        writer.write_array(self.bools)
+        writer.write_ints(self.str_indices)
+        writer.write_strings(self.strs)
+        writer.write_ints(self.array_indices)
+        for stored in self.arrays:
+            writer.write_array(stored)
+
+    @classmethod
+    def read(cls, reader):
+        columns = cls()
+        columns.int_indices = reader.read_array()
+        columns.ints = reader.read_array()
+        columns.float_indices = reader.read_array()
+        columns.floats = reader.read_array()
+        columns.bool_indices = reader.read_array()
+        columns.bools = reader.read_array()
+        columns.str_indices = reader.read_array()
+        columns.strs = reader.read_strings()
+        columns.array_indices = reader.read_array()
+        columns.arrays = [reader.read_array() for _ in columns.array_indices]
+        return columns
+
+    def apply(self, values: List[ValueBase]):
+        for index, stored in zip(self.int_indices, self.ints):
+            values[index].set_value(stored)
+        for index, stored in zip(self.float_indices, self.floats):
+            values[index].set_value(stored)
+        for index, stored in zip(self.bool_indices, self.bools):
+            values[index].set_value(bool(stored))
+        for index, stored in zip(self.str_indices, self.strs):
+            values[index].set_value(stored)
+        for index, stored in zip(self.array_indices, self.arrays):
+            values[index].set_value(stored)
+
+
+class _SectionWriter:
+    """
+    Writes sections, each a typecode, a little-endian u32 count and then the packed data.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write_array(self, values: array):
+        if sys.byteorder == 'big':
+            values = array(values.typecode, values)
+            values.byteswap()
+        self._chunks.append(struct.pack('<cI', values.typecode.encode('ascii'), len(values)))
+        self._chunks.append(values.tobytes())
+
+    def write_ints(self, values, signed: bool = False):
+        # Narrow to the smallest integer type holding every value
+        low = min(values, default=0)
+        high = max(values, default=0)
+        for typecode in 'bhiq' if signed else 'BHIQ':
+            bits = array(typecode).itemsize * 8
+            if signed and -(1 << (bits - 1)) <= low and high < (1 << (bits - 1)):
+                break
+            if not signed and high < (1 << bits):
+                break
+        self.write_array(array(typecode, values))
+
+    def write_strings(self, strings: List[str]):
+        encoded = [string.encode('utf-8') for string in strings]
+        self.write_ints([len(data) for data in encoded])
+        self._chunks.extend(encoded)
+
+    def getvalue(self) -> bytes:
+        return b''.join(self._chunks)
+
+
+class _SectionReader:
+    """
+    Reads sections written by _SectionWriter from bytes, starting from an offset.
+    """
+    def __init__(self, data: bytes, offset: int):
+        self._data = memoryview(data)
+        self._offset = offset
+
+    def read_array(self) -> array:
+        typecode, count = struct.unpack('<cI', self._take(5))
+        try:
+            values = array(typecode.decode('ascii'))
+        except (UnicodeDecodeError, ValueError):
+            raise ImportException(f'Binary data contains invalid typecode {typecode}')
+        values.frombytes(self._take(count * values.itemsize))
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values
+
+    def read_strings(self) -> List[str]:
+        lengths = self.read_array()
+        try:
+            return [bytes(self._take(length)).decode('utf-8') for length in lengths]
+        except UnicodeDecodeError:
+            raise ImportException('Binary data contains invalid strings')
+
+    def _take(self, size: int) -> memoryview:
+        if self._offset + size > len(self._data):
+            raise ImportException('Binary data is truncated')
+        data = self._data[self._offset:self._offset + size]
+        self._offset += size
+        return data
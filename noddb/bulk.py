@@ -0,0 +1,98 @@
+from typing import Dict, Iterable, Tuple, Union
+
+from .node import Node, NodeBase
+from .observer import _notified_observers
+from .path import path_to_node
+from .value import InputValue, OutputValue, ValueBase, ValueException
+from .value_array import ValueArray, ValueArrayElement
+
+
+def set_values(root: Union[Node, dict], values: Dict[str, object]) -> None:
+    """
+    Set many values by path at once, equivalent to calling path_to_node(root, path).set_value
+    for each, except that every path and value is checked before any value is set. If any
+    path is missing or any value mismatched, an exception is raised and no values are changed.
+    Paths may also be elements of value arrays, e.g. 'foo.bar[3]', which are set with
+    set_element after the whole values, so may not be set along with their whole array.
+    :param root: Node or dict at root of paths, as for path_to_node
+    :param values: Dictionary of paths to the value to set at each path
+    """
+    nodes = []
+    elements = []
+    for path, value in values.items():
+        node = path_to_node(root, path)
+        if isinstance(node, ValueArrayElement):
+            array_value = node._array_value
+            elements.append((array_value, node._index, array_value._checked_element(node._index, value)))
+        elif isinstance(node, ValueBase):
+            nodes.append((node, value))
+        else:
+            raise ValueException(f'Cannot set "{path}" as it is not a value')
+
+    whole_arrays = {node for node, _ in nodes if isinstance(node, ValueArray)}
+    for array_value, index, _ in elements:
+        if array_value in whole_arrays:
+            raise ValueException(f'Cannot set "{array_value.path()}[{index}]" along with the whole array')
+    set_values_by_node(nodes)
+
+    for array_value, index, value in elements:
+        array_value._store_element(index, value)
+
+
+def set_values_by_node(values: Iterable[Tuple[ValueBase, object]]) -> None:
+    """
+    Set many values at once, checking them all before any are set, so that either all values are
+    set or, if an exception is raised, none are. Observers are notified of all the changes in a
+    single on_set_values callback.
+    :param values: Pairs of each value node and the value to set it to
+    """
+    checked = [(node, node._checked_value(value)) for node, value in values]
+
+    changes = []
+    for node, value in checked:
+        changes.append((node, node._value))
+        node._store_value(value)
+
+    if changes:
+        for observer in _notified_observers():
+            observer.on_set_values(changes)
+
+
+def connect_many(connections: Iterable[Tuple[OutputValue, InputValue]]) -> None:
+    """
+    Source many inputs from outputs at once, equivalent to output >> input for each, except
+    that every connection is checked before any are made. If any connection is invalid, an
+    exception is raised and no inputs are connected. Observers are notified of all the
+    connections in a single on_set_sources callback, preceded by on_set_values for any inputs
+    whose values were overwritten by push-mode outputs.
+    :param connections: Pairs of each output and the input to source from it
+    """
+    connections = list(connections)
+    inputs = {}
+    for output, input_value in connections:
+        if not isinstance(input_value, InputValue):
+            raise ValueException(f'Cannot source non-input "{input_value.path()}" from "{output.path()}"')
+        input_value._check_source(output)
+        if input_value in inputs:
+            raise ValueException(
+                'Cannot source "{}" from "{}" as already connected to "{}"'.format(
+                    input_value.path(),
+                    output.path(),
+                    inputs[input_value].path()
+                )
+            )
+        inputs[input_value] = output
+
+    changes = []
+    for output, input_value in connections:
+        old_value = input_value._value
+        input_value._connect(output)
+        if input_value._value is not old_value:
+            changes.append((input_value, old_value))
+
+    if connections:
+        NodeBase._topology_revision += 1
+        for observer in _notified_observers():
+            if changes:
+                observer.on_set_values(changes)
+            observer.on_set_sources(list(inputs))
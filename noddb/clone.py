@@ -0,0 +1,233 @@
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from .bulk import connect_many
+from .node import Node, NodeArray, NodeBase, NodeContainer, NodeException
+from .value import InputValue, OutputValue, ValueBase
+
+# Slots set by clone for the new position of each copy in the hierarchy and graph, rather than
+# copied from the original
+_STRUCTURE_SLOTS = frozenset((
+    '_name', '_parent', '_root', '_path', '_path_parts', '_path_index', '_type_index',
+    '_child_dict', '_child_list', '_value', '_dependents', '_source', '_lazy', '__dict__', '__weakref__'
+))
+
+# Slots of the standard node classes that never refer to other nodes
+_STANDARD_SLOTS = frozenset(('_push',))
+
+# Types of attribute that are copied, so that copies do not share them with the original
+_MUTABLE_TYPES = (dict, list, set)
+
+# Kinds of node, determining how each is copied, with flags for whether instances have a
+# __dict__, whether they have any custom attributes that may refer to other nodes, and whether
+# they are lazily imported containers
+_LEAF = 0
+_VALUE = 1
+_INPUT = 2
+_OUTPUT = 3
+_NODE = 4
+_NODE_ARRAY = 5
+_HAS_DICT = 8
+_HAS_ATTRIBUTES = 16
+_LAZY = 32
+_KIND_MASK = 7
+
+# The slots to copy as they are and the kind of each node class
+_class_infos: Dict[type, Tuple[Tuple[str, ...], int]] = {}
+
+_UNSET = object()
+
+
+def clone(node: NodeBase, new_parent: Optional[NodeContainer], name: Optional[str] = None) -> NodeBase:
+    """
+    Copy a node and all its descendants under a new parent, much faster than exporting and
+    importing json. The structure and values are copied directly, without parsing paths or
+    calling init_custom. Inputs sourced from outputs in the subtree are connected to the copies
+    of those outputs, whereas inputs sourced from outside the subtree are connected to the same
+    outputs as the originals.
+
+    Any other slots and attributes of custom nodes are copied as they are, except those that refer
+    directly to nodes in the subtree, which refer to their copies, e.g. self.out for an output
+    created in init_custom. Dicts, lists and sets are shallow copied, so that e.g. adding to
+    self.args of a copy does not change the original, although their contents are shared. Lazily
+    imported containers are created in full before copying.
+    :param node: Root of subtree to copy
+    :param new_parent: Container to add the copy to, or None for a new root
+    :param name: Name of the copy, which must be None if the new parent is a NodeArray
+    :return: Copy of node
+    """
+    if new_parent is None and not name:
+        raise NodeException('Unparented leaf nodes must be named')
+
+    # Copy the subtree detached from the hierarchy, so that it is attached in one step, and an
+    # exception part way through leaves nothing changed
+    top, kind = _copy_node(node, name, None, None)
+    root = top if new_parent is None else new_parent._root
+    top._root = root
+    copies = {node: top}
+    with_attributes = []
+    inputs = []
+    stack = [(node, top, kind)]
+    while stack:
+        original, copy, kind = stack.pop()
+        if kind & _HAS_ATTRIBUTES:
+            with_attributes.append(copy)
+        kind &= _KIND_MASK
+
+        if kind == _INPUT:
+            if original._source is not None:
+                inputs.append(original)
+        elif kind == _NODE or kind == _NODE_ARRAY:
+            _copy_children(original, copy, kind, root, copies, stack)
+
+    _remap_attributes(with_attributes, copies)
+    if new_parent is not None:
+        top._attach(new_parent)
+    connect_many([(copies.get(original._source, original._source), copies[original]) for original in inputs])
+    return top
+
+
+def _remap_attributes(with_attributes: List[NodeBase], copies: Dict[NodeBase, NodeBase]):
+    """
+    Make copies of custom nodes refer to the copies of their children rather than the originals.
+    """
+    for copy in with_attributes:
+        for key, value in _attributes(copy):
+            if isinstance(value, NodeBase) and value in copies:
+                setattr(copy, key, copies[value])
+
+
+def _copy_children(original: NodeContainer, copy: NodeContainer, kind: int, root: NodeBase,
+                   copies: Dict[NodeBase, NodeBase], stack: List[Tuple[NodeBase, NodeBase, int]]):
+    """
+    Copy the children of a Node or NodeArray, adding each to the stack to copy its descendants.
+    Lazily imported children of the original are created first by accessing them.
+    """
+    for child in original.children:
+        child_copy, child_kind = _copy_node(child, child._name, copy, root)
+        if kind == _NODE:
+            copy._child_dict[child._name] = child_copy
+        else:
+            copy._child_list.append(child_copy)
+        copies[child] = child_copy
+        stack.append((child, child_copy, child_kind))
+
+
+def _copy_node(original: NodeBase, name: Optional[str], parent: Optional[NodeContainer],
+               root: Optional[NodeBase]) -> Tuple[NodeBase, int]:
+    node_class = type(original)
+    info = _class_infos.get(node_class) or _class_info(node_class)
+    slots, kind = info
+    copy = node_class.__new__(node_class)
+    for slot in slots:
+        value = getattr(original, slot, _UNSET)
+        if value is not _UNSET:
+            setattr(copy, slot, _copied_attribute(value))
+    if kind & _HAS_DICT and original.__dict__:
+        _copy_dict(original, copy)
+
+    copy._name = name
+    copy._parent = parent
+    copy._root = root
+    copy._path = None
+    copy._path_parts = None
+    copy._path_index = None
+    copy._type_index = None
+
+    if kind & _LAZY:
+        # The children of the copy are copied from the original rather than imported
+        copy._lazy = None
+
+    copy_kind = kind & _KIND_MASK
+    if copy_kind == _NODE:
+        copy._child_dict = {}
+    elif copy_kind == _NODE_ARRAY:
+        copy._child_list = []
+    elif copy_kind != _LEAF:
+        value = original._value
+        copy._value = array(value.typecode, value) if isinstance(value, array) else value
+        if copy_kind == _OUTPUT:
+            copy._dependents = None
+        elif copy_kind == _INPUT:
+            copy._source = None
+    return copy, kind
+
+
+def _copied_attribute(value):
+    """
+    A shallow copy of a dict, list or set attribute, or any other attribute as it is.
+    """
+    return value.copy() if isinstance(value, _MUTABLE_TYPES) else value
+
+
+def _copy_dict(original: NodeBase, copy: NodeBase):
+    """
+    Copy the custom attributes in the __dict__ of a node, shallow copying those that are mutable.
+    """
+    attributes = copy.__dict__
+    attributes.update(original.__dict__)
+    for key, value in attributes.items():
+        if isinstance(value, _MUTABLE_TYPES):
+            attributes[key] = value.copy()
+
+
+def _class_info(node_class: type) -> Tuple[Tuple[str, ...], int]:
+    """
+    The slots to copy as they are for a node class, and the kind of node it is.
+    """
+    info = _class_infos.get(node_class)
+    if info is None:
+        names = []
+        all_slots = set()
+        for base in node_class.__mro__:
+            base_slots = base.__dict__.get('__slots__', ())
+            if isinstance(base_slots, str):
+                base_slots = (base_slots,)
+            all_slots.update(base_slots)
+            names.extend(slot for slot in base_slots if slot not in _STRUCTURE_SLOTS and slot not in names)
+
+        kind = _classify(node_class)
+
+        # Instances have a __dict__ unless every class declares __slots__
+        if any('__slots__' not in base.__dict__ for base in node_class.__mro__[:-1]):
+            kind |= _HAS_DICT | _HAS_ATTRIBUTES
+        if any(name not in _STANDARD_SLOTS for name in names):
+            kind |= _HAS_ATTRIBUTES
+        if '_lazy' in all_slots:
+            kind |= _LAZY
+        info = _class_infos[node_class] = (tuple(names), kind)
+    return info
+
+
+def _classify(node_class: type) -> int:
+    """
+    The kind of node a class is, without flags.
+    """
+    if issubclass(node_class, InputValue):
+        return _INPUT
+    if issubclass(node_class, OutputValue):
+        return _OUTPUT
+    if issubclass(node_class, ValueBase):
+        return _VALUE
+    if issubclass(node_class, Node):
+        return _NODE
+    if issubclass(node_class, NodeArray):
+        return _NODE_ARRAY
+    if not issubclass(node_class, NodeContainer):
+        return _LEAF
+    raise NodeException(f'Cannot clone nodes of container type {node_class.__name__}')
+
+
+def _attributes(node: NodeBase) -> List[Tuple[str, object]]:
+    """
+    The names and values of the custom attributes and slots of a node.
+    """
+    node_class = type(node)
+    slots, kind = _class_infos.get(node_class) or _class_info(node_class)
+    attributes = list(node.__dict__.items()) if kind & _HAS_DICT else []
+    for slot in slots:
+        if slot not in _STANDARD_SLOTS:
+            value = getattr(node, slot, _UNSET)
+            if value is not _UNSET:
+                attributes.append((slot, value))
+    return attributes
@@ -0,0 +1,496 @@
+import asyncio
+import inspect
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor, wait
+from typing import Dict, List, Sequence, Union
+
+from .node import Node, NodeArray, NodeBase
+from .observer import Observer, add_observer, remove_observer
+from .value import InputValue, OutputValue, ValueBase
+from .visitor import Visitor
+
+
+class EvaluatorException(Exception):
+    """
+    Raised when the custom nodes under the evaluated roots cannot be put in a dependency
+    order, which happens when the source connections between them form a cycle.
+    """
+    pass
+
+
+class Evaluator:
+    """
+    The evaluator calls evaluate() on every custom node found under a set of roots, ordering the
+    calls so that a node is only evaluated after all the nodes that its inputs are sourced from.
+
+    Dependencies are derived from input sources: if an input owned by custom node B is sourced
+    from an output owned by custom node A, then A is evaluated before B. The owner of a value is
+    its nearest custom node ancestor, so values under plain Node or NodeArray containers that are
+    not inside a custom node do not introduce dependencies. Outputs owned by nodes outside the
+    roots are treated as external and are assumed to already hold their value.
+
+    Nodes are evaluated level by level, where each level holds nodes that are independent of each
+    other. Within a level, nodes are grouped by type and passed to their class's evaluate_batch(),
+    which by default calls evaluate() on each node but may be overridden to process all of them
+    at once.
+
+    The order is computed once and cached. It is only recomputed when the hierarchy changes or an
+    input has its source set or cleared, so repeated calls to run() are a single linear pass:
+        evaluator = Evaluator([root, other_root])
+        while running:
+            evaluator.run()
+
+    Given an executor from concurrent.futures, each level is split into chunks of at most
+    chunk_size nodes of the same type, which are evaluated concurrently before moving on to the
+    next level. With a ThreadPoolExecutor the nodes are evaluated in place, which suits nodes
+    that release the GIL, e.g. in numpy. With a ProcessPoolExecutor the values are marshalled
+    instead: the current value of each input directly under a node is sent to a worker, which
+    evaluates a detached instance of the node type and returns the values of its outputs to be
+    set on the original node. The node type must then be importable by the workers, and its
+    evaluation may only depend on its own direct input values. Either way, the results do not
+    depend on scheduling, as nodes within a level never depend on each other.
+
+    In incremental mode the evaluator observes changes to values and sources, and
+    evaluate_dirty() only evaluates the custom nodes affected since the last evaluation, i.e.
+    the owners of changed inputs and the consumers of changed outputs, along with every node
+    downstream of them. Incremental evaluators remain registered as observers until closed:
+        with Evaluator(root, incremental=True) as evaluator:
+            root['a'].set_value(2)
+            evaluator.evaluate_dirty()
+    """
+    def __init__(
+        self,
+        roots: Union[NodeBase, list],
+        incremental: bool = False,
+        executor: Executor = None,
+        chunk_size: int = 64
+    ):
+        # Allow roots to be a single node or list of nodes
+        if isinstance(roots, NodeBase):
+            roots = [roots]
+
+        if chunk_size < 1:
+            raise EvaluatorException(f'Chunk size must be at least 1, found {chunk_size}')
+
+        self._roots = list(roots)
+        self._executor = executor
+        self._chunk_size = chunk_size
+        self._revision = None
+        self._levels = []
+        self._order = []
+        self._order_index = {}
+        self._level_index = {}
+        self._successors = {}
+        self._predecessors = {}
+
+        # Incremental state, values changed since the last evaluation and newly planned nodes
+        self._tracker = None
+        self._changed_values = {}
+        self._dirty_nodes = {}
+        self._evaluating = False
+        if incremental:
+            self._tracker = _DirtyTracker(self)
+            add_observer(self._tracker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop observing changes if incremental, after which evaluate_dirty() is unavailable.
+        """
+        if self._tracker:
+            remove_observer(self._tracker)
+            self._tracker = None
+
+    @property
+    def incremental(self) -> bool:
+        return self._tracker is not None
+
+    @property
+    def roots(self) -> List[NodeBase]:
+        return self._roots
+
+    @property
+    def order(self) -> List[Node]:
+        """
+        :return: All custom nodes under the roots, in an order in which they may be evaluated
+        """
+        self._plan_if_changed()
+        return self._order
+
+    @property
+    def levels(self) -> List[List[Node]]:
+        """
+        Custom nodes grouped by dependency depth. Nodes in the same level do not depend on each
+        other, and only depend on nodes in earlier levels.
+        :return: List of levels, each a list of nodes
+        """
+        self._plan_if_changed()
+        return self._levels
+
+    def run(self, *args, **kwargs) -> None:
+        """
+        Evaluate all custom nodes in dependency order.
+        :param args: Arguments passed through to each node's evaluate()
+        :param kwargs: Keyword arguments passed through to each node's evaluate()
+        """
+        levels = self.levels
+        self._clear_dirty()
+        self._evaluate_levels(levels, args, kwargs)
+
+    def evaluate_dirty(self, *args, **kwargs) -> None:
+        """
+        Evaluate only the custom nodes affected by changes since the last evaluation, in
+        dependency order. Only available in incremental mode.
+        :param args: Arguments passed through to each node's evaluate()
+        :param kwargs: Keyword arguments passed through to each node's evaluate()
+        """
+        if not self._tracker:
+            raise EvaluatorException('evaluate_dirty requires an incremental evaluator')
+
+        self._plan_if_changed()
+        levels = self._affected_levels()
+        self._clear_dirty()
+        self._evaluate_levels(levels, args, kwargs)
+
+    def _evaluate_levels(self, levels, args, kwargs):
+        # Changes made by the nodes themselves are downstream of them, so are not tracked
+        self._evaluating = True
+        try:
+            for level in levels:
+                if self._executor:
+                    self._evaluate_level_concurrently(level, args, kwargs)
+                else:
+                    for node_type, nodes in _group_by_type(level).items():
+                        node_type.evaluate_batch(nodes, *args, **kwargs)
+        finally:
+            self._evaluating = False
+
+    def _evaluate_level_concurrently(self, level, args, kwargs):
+        marshal = isinstance(self._executor, ProcessPoolExecutor)
+        chunks = []
+        futures = []
+        for node_type, nodes in _group_by_type(level).items():
+            for start in range(0, len(nodes), self._chunk_size):
+                chunk = nodes[start:start + self._chunk_size]
+                chunks.append(chunk)
+                if marshal:
+                    inputs = [_input_values(node) for node in chunk]
+                    futures.append(self._executor.submit(_evaluate_detached, node_type, inputs, args, kwargs))
+                else:
+                    futures.append(self._executor.submit(node_type.evaluate_batch, chunk, *args, **kwargs))
+
+        # Wait for the whole level, then raise the first error in submission order, if any
+        wait(futures)
+        results = [future.result() for future in futures]
+
+        if marshal:
+            for chunk, outputs in zip(chunks, results):
+                for node, output_values in zip(chunk, outputs):
+                    for name, value in output_values.items():
+                        node[name].set_value(value)
+
+    def _clear_dirty(self):
+        self._changed_values.clear()
+        self._dirty_nodes.clear()
+
+    def _affected_levels(self) -> List[List[Node]]:
+        # Dirty nodes may have been removed since, e.g. by undo, and are no longer evaluated
+        seeds = {node: None for node in self._dirty_nodes if node in self._successors}
+        for value in self._changed_values:
+            # Changed outputs affect the owners of the inputs they feed
+            inputs = value.dependents() if value.is_output() else [value]
+            for input_value in inputs:
+                owner = _owner(input_value)
+                if owner in self._successors:
+                    seeds[owner] = None
+
+        # Everything downstream of a changed node is affected
+        affected = set(seeds)
+        pending = list(seeds)
+        while pending:
+            for successor in self._successors[pending.pop()]:
+                if successor not in affected:
+                    affected.add(successor)
+                    pending.append(successor)
+
+        levels = {}
+        for node in sorted(affected, key=self._order_index.__getitem__):
+            levels.setdefault(self._level_index[node], []).append(node)
+        return [levels[level] for level in sorted(levels)]
+
+    def _plan_if_changed(self):
+        if self._revision != NodeBase._topology_revision:
+            self._plan()
+            self._revision = NodeBase._topology_revision
+
+    def _plan(self):
+        collector = _DependencyVisitor()
+        for root in self._roots:
+            root.visit(collector)
+
+        # Resolve connections to node-to-node edges, ignoring duplicates and external outputs
+        nodes = collector.nodes
+        successors = {node: {} for node in nodes}
+        predecessors = {node: [] for node in nodes}
+        in_degree = {node: 0 for node in nodes}
+        for consumer, output in collector.sourced_inputs:
+            producer = collector.output_owners.get(output)
+            if producer is not None and consumer not in successors[producer]:
+                successors[producer][consumer] = None
+                predecessors[consumer].append(producer)
+                in_degree[consumer] += 1
+
+        levels = _topological_levels(nodes, successors, in_degree)
+        order = [node for level in levels for node in level]
+        _check_acyclic(nodes, order, in_degree)
+
+        # Nodes that have not been planned before have never been evaluated, whereas dirty nodes
+        # that are no longer planned have been removed
+        if self._tracker:
+            for node in order:
+                if node not in self._successors:
+                    self._dirty_nodes[node] = None
+            for node in [node for node in self._dirty_nodes if node not in successors]:
+                del self._dirty_nodes[node]
+
+        self._levels = levels
+        self._order = order
+        self._order_index = {node: index for index, node in enumerate(order)}
+        self._level_index = {node: index for index, level in enumerate(levels) for node in level}
+        self._successors = successors
+        self._predecessors = predecessors
+
+
+class AsyncEvaluator(Evaluator):
+    """
+    An evaluator for custom nodes that may declare evaluate() as a coroutine, e.g. to wait on
+    sockets, files or subprocesses. Rather than evaluating level by level, each node is scheduled
+    on the running event loop as soon as the nodes it depends on have finished, so slow nodes on
+    independent branches of the graph overlap:
+        evaluator = AsyncEvaluator(root)
+        await evaluator.run()
+
+    Nodes with a plain evaluate() are evaluated inline on the event loop. Nodes are always
+    evaluated individually, so evaluate_batch() is not used.
+    """
+    def __init__(self, roots: Union[NodeBase, list], incremental: bool = False):
+        super().__init__(roots, incremental)
+
+    async def run(self, *args, **kwargs) -> None:
+        """
+        Evaluate all custom nodes, each once its dependencies have been evaluated.
+        :param args: Arguments passed through to each node's evaluate()
+        :param kwargs: Keyword arguments passed through to each node's evaluate()
+        """
+        order = self.order
+        self._clear_dirty()
+        await self._evaluate_scheduled(order, args, kwargs)
+
+    async def evaluate_dirty(self, *args, **kwargs) -> None:
+        """
+        Evaluate only the custom nodes affected by changes since the last evaluation, each once
+        its dependencies have been evaluated. Only available in incremental mode.
+        :param args: Arguments passed through to each node's evaluate()
+        :param kwargs: Keyword arguments passed through to each node's evaluate()
+        """
+        if not self._tracker:
+            raise EvaluatorException('evaluate_dirty requires an incremental evaluator')
+
+        self._plan_if_changed()
+        nodes = [node for level in self._affected_levels() for node in level]
+        self._clear_dirty()
+        await self._evaluate_scheduled(nodes, args, kwargs)
+
+    async def _evaluate_scheduled(self, nodes, args, kwargs):
+        self._evaluating = True
+        tasks = {}
+        try:
+            # Nodes are in dependency order, so the tasks of their predecessors already exist
+            for node in nodes:
+                waits_for = [tasks[producer] for producer in self._predecessors[node] if producer in tasks]
+                tasks[node] = asyncio.ensure_future(_evaluate_after(node, waits_for, args, kwargs))
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            # Cancel anything outstanding and retrieve all results, before raising the first error
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self._evaluating = False
+
+
+async def _evaluate_after(node: Node, waits_for: list, args, kwargs):
+    for task in waits_for:
+        await task
+
+    result = node.evaluate(*args, **kwargs)
+    if inspect.isawaitable(result):
+        await result
+
+
+def gather_values(nodes: Sequence[Node], name: str, typecode: str = None) -> array:
+    """
+    Gather the values of a same-named int, float or bool value from each node into an array,
+    e.g. for use in evaluate_batch. The array supports the buffer protocol, so may be wrapped
+    without copying with numpy.frombuffer for vectorised processing.
+    :param nodes: Nodes to gather from
+    :param name: Name of value child in each node
+    :param typecode: array.array typecode, by default 'd' for floats and 'q' for ints and bools
+    :return: Array of values in the same order as the nodes
+    """
+    values = [node[name].value() for node in nodes]
+    if typecode is None:
+        typecode = 'd' if values and isinstance(values[0], float) else 'q'
+    return array(typecode, values)
+
+
+def scatter_values(nodes: Sequence[Node], name: str, values) -> None:
+    """
+    Set a same-named value in each node from a sequence, e.g. the results of evaluate_batch.
+    Elements are converted to the type of each value, so numpy arrays may be passed directly.
+    :param nodes: Nodes to set values in
+    :param name: Name of value child in each node
+    :param values: Sequence of values in the same order as the nodes
+    """
+    if hasattr(values, 'tolist'):
+        values = values.tolist()
+    for node, value in zip(nodes, values):
+        child = node[name]
+        child.set_value(type(child._value)(value))
+
+
+def _input_values(node: Node) -> Dict[str, object]:
+    return {child.name: child.value() for child in node.children if isinstance(child, InputValue)}
+
+
+def _output_values(node: Node) -> Dict[str, object]:
+    return {child.name: child.value() for child in node.children if isinstance(child, OutputValue)}
+
+
+def _evaluate_detached(node_type: type, inputs: List[Dict[str, object]], args, kwargs) -> List[Dict[str, object]]:
+    """
+    Evaluate unparented instances of a node type given the values of their inputs, in a worker
+    process, returning the values of their outputs.
+    """
+    nodes = []
+    for index, input_values in enumerate(inputs):
+        node = node_type(None, f'detached{index}')
+        for name, value in input_values.items():
+            node[name].set_value(value)
+        nodes.append(node)
+
+    node_type.evaluate_batch(nodes, *args, **kwargs)
+    return [_output_values(node) for node in nodes]
+
+
+def _group_by_type(nodes: List[Node]) -> Dict[type, List[Node]]:
+    groups = {}
+    for node in nodes:
+        groups.setdefault(type(node), []).append(node)
+    return groups
+
+
+def _owner(value: ValueBase) -> Node:
+    """
+    :return: The nearest custom node ancestor of a value, or None
+    """
+    node = value.parent
+    while node is not None and not (isinstance(node, Node) and node.is_custom()):
+        node = node.parent
+    return node
+
+
+def _topological_levels(nodes: List[Node], successors: Dict[Node, dict],
+                        in_degree: Dict[Node, int]) -> List[List[Node]]:
+    """
+    Kahn's algorithm, peeling off one level of independent nodes at a time. Each level is kept in
+    visit order so that the evaluation order is deterministic. Nodes in cycles are left out, with
+    a non-zero in-degree.
+    """
+    visit_index = {node: index for index, node in enumerate(nodes)}
+    levels = []
+    level = [node for node in nodes if in_degree[node] == 0]
+    while level:
+        levels.append(level)
+        next_level = []
+        for node in level:
+            for successor in successors[node]:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    next_level.append(successor)
+        next_level.sort(key=visit_index.__getitem__)
+        level = next_level
+    return levels
+
+
+def _check_acyclic(nodes: List[Node], order: List[Node], in_degree: Dict[Node, int]):
+    if len(order) != len(nodes):
+        cyclic = next(node for node in nodes if in_degree[node] > 0)
+        raise EvaluatorException(f'Cannot order evaluation, cycle detected involving "{cyclic.path()}"')
+
+
+class _DirtyTracker(Observer):
+    """
+    Records the values changed since an incremental evaluator last evaluated. Changes are only
+    resolved to dirty nodes on evaluation, so that many changes cost a single propagation.
+    """
+    def __init__(self, evaluator: Evaluator):
+        self.evaluator = evaluator
+
+    def on_set_value(self, value, old_value):
+        if not self.evaluator._evaluating:
+            self.evaluator._changed_values[value] = None
+
+    def on_set_element(self, value, index, old_element):
+        if not self.evaluator._evaluating:
+            self.evaluator._changed_values[value] = None
+
+    def on_set_source(self, value, old_source):
+        if not self.evaluator._evaluating:
+            self.evaluator._changed_values[value] = None
+
+
+class _DependencyVisitor(Visitor):
+    """
+    Collects custom nodes in visit order, along with the owning custom node of each output and
+    the sources of each input owned by a custom node.
+    """
+    def __init__(self):
+        self.nodes = []
+        self.output_owners: Dict[OutputValue, Node] = {}
+        self.sourced_inputs = []
+
+        # Stack of the nearest custom node ancestor, or None if outside any custom node
+        self._owner_stack = [None]
+
+    def on_node_enter(self, node: Node):
+        if node.is_custom():
+            self.nodes.append(node)
+            self._owner_stack.append(node)
+        else:
+            self._owner_stack.append(self._owner_stack[-1])
+
+    def on_node_exit(self, node: Node):
+        self._owner_stack.pop()
+
+    def on_node_array_enter(self, node: NodeArray):
+        self._owner_stack.append(self._owner_stack[-1])
+
+    def on_node_array_exit(self, node: NodeArray):
+        self._owner_stack.pop()
+
+    def on_input(self, value: InputValue):
+        owner = self._owner_stack[-1]
+        if owner is not None and value.is_sourced():
+            self.sourced_inputs.append((owner, value.source()))
+
+    def on_output(self, value: OutputValue):
+        owner = self._owner_stack[-1]
+        if owner is not None:
+            self.output_owners[value] = owner
@@ -0,0 +1,46 @@
+from typing import Dict, List, Union
+
+from .node import NodeBase, NodeContainer
+
+
+def type_index(root: NodeBase) -> Dict[str, Dict[NodeBase, None]]:
+    """
+    Get the index of typenames to the nodes of that type in the hierarchy under a root node,
+    including the root itself. Like the path index, this is built on first use and then kept up
+    to date as nodes are added to the hierarchy. Building the index creates any children of
+    lazily imported containers, so that it is complete.
+    :param root: Root node of hierarchy
+    :return: Dictionary of typenames to nodes of that type, each an ordered set as a dictionary
+    """
+    if root._type_index is None:
+        index = {}
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            index.setdefault(node.typename, {})[node] = None
+            if isinstance(node, NodeContainer):
+                stack.extend(reversed(node.children))
+        root._type_index = index
+    return root._type_index
+
+
+def nodes_of_type(root: NodeBase, node_type: Union[type, str], subclasses: bool = False) -> List[NodeBase]:
+    """
+    Get all nodes of a type in the hierarchy under a root node from its type index, without
+    walking the hierarchy. Nodes are in visit order when the index is built, followed by any
+    nodes added since in the order they were added.
+    :param root: Root node of hierarchy, or any node in it
+    :param node_type: Class or typename of nodes to find
+    :param subclasses: Also find nodes of classes derived from node_type
+    :return: List of nodes
+    """
+    index = type_index(root.root)
+    if not subclasses:
+        typename = node_type if isinstance(node_type, str) else node_type.__name__
+        return list(index.get(typename, ()))
+
+    nodes = []
+    for typed_nodes in index.values():
+        if typed_nodes and isinstance(next(iter(typed_nodes)), node_type):
+            nodes.extend(typed_nodes)
+    return nodes
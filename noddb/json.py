@@ -1,29 +1,20 @@
-from typing import List, Union
-
-from .node import Node, NodeArray, NodeBase
+from __future__ import annotations
+import json
+import re
+from array import array
+from typing import Dict, List, TextIO, Union
+
+from .bulk import connect_many, set_values
+from .node import Node, NodeArray, NodeBase, NodeContainer
+from .observer import Observer, _suppressed_notifications, add_observer, remove_observer
 from .path import path_to_node
-from .std_value import standard_value_types
-from .value import InputValue, OutputValue
-from .visitor import Visitor
-
-
-class ExportException(Exception):
-    """
-    Export exceptions are raised when unexpected data types are detected whilst traversing
-    the node hierarchy.
-    """
-    pass
-
-
-class ImportException(Exception):
-    """
-    Exception for unexpected types during import. If encountering this error, ensure that
-    your registry custom_nodes contains all the types you are expecting.
-    """
-    pass
+from .registry import ExportException, ImportException, Registry
+from .transaction import Transaction
+from .value import InputValue, OutputValue, ValueBase
+from .visitor import PRUNE, Visitor
 
 
-class JsonRegistry:
+class JsonRegistry(Registry):
     """
     The registry wraps up import and export functions. This is because an application requires
     a common set of registered node types. The registry always contains the standard input and
@@ -63,9 +54,15 @@ class JsonRegistry:
                 "root.c.d[1]": "application-state.ok"  // Second array bool is fed from app state
             }
         }
+
+    Registries can also track changes since a named checkpoint, so that a compact delta of
+    just the changed values and sources can be exported and later applied on top of a full
+    export, e.g. for frequent autosaves.
     """
     def __init__(self, custom_types: List[NodeBase] = []):
-        self.type_dict = {typ.__name__: typ for typ in custom_types + standard_value_types()}
+        super().__init__(custom_types)
+        # Change trackers keyed by checkpoint name
+        self._checkpoints: Dict[str, _DeltaTracker] = {}
 
     def export_json(self, nodes: Union[NodeBase, list]):
         # Allow roots to be a single node or list of nodes
@@ -77,30 +74,259 @@ class JsonRegistry:
             node.visit(export)
         return export.to_json()
 
-    def import_json(self, json_dict: dict) -> List[NodeBase]:
+    def export_json_stream(self, nodes: Union[NodeBase, list], fp: TextIO):
+        """
+        Export nodes as json text written incrementally to a file object, rather than building
+        a dictionary in memory. The hierarchy is visited once for each of the nodes, values and
+        sources sections, so memory use does not grow with the size of the graph. The result
+        is equivalent to json.dump(self.export_json(nodes), fp).
+        :param nodes: Root node or list of root nodes
+        :param fp: Text file object to write to
+        """
+        # Allow roots to be a single node or list of nodes
+        if isinstance(nodes, NodeBase):
+            nodes = [nodes]
+
+        fp.write('{"nodes": {')
+        export_nodes = _StreamNodesVisitor(self, fp)
+        for node in nodes:
+            node.visit(export_nodes)
+
+        fp.write('}, "values": {')
+        export_values = _StreamEntriesVisitor(fp, sources=False)
+        for node in nodes:
+            node.visit(export_values)
+
+        fp.write('}, "sources": {')
+        export_sources = _StreamEntriesVisitor(fp, sources=True)
+        for node in nodes:
+            node.visit(export_sources)
+        fp.write('}}')
+
+    def import_json(self, json_dict: dict, lazy: bool = False) -> List[NodeBase]:
+        """
+        Import nodes from a json dictionary, as returned by export_json.
+
+        In lazy mode only the root nodes are created up front. The children of each Node and
+        NodeArray container are created from the json the first time they are accessed, e.g. by
+        indexing, children, visiting or path_to_node, along with their values and sources. When
+        a value is created, the inputs it sources from or that are sourced from it are created
+        too, so connections are always complete between created values. Custom nodes are created
+        as a whole, as their children come from init_custom. Errors in the nodes section, such as
+        unregistered types, are only raised when the containing node is accessed.
+        :param json_dict: Dictionary with nodes, values and sources entries
+        :param lazy: Create children of containers on first access rather than immediately
+        :return: Dictionary of imported root nodes
+        """
         if not all(key in json_dict for key in ['nodes', 'values', 'sources']):
             raise ImportException('Expecting nodes, values and sources entries at root')
 
         if not all(type(value) == dict for value in json_dict.values()):
             raise ImportException('Expecting dict type for nodes, values and sources')
 
+        if lazy:
+            importer = _LazyImporter(self, json_dict['values'], json_dict['sources'])
+            importer.import_roots(json_dict['nodes'])
+            return importer.nodes
+
         # Recursively instantiate all nodes by type
         importer = _NodesImporter(self)
         importer.import_dict(json_dict['nodes'])
 
-        # Set values from keys in values dict
-        for path, value in json_dict['values'].items():
-            node = path_to_node(importer.nodes, path)
-            node.set_value(value)
+        # Set values from keys in values dict, checking them all before any are set
+        set_values(importer.nodes, json_dict['values'])
 
         # Connect values from keys in sources dict
-        for dst, src in json_dict['sources'].items():
-            src_value = path_to_node(importer.nodes, src)
-            dst_value = path_to_node(importer.nodes, dst)
-            dst_value << src_value
+        connect_many([
+            (path_to_node(importer.nodes, src), path_to_node(importer.nodes, dst))
+            for dst, src in json_dict['sources'].items()
+        ])
 
         return importer.nodes
 
+    def import_json_stream(self, fp: TextIO, chunk_size: int = 65536) -> List[NodeBase]:
+        """
+        Import nodes from json text read incrementally from a file object, rather than from a
+        dictionary parsed in memory. Nodes are created as the nodes section is read, and each
+        entry in the values and sources sections is applied as soon as it is read. Sections are
+        expected in the order nodes, values, sources, as written by export_json_stream. Values
+        and sources that appear before the nodes section are held back until the nodes exist.
+        :param fp: Text file object to read from
+        :param chunk_size: Number of characters to read from the file at a time
+        :return: Dictionary of imported root nodes
+        """
+        reader = _JsonStreamReader(fp, chunk_size)
+        importer = _NodesImporter(self)
+        sections = set()
+
+        # Values and sources read before the nodes section, keyed by section, until nodes exist
+        deferred = {'values': {}, 'sources': {}}
+
+        reader.begin_object()
+        while True:
+            section = reader.next_key()
+            if section is None:
+                break
+
+            if reader.peek() != '{':
+                raise ImportException('Expecting dict type for nodes, values and sources')
+            sections.add(section)
+
+            if section == 'nodes':
+                self._import_stream_nodes(reader, importer, deferred)
+                deferred = None
+            elif section in ('values', 'sources'):
+                self._import_stream_entries(reader, importer, section, deferred)
+            else:
+                reader.read_value()
+        reader.end()
+
+        if not all(key in sections for key in ['nodes', 'values', 'sources']):
+            raise ImportException('Expecting nodes, values and sources entries at root')
+
+        return importer.nodes
+
+    def _import_stream_nodes(self, reader: _JsonStreamReader, importer: _NodesImporter, deferred: dict):
+        importer.import_stream_dict(reader)
+        if deferred is not None:
+            for section, entries in deferred.items():
+                for path, value in entries.items():
+                    _apply_entry(importer.nodes, section, path, value)
+
+    def _import_stream_entries(self, reader: _JsonStreamReader, importer: _NodesImporter, section: str,
+                               deferred: dict):
+        reader.begin_object()
+        while True:
+            path = reader.next_key()
+            if path is None:
+                break
+            value = reader.read_value()
+            if deferred is not None:
+                deferred[section][path] = value
+            else:
+                _apply_entry(importer.nodes, section, path, value)
+
+    def checkpoint(self, name: str) -> None:
+        """
+        Start recording value and source changes under a named checkpoint, or restart recording
+        if the checkpoint already exists, e.g. after exporting a delta. The registry observes all
+        changes until the checkpoint is removed with remove_checkpoint.
+        :param name: Name of checkpoint
+        """
+        if name in self._checkpoints:
+            self._checkpoints[name].clear()
+        else:
+            tracker = _DeltaTracker()
+            add_observer(tracker)
+            self._checkpoints[name] = tracker
+
+    def remove_checkpoint(self, name: str) -> None:
+        """
+        Stop recording changes for a named checkpoint.
+        :param name: Name of checkpoint
+        """
+        remove_observer(self._checkpoint_tracker(name))
+        del self._checkpoints[name]
+
+    def export_delta(self, name: str) -> dict:
+        """
+        Export the values and sources that have changed since a checkpoint, in the same form as
+        the values and sources sections of export_json. Inputs disconnected since the checkpoint
+        have a None source along with their value. Only changes to values are recorded, so if
+        nodes have been added or removed since the checkpoint then an exception is raised, and a
+        full export is required instead.
+        :param name: Name of checkpoint
+        :return: Dictionary with values and sources entries
+        """
+        tracker = self._checkpoint_tracker(name)
+        if tracker.structure_changed:
+            raise ExportException(
+                f"Cannot export delta as nodes have been added or removed since checkpoint '{name}'"
+            )
+        values = {}
+        sources = {}
+        for value in tracker.sources:
+            source = value.source()
+            sources[value.path()] = source.path() if source else None
+        for value in list(tracker.values) + list(tracker.sources):
+            if not (value.is_input() and value.is_sourced()):
+                values[value.path()] = _json_value(value)
+        return {'values': values, 'sources': sources}
+
+    def apply_delta(self, nodes: Union[NodeBase, list, dict], delta: dict) -> None:
+        """
+        Apply a delta from export_delta to nodes, e.g. those just imported from a full export.
+        Changed sources are disconnected first, then values are set and sources reconnected.
+        Every path is resolved before anything is changed, and if the delta cannot be applied
+        then any changes already made are rolled back.
+        :param nodes: Root node, list of root nodes or dictionary of roots as from import_json
+        :param delta: Dictionary with values and sources entries
+        """
+        if not all(type(delta.get(key)) == dict for key in ['values', 'sources']):
+            raise ImportException('Expecting dict type for delta values and sources')
+
+        if isinstance(nodes, NodeBase):
+            nodes = [nodes]
+        if not isinstance(nodes, dict):
+            nodes = {node.name: node for node in nodes}
+
+        sources = []
+        for dst, src in delta['sources'].items():
+            dst_value = path_to_node(nodes, dst)
+            if not isinstance(dst_value, InputValue):
+                raise ImportException(f'Cannot apply source of "{dst}" as it is not an input')
+            sources.append((dst_value, path_to_node(nodes, src) if src is not None else None))
+        for path in delta['values']:
+            path_to_node(nodes, path)
+
+        with Transaction('Apply delta'):
+            sourced_inputs = []
+            for dst_value, src_value in sources:
+                if dst_value.is_sourced():
+                    dst_value.clear_source()
+                if src_value is not None:
+                    sourced_inputs.append((src_value, dst_value))
+
+            set_values(nodes, delta['values'])
+            connect_many(sourced_inputs)
+
+    def _checkpoint_tracker(self, name: str):
+        if name not in self._checkpoints:
+            raise ExportException(f"Unknown checkpoint '{name}'")
+        return self._checkpoints[name]
+
+
+class _DeltaTracker(Observer):
+    """
+    Records the values and inputs changed since a checkpoint, in order of first change, and whether
+    nodes have been added or removed.
+    """
+    def __init__(self):
+        # Dictionaries used as ordered sets
+        self.values = {}
+        self.sources = {}
+        self.structure_changed = False
+
+    def clear(self):
+        self.values.clear()
+        self.sources.clear()
+        self.structure_changed = False
+
+    def on_set_value(self, value, old_value):
+        self.values[value] = None
+
+    def on_set_element(self, value, index, old_element):
+        self.values[value] = None
+
+    def on_set_source(self, value, old_source):
+        self.sources[value] = None
+
+    def on_add_child(self, node):
+        self.structure_changed = True
+
+    def on_remove_child(self, node, parent, index):
+        self.structure_changed = True
+
 
 class _NodesImporter:
     """
@@ -139,23 +365,57 @@ class _NodesImporter:
             self.pop_parent()
             pass
         elif isinstance(json_obj, str):
-            typename = json_obj
-            if typename not in self.registry.type_dict:
-                raise ImportException(f"Unexpected node type '{typename}' during import")
-            type_class = self.registry.type_dict[typename]
-            self.create_node(type_class, name)
+            self.import_typename(name, json_obj)
         else:
             raise ImportException(f'Expecting dict, list or string values for nodes, found {type(json_obj)}')
 
+    def import_typename(self, name: str, typename: str):
+        if typename not in self.registry.type_dict:
+            raise ImportException(f"Unexpected node type '{typename}' during import")
+        type_class = self.registry.type_dict[typename]
+        return self.create_node(type_class, name)
+
+    def import_stream_dict(self, reader):
+        reader.begin_object()
+        while True:
+            name = reader.next_key()
+            if name is None:
+                break
+            self.import_stream_obj(name, reader)
+
+    def import_stream_list(self, reader):
+        reader.begin_array()
+        while reader.next_item():
+            self.import_stream_obj(None, reader)
+
+    def import_stream_obj(self, name: str, reader):
+        # Streaming equivalent of import_obj, descending into containers as they are read
+        next_char = reader.peek()
+        if next_char == '{':
+            node = self.create_node(Node, name)
+            self.push_parent(node)
+            self.import_stream_dict(reader)
+            self.pop_parent()
+        elif next_char == '[':
+            node = self.create_node(NodeArray, name)
+            self.push_parent(node)
+            self.import_stream_list(reader)
+            self.pop_parent()
+        else:
+            json_obj = reader.read_value()
+            if not isinstance(json_obj, str):
+                raise ImportException(f'Expecting dict, list or string values for nodes, found {type(json_obj)}')
+            self.import_typename(name, json_obj)
+
     def push_parent(self, node: NodeBase):
         self._node_stack.append(node)
 
     def pop_parent(self):
         self._node_stack.pop()
 
-    def create_node(self, type_class: NodeBase, name=None):
+    def create_node(self, type_class: NodeBase, name=None, *args):
         parent = self._node_stack[-1] if self._node_stack else None
-        node = type_class(parent, name)
+        node = type_class(parent, name, *args)
 
         # Store root nodes in returned import list
         if not parent:
@@ -163,6 +423,181 @@ class _NodesImporter:
         return node
 
 
+class _LazyImporter(_NodesImporter):
+    """
+    Importer for lazy import_json, which creates containers that hold on to their json until
+    their children are accessed. Values and sources are applied to values as they are created,
+    so the entries for values that have not been created yet are kept until they are.
+    """
+    def __init__(self, registry: JsonRegistry, values: dict, sources: dict):
+        super().__init__(registry)
+        self.values = dict(values)
+        self.sources = dict(sources)
+
+        # Inputs sourced from each output path, so that they are created along with the output
+        self.dependents = {}
+        for dst, src in sources.items():
+            self.dependents.setdefault(src, []).append(dst)
+
+        # Values created whilst importing a container's children, which are only bound once
+        # all of the children exist, as sources may refer to later siblings
+        self._created = []
+
+    def import_roots(self, json_dict: dict):
+        self.import_then_bind(self.import_dict, json_dict)
+
+    def import_children(self, node: NodeContainer, json_obj):
+        # The stacks are restored if the import fails, so that later accesses import as usual
+        node_stack = list(self._node_stack)
+        self.push_parent(node)
+        try:
+            self.import_then_bind(self.import_list if isinstance(node, NodeArray) else self.import_dict, json_obj)
+        finally:
+            self._node_stack = node_stack
+
+    def import_then_bind(self, import_function, json_obj):
+        # Binding may create other containers' children, so keep a separate list for each
+        outer_created, self._created = self._created, []
+        try:
+            import_function(json_obj)
+        finally:
+            created, self._created = self._created, outer_created
+        for node in created:
+            self.bind_values(node)
+
+    def import_obj(self, name: str, json_obj):
+        if isinstance(json_obj, dict):
+            self.create_node(_LazyNode, name, self, json_obj)
+        elif isinstance(json_obj, list):
+            self.create_node(_LazyNodeArray, name, self, json_obj)
+        else:
+            super().import_obj(name, json_obj)
+
+    def import_typename(self, name: str, typename: str):
+        node = super().import_typename(name, typename)
+        self._created.append(node)
+        return node
+
+    def bind_values(self, node: NodeBase):
+        # Values may be created directly or by a custom node's init_custom
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ValueBase):
+                self.bind_value(node)
+            elif isinstance(node, NodeContainer):
+                stack.extend(node.children)
+
+    def bind_value(self, value: ValueBase):
+        # Entries are only removed once applied, so that a failed import fails again when retried
+        path = value.path()
+        if path in self.values:
+            value.set_value(self.values[path])
+            del self.values[path]
+
+        src = self.sources.get(path)
+        if src is not None:
+            value << path_to_node(self.nodes, src)
+            del self.sources[path]
+
+        # Resolving a dependent input creates it, which then connects to this output
+        for dst in self.dependents.get(path, ()):
+            if dst in self.sources:
+                path_to_node(self.nodes, dst)
+        self.dependents.pop(path, None)
+
+
+class _LazyContainer:
+    """
+    Mixin for containers from a lazy import, which import their children from json the first
+    time any of them are accessed.
+    """
+    __slots__ = ()
+
+    def _materialise(self):
+        if self._lazy:
+            # Cleared whilst importing, as adding each child would otherwise import them again
+            lazy = self._lazy
+            self._lazy = None
+
+            # Creating children on demand is part of the import rather than a change to the
+            # nodes, so observers, e.g. of transactions, are not notified
+            with _suppressed_notifications():
+                try:
+                    lazy[0].import_children(self, lazy[1])
+                except Exception:
+                    # Remove anything created, so that every access raises the same error
+                    self._discard_children()
+                    self._lazy = lazy
+                    raise
+
+    def _discard_children(self):
+        children = list(self._loaded_children())
+        stack = list(children)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, InputValue):
+                if node._source is not None:
+                    node.clear_source()
+            elif isinstance(node, OutputValue):
+                for input_value in list(node._dependents or ()):
+                    input_value.clear_source()
+            elif isinstance(node, NodeContainer):
+                stack.extend(node._loaded_children())
+
+        for child in reversed(children):
+            child._detach()
+
+    @property
+    def children(self):
+        self._materialise()
+        return super().children
+
+    def _loaded_children(self) -> list:
+        return [] if self._lazy else super()._loaded_children()
+
+    def _add_child(self, child: NodeBase):
+        self._materialise()
+        super()._add_child(child)
+
+    def __getitem__(self, item):
+        self._materialise()
+        return super().__getitem__(item)
+
+
+class _LazyNode(_LazyContainer, Node):
+    """
+    Lazily imported Node container, which is indistinguishable from a Node once accessed.
+    """
+    __slots__ = ('_lazy',)
+
+    def __init__(self, parent, name, importer: _LazyImporter, json_obj: dict):
+        self._lazy = (importer, json_obj) if json_obj else None
+        super().__init__(parent, name)
+
+    @property
+    def typename(self):
+        return 'Node'
+
+    def is_custom(self) -> bool:
+        return False
+
+
+class _LazyNodeArray(_LazyContainer, NodeArray):
+    """
+    Lazily imported NodeArray container.
+    """
+    __slots__ = ('_lazy',)
+
+    def __init__(self, parent, name, importer: _LazyImporter, json_obj: list):
+        self._lazy = (importer, json_obj) if json_obj else None
+        super().__init__(parent, name)
+
+    @property
+    def typename(self):
+        return 'NodeArray'
+
+
 class _ExportVisitor(Visitor):
     """
     This visitor is used by the registry for exporting nodes to json dictionaries. When visiting
@@ -224,7 +659,7 @@ class _ExportVisitor(Visitor):
         if value.is_sourced():
             self.sources[value.path()] = value.source().path()
         else:
-            self.values[value.path()] = value.value()
+            self.values[value.path()] = _json_value(value)
 
     def on_output(self, value: OutputValue):
         if self.can_store():
@@ -232,7 +667,7 @@ class _ExportVisitor(Visitor):
                 raise ExportException(f"Unexpected output value type '{value.typename}' during export")
             self.add_to_container(value.name, value.typename)
 
-        self.values[value.path()] = value.value()
+        self.values[value.path()] = _json_value(value)
 
     def push_container(self, json_obj):
         self._json_stack.append(json_obj)
@@ -256,3 +691,248 @@ class _ExportVisitor(Visitor):
             'values': self.values,
             'sources': self.sources
         }
+
+
+class _StreamNodesVisitor(Visitor):
+    """
+    Streaming equivalent of the nodes part of _ExportVisitor, writing json text for each node
+    as it is visited. Rather than a stack of json containers, it maintains a stack of the open
+    json objects or arrays, each a count of entries written so far and whether it is an array,
+    or None for a custom node, whose descendants are pruned from the visit.
+    """
+    def __init__(self, registry: JsonRegistry, fp: TextIO):
+        self.registry = registry
+        self.fp = fp
+
+        # Roots are written as entries of the nodes json object
+        self._count_stack = [[0, False]]
+
+    def on_node_enter(self, node: Node):
+        if node.is_custom():
+            if node.typename not in self.registry.type_dict:
+                raise ExportException(f"Unexpected node type '{node.typename}' during export")
+
+            # If this is a custom leaf node, then it can be serialised by typename, and its
+            # children, e.g. values, sub-nodes, are skipped
+            self.write_entry(node.name, json.dumps(node.typename))
+            self._count_stack.append(None)
+            return PRUNE
+
+        self.write_entry(node.name, '{')
+        self._count_stack.append([0, False])
+
+    def on_node_exit(self, node: Node):
+        if self._count_stack.pop() is not None:
+            self.fp.write('}')
+
+    def on_node_array_enter(self, node: NodeArray):
+        self.write_entry(node.name, '[')
+        self._count_stack.append([0, True])
+
+    def on_node_array_exit(self, node: NodeArray):
+        self._count_stack.pop()
+        self.fp.write(']')
+
+    def on_input(self, value: InputValue):
+        if value.typename not in self.registry.type_dict:
+            raise ExportException(f"Unexpected input value type '{value.typename}' during export")
+        self.write_entry(value.name, json.dumps(value.typename))
+
+    def on_output(self, value: OutputValue):
+        if value.typename not in self.registry.type_dict:
+            raise ExportException(f"Unexpected output value type '{value.typename}' during export")
+        self.write_entry(value.name, json.dumps(value.typename))
+
+    def write_entry(self, name: str, text: str):
+        # Array elements are written without keys, their names are derived from their index
+        container = self._count_stack[-1]
+        if container[0]:
+            self.fp.write(', ')
+        if not container[1]:
+            self.fp.write(json.dumps(name) + ': ')
+        self.fp.write(text)
+        container[0] += 1
+
+
+class _StreamEntriesVisitor(Visitor):
+    """
+    Writes the json entries for either the values or the sources section of an export,
+    keyed by the path of each value.
+    """
+    def __init__(self, fp: TextIO, sources: bool):
+        self.fp = fp
+        self.sources = sources
+        self._count = 0
+
+    def on_input(self, value: InputValue):
+        if value.is_sourced():
+            if self.sources:
+                self.write_entry(value.path(), value.source().path())
+        elif not self.sources:
+            self.write_entry(value.path(), _json_value(value))
+
+    def on_output(self, value: OutputValue):
+        if not self.sources:
+            self.write_entry(value.path(), _json_value(value))
+
+    def write_entry(self, path: str, json_value):
+        if self._count:
+            self.fp.write(', ')
+        self.fp.write(f'{json.dumps(path)}: {json.dumps(json_value)}')
+        self._count += 1
+
+
+class _JsonStreamReader:
+    """
+    Minimal pull parser for json text read from a file object a chunk at a time. Rather than
+    producing a document, the caller steps through objects and arrays with next_key and
+    next_item, reading complete values only where it needs them with read_value.
+    """
+    _whitespace = re.compile(r'\s*')
+    _literal = re.compile(r'[^\s,:\[\]{}"]+')
+
+    def __init__(self, fp: TextIO, chunk_size: int):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+        # Whether each open object or array has yet to read an entry
+        self._first_stack = []
+
+    def peek(self) -> str:
+        """
+        :return: Next non-whitespace character, or an empty string at the end of the file
+        """
+        while True:
+            self._pos = self._whitespace.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def begin_object(self):
+        self._expect('{')
+        self._first_stack.append(True)
+
+    def next_key(self) -> str:
+        """
+        :return: Key of the next entry of the current object, or None at the end of the object
+        """
+        if not self._next_entry('}'):
+            return None
+        if self.peek() != '"':
+            self._error('expecting string key')
+        key = self.read_value()
+        self._expect(':')
+        return key
+
+    def begin_array(self):
+        self._expect('[')
+        self._first_stack.append(True)
+
+    def next_item(self) -> bool:
+        """
+        :return: True if there is another item in the current array, False at the end of the array
+        """
+        return self._next_entry(']')
+
+    def read_value(self):
+        """
+        Read a complete json value, which may be a scalar, object or array.
+        :return: Value read
+        """
+        next_char = self.peek()
+        if next_char == '{':
+            result = {}
+            self.begin_object()
+            while True:
+                key = self.next_key()
+                if key is None:
+                    return result
+                result[key] = self.read_value()
+        elif next_char == '[':
+            result = []
+            self.begin_array()
+            while self.next_item():
+                result.append(self.read_value())
+            return result
+        elif next_char == '"':
+            return self._read_string()
+        return self._read_literal()
+
+    def end(self):
+        if self.peek():
+            self._error('unexpected data after document')
+
+    def _next_entry(self, closing: str) -> bool:
+        if self.peek() == closing:
+            self._pos += 1
+            self._first_stack.pop()
+            return False
+        if self._first_stack[-1]:
+            self._first_stack[-1] = False
+        else:
+            self._expect(',')
+        return True
+
+    def _read_string(self) -> str:
+        while True:
+            try:
+                value, self._pos = json.decoder.scanstring(self._buffer, self._pos + 1)
+                return value
+            except json.JSONDecodeError:
+                # Either the string continues in the next chunk, or it is malformed
+                if not self._fill():
+                    self._error('unterminated string')
+
+    def _read_literal(self):
+        # Numbers, true, false and null, which may be split across chunks
+        match = self._literal.match(self._buffer, self._pos)
+        while match and match.end() == len(self._buffer) and self._fill():
+            match = self._literal.match(self._buffer, self._pos)
+        if not match:
+            self._error('expecting value')
+        try:
+            value = json.loads(match.group())
+        except json.JSONDecodeError:
+            self._error(f"invalid value '{match.group()}'")
+        self._pos = match.end()
+        return value
+
+    def _expect(self, char: str):
+        if self.peek() != char:
+            self._error(f"expecting '{char}'")
+        self._pos += 1
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._fp.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+
+        # Drop everything already consumed to keep the buffer bounded
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _error(self, message: str):
+        context = self._buffer[self._pos:self._pos + 20]
+        raise ImportException(f'Invalid json, {message} at {context!r}')
+
+
+def _apply_entry(nodes: dict, section: str, path: str, value):
+    # Apply an entry of the values or sources section of an import
+    if section == 'values':
+        path_to_node(nodes, path).set_value(value)
+    else:
+        path_to_node(nodes, path) << path_to_node(nodes, value)
+
+
+def _json_value(value: Union[InputValue, OutputValue]):
+    # Value arrays are stored as json lists
+    stored = value.value()
+    return stored.tolist() if isinstance(stored, array) else stored
@@ -1,4 +1,15 @@
-from .visitor import Visitor, VisitorException
+from typing import Iterator, Optional, Sequence, Tuple
+
+from .observer import _notified_observers
+from .visitor import PRUNE, Visitor, VisitorException, _overridden_callbacks
+
+# How a node is traversed by an iterative visit, see NodeBase._visit_kind
+_VISIT_LEAF = 0
+_VISIT_NODE = 1
+_VISIT_NODE_ARRAY = 2
+_VISIT_CONTAINER = 3
+_VISIT_INPUT = 4
+_VISIT_OUTPUT = 5
 
 
 class NodeException(Exception):
@@ -17,18 +28,52 @@ class NodeBase:
     form a DAG.
     The only nodes which shouldn't have a name are those stored in a NodeArray,
     because the child name is derived from its index in the array.
+
+    Nodes declare __slots__ to keep large graphs compact. Custom node classes that do not
+    declare __slots__ themselves get an instance __dict__, so may still store any extra
+    application-specific attributes.
     """
+    __slots__ = ('_name', '_parent', '_root', '_path', '_path_parts', '_path_index', '_type_index')
+
+    # Incremented whenever the hierarchy or connections between values change, so that
+    # cached views of the graph (such as an evaluation order) know when to rebuild.
+    _topology_revision = 0
+
+    # Visits are traversed iteratively for containers that use the standard visit, and by
+    # calling visit for anything else, such as values. Derived classes inherit how they are
+    # traversed unless they override visit or children.
+    _visit_kind = _VISIT_LEAF
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '_visit_kind' in cls.__dict__:
+            return
+        if 'visit' in cls.__dict__:
+            cls._visit_kind = _VISIT_LEAF
+        elif cls._visit_kind == _VISIT_NODE and cls.children is not Node.children:
+            cls._visit_kind = _VISIT_CONTAINER
+        elif cls._visit_kind == _VISIT_NODE_ARRAY and cls.children is not NodeArray.children:
+            cls._visit_kind = _VISIT_CONTAINER
+
     def __init__(self, parent=None, name=None):
         self._name = name
         self._parent = parent
+        self._path = None
+        self._path_parts = None
+
+        # Roots lazily build indices of paths and types to nodes, which are then maintained as
+        # nodes are added and removed
+        self._path_index = None
+        self._type_index = None
 
         if parent:
             if not isinstance(parent, NodeContainer):
                 raise NodeException(f'Nodes must parent to container types: parent is {type(parent)}')
-            parent._add_child(self)
+            self._attach(parent)
         else:
             if not name:
                 raise NodeException('Unparented leaf nodes must be named')
+            self._root = self
 
     @property
     def name(self):
@@ -38,22 +83,112 @@ class NodeBase:
     def parent(self):
         return self._parent
 
+    @property
+    def root(self):
+        return self._root
+
     @property
     def typename(self):
         return self.__class__.__name__
 
     def path(self):
-        result = ''
-        if self._parent:
-            result += self._parent.path()
+        # Paths are memoised as they are requested for every value on export and in errors. They
+        # are built down from the nearest memoised ancestor, rather than by recursing up to it.
+        if self._path is None:
+            for node in reversed(self._unmemoised_ancestors('_path')):
+                parent = node._parent
+                if parent is None:
+                    node._path = node._name
+                # Delimit with a dot for non-array children
+                # FIXME check conditional though type, not by name
+                elif node._name[0] != '[':
+                    node._path = parent._path + '.' + node._name
+                else:
+                    node._path = parent._path + node._name
+        return self._path
+
+    def path_parts(self) -> tuple:
+        """
+        The path as a tuple of names and indices, as would be returned by split_path.
+        :return: Path components from the root, e.g. ("foo", "bar", 4, "etc")
+        """
+        if self._path_parts is None:
+            for node in reversed(self._unmemoised_ancestors('_path_parts')):
+                part = int(node._name[1:-1]) if node._name[0] == '[' else node._name
+                parent = node._parent
+                node._path_parts = (part,) if parent is None else parent._path_parts + (part,)
+        return self._path_parts
+
+    def _unmemoised_ancestors(self, slot: str) -> list:
+        """
+        This node and its ancestors up to the nearest whose memoised path slot is set.
+        """
+        nodes = []
+        node = self
+        while node is not None and getattr(node, slot) is None:
+            nodes.append(node)
+            node = node._parent
+        return nodes
+
+    def _attach(self, parent, index: Optional[int] = None):
+        """
+        Add this node and any descendants to a parent, updating the root's indices and notifying
+        observers. This is called on construction, and by _restore for a node removed with _detach.
+        :param parent: Container to add to
+        :param index: Position among the parent's children, or None for the end
+        """
+        self._parent = parent
+        self._root = parent._root
+        if index is None:
+            parent._add_child(self)
+        else:
+            parent._insert_child(self, index)
+        _added_children((self,))
 
-            # Delimit with a dot for non-array children
-            # FIXME check conditional though type, not by name
-            if self._name[0] != '[':
-                result += '.'
+    def _detach(self) -> int:
+        """
+        Remove this node and its descendants from its parent, the reverse of adding it. Values in
+        the removed hierarchy must be disconnected from the rest of the graph beforehand. The node
+        keeps its parent and memoised path so that it may be restored with _restore.
+        :return: Position the node was removed from among its parent's children
+        """
+        parent = self._parent
+        _update_indices(self, add=False)
+        index = parent._remove_child(self)
+        NodeBase._topology_revision += 1
 
-        result += self._name
-        return result
+        for observer in _notified_observers():
+            observer.on_remove_child(self, parent, index)
+        return index
+
+    def _restore(self, index: Optional[int] = None):
+        """
+        Add a node removed with _detach back to its former parent.
+        :param index: Position returned by _detach, or None for the end, e.g. to redo adding it
+        """
+        previous_name = self._name
+        if isinstance(self._parent, NodeArray):
+            # Array children are named for their index when added, which may have changed
+            self._name = None
+        self._attach(self._parent, index)
+        if self._name != previous_name:
+            self._invalidate_path()
+
+    def _invalidate_path(self):
+        """
+        Clear memoised paths for this node and its descendants. This must be called whenever a
+        node is re-parented or renamed, including an array element being re-indexed.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node._path = None
+            node._path_parts = None
+            if isinstance(node, NodeContainer):
+                stack.extend(node._loaded_children())
+
+        # Stale paths may be keyed in the root's path index, so drop it to be rebuilt on demand
+        self._root._path_index = None
 
     def visit(self, visitor: Visitor):
         raise VisitorException(f'visit not implemented for node type {self.typename}')
@@ -64,22 +199,50 @@ class NodeContainer(NodeBase):
     Abstract base class for node that contains child nodes that may be accessed
     using square brackets, e.g. foo['bar'].
     """
+    __slots__ = ()
+
     def _add_child(self, child: NodeBase):
         raise NodeException(f'_add_child not implemented for {self.typename}')
 
+    def _insert_child(self, child: NodeBase, index: int):
+        raise NodeException(f'_insert_child not implemented for {self.typename}')
+
+    def _remove_child(self, child: NodeBase) -> int:
+        raise NodeException(f'_remove_child not implemented for {self.typename}')
+
     def __getitem__(self, _item_name: str):
         raise NodeException(f'__getitem__ not implemented for {self.typename}')
 
+    @property
+    def children(self):
+        raise NodeException(f'children not implemented for {self.typename}')
+
+    def _loaded_children(self) -> list:
+        """
+        Children that have been created so far, which for a lazily imported container may be
+        fewer than would be returned by children, as that creates them on demand.
+        """
+        return self.children
+
 
 class Node(NodeContainer):
     """
     This is the most commonly-used node type, with child nodes (and values) keyed
     stored in a dictionary, keyed by name.
     """
+    __slots__ = ('_child_dict',)
+    _visit_kind = _VISIT_NODE
+
+    # Set by the cache_prototype decorator for classes whose children are copied from a prototype
+    _prototypes = None
+
     def __init__(self, parent=None, name=None):
         self._child_dict = {}
         super().__init__(parent, name)
-        self.init_custom()
+        if self._prototypes is None:
+            self.init_custom()
+        else:
+            self._prototypes.init_node(self)
 
     @property
     def children(self):
@@ -94,16 +257,26 @@ class Node(NodeContainer):
 
         self._child_dict[child.name] = child
 
+    def _insert_child(self, child: NodeBase, index: int):
+        self._add_child(child)
+        if index < len(self._child_dict) - 1:
+            # Dicts cannot insert in place, so rebuild in the new order
+            children = list(self._child_dict.values())
+            children.insert(index, children.pop())
+            self._child_dict = {sibling._name: sibling for sibling in children}
+
+    def _remove_child(self, child: NodeBase) -> int:
+        index = list(self._child_dict).index(child._name)
+        del self._child_dict[child._name]
+        return index
+
     def __getitem__(self, child_name: str):
         if child_name not in self._child_dict:
             raise NodeException(f"Node {self.path()} does not have child '{child_name}'")
         return self._child_dict[child_name]
 
     def visit(self, visitor: Visitor):
-        visitor.on_node_enter(self)
-        for child in self._child_dict.values():
-            child.visit(visitor)
-        visitor.on_node_exit(self)
+        _visit_iterative(self, visitor)
 
     def init_custom(self) -> None:
         """
@@ -125,17 +298,35 @@ class Node(NodeContainer):
     def evaluate(self, *_args, **_kwargs) -> None:
         """
         Node evaluation is open for implementation in derived custom nodes to process their input
-        values and propagate their outputs.
+        values and propagate their outputs. It may also be implemented as a coroutine, with
+        async def, for nodes evaluated by an AsyncEvaluator.
         :param _args: Arguments are specified but ignored for application-specific derivatives
         :param _kwargs: Arguments are specified but ignored for application-specific derivatives
         """
         pass
 
+    @classmethod
+    def evaluate_batch(cls, nodes: list, *args, **kwargs) -> None:
+        """
+        Evaluate many nodes of this type at once. An evaluator calls this once per node type for
+        each level of independent nodes, so custom nodes with many instances may override it to
+        process all their values together, e.g. with gather_values and scatter_values from the
+        evaluate module. By default each node is evaluated in turn.
+        :param nodes: Nodes of exactly this type, none of which depend on each other
+        :param args: Arguments passed through from the evaluator
+        :param kwargs: Keyword arguments passed through from the evaluator
+        """
+        for node in nodes:
+            node.evaluate(*args, **kwargs)
+
 
 class NodeArray(NodeContainer):
     """
     An array node container stores children by index.
     """
+    __slots__ = ('_child_list',)
+    _visit_kind = _VISIT_NODE_ARRAY
+
     def __init__(self, parent=None, name=None):
         self._child_list = []
         super().__init__(parent, name)
@@ -152,6 +343,26 @@ class NodeArray(NodeContainer):
         child._name = f'[{len(self._child_list)}]'
         self._child_list.append(child)
 
+    def _insert_child(self, child: NodeBase, index: int):
+        self._add_child(child)
+        if index < len(self._child_list) - 1:
+            self._child_list.insert(index, self._child_list.pop())
+            self._rename_elements(index)
+
+    def _remove_child(self, child: NodeBase) -> int:
+        index = int(child._name[1:-1])
+        del self._child_list[index]
+
+        # Elements after the removed child move down, so are renamed for their new index
+        self._rename_elements(index)
+        return index
+
+    def _rename_elements(self, start: int):
+        for position in range(start, len(self._child_list)):
+            element = self._child_list[position]
+            element._name = f'[{position}]'
+            element._invalidate_path()
+
     def __getitem__(self, child_index: int):
         if child_index < 0 or child_index >= len(self._child_list):
             raise NodeException(
@@ -160,7 +371,199 @@ class NodeArray(NodeContainer):
         return self._child_list[child_index]
 
     def visit(self, visitor: Visitor):
-        visitor.on_node_array_enter(self)
-        for child in self._child_list:
-            child.visit(visitor)
-        visitor.on_node_array_exit(self)
+        _visit_iterative(self, visitor)
+
+
+def _added_children(children: Sequence[NodeBase]):
+    """
+    Complete adding children, each with any descendants, once they are in their parents: bump the
+    topology revision, add them to their root's indices and notify observers of each.
+    """
+    NodeBase._topology_revision += 1
+    for child in children:
+        _update_indices(child, add=True)
+    for observer in _notified_observers():
+        for child in children:
+            observer.on_add_child(child)
+
+
+def _update_indices(node: NodeBase, add: bool):
+    """
+    Add or remove a node and its created descendants in the indices of its root, if built.
+    """
+    path_index = node._root._path_index
+    type_index = node._root._type_index
+    if path_index is None and type_index is None:
+        return
+
+    stack = [node]
+    while stack:
+        descendant = stack.pop()
+        if path_index is not None:
+            if add:
+                path_index[descendant.path()] = descendant
+            else:
+                path_index.pop(descendant.path(), None)
+        if type_index is not None:
+            if add:
+                type_index.setdefault(descendant.typename, {})[descendant] = None
+            else:
+                type_index.get(descendant.typename, {}).pop(descendant, None)
+        if isinstance(descendant, NodeContainer):
+            stack.extend(reversed(descendant._loaded_children()))
+
+
+def walk(root: NodeBase, order: str = 'pre') -> Iterator[Tuple[NodeBase, int]]:
+    """
+    Iterate over a node and all of its descendants depth-first, in the same order as visit.
+    Like visit, this uses an explicit stack rather than recursion, so the depth of the
+    hierarchy is not limited by the interpreter's recursion limit.
+    :param root: Node to start from, which is yielded at depth 0
+    :param order: 'pre' to yield nodes before their children, 'post' to yield them after
+    :return: Iterator of each node with its depth below the root
+    """
+    if order not in ('pre', 'post'):
+        raise NodeException(f"Unknown walk order '{order}', expecting 'pre' or 'post'")
+    pre = order == 'pre'
+
+    if pre:
+        yield root, 0
+
+    # Stack of the nodes above the current one, each with an iterator over its remaining children
+    stack = []
+    node = root
+    children = _iter_children(root)
+    while True:
+        for child in children:
+            kind = child._visit_kind
+            if kind == _VISIT_INPUT or kind == _VISIT_OUTPUT:
+                yield child, len(stack) + 1
+                continue
+
+            if pre:
+                yield child, len(stack) + 1
+            stack.append((node, children))
+            node = child
+            children = _iter_children(child)
+            break
+        else:
+            if not pre:
+                yield node, len(stack)
+            if not stack:
+                return
+            node, children = stack.pop()
+
+
+def _iter_children(node: NodeBase) -> Iterator[NodeBase]:
+    kind = node._visit_kind
+    if kind == _VISIT_NODE:
+        return iter(node._child_dict.values())
+    elif kind == _VISIT_NODE_ARRAY:
+        return iter(node._child_list)
+    elif isinstance(node, NodeContainer):
+        return iter(node.children)
+    return iter(())
+
+
+def _visit_iterative(container: NodeContainer, visitor: Visitor):
+    """
+    Visit a container and its descendants with an explicit stack, making the same callbacks in
+    the same order as recursively calling visit on each child. Descendants whose class overrides
+    visit are visited by calling their visit method. Callbacks the visitor does not override
+    are skipped, and entering a node may return PRUNE to skip its descendants.
+    """
+    callbacks = _overridden_callbacks(visitor)
+    on_node_enter, on_node_exit, on_node_array_enter, on_node_array_exit, on_input, on_output = callbacks
+    if on_node_enter or on_node_exit or on_node_array_enter or on_node_array_exit:
+        _visit_containers(container, visitor, callbacks)
+    else:
+        _visit_values(container, visitor, on_input, on_output)
+
+
+def _visit_values(container: NodeContainer, visitor: Visitor, on_input, on_output):
+    """
+    Traversal for visitors that only override value callbacks, e.g. to collect values, which
+    never enter, exit or prune containers.
+    """
+    # Stack of iterators over the remaining children of the containers above the current one
+    stack = []
+    children = iter(container.children)
+    while True:
+        for child in children:
+            kind = child._visit_kind
+            if kind == _VISIT_INPUT and on_input:
+                on_input(child)
+            elif kind == _VISIT_OUTPUT and on_output:
+                on_output(child)
+            elif kind == _VISIT_NODE:
+                stack.append(children)
+                children = iter(child._child_dict.values())
+                break
+            elif kind == _VISIT_NODE_ARRAY:
+                stack.append(children)
+                children = iter(child._child_list)
+                break
+            elif kind == _VISIT_LEAF:
+                child.visit(visitor)
+            elif kind == _VISIT_CONTAINER:
+                stack.append(children)
+                children = iter(child.children)
+                break
+        else:
+            if not stack:
+                return
+            children = stack.pop()
+
+
+def _visit_containers(container: NodeContainer, visitor: Visitor, callbacks: tuple):
+    """
+    Traversal for visitors that override any container callbacks, which are each None if not.
+    A pruned container is given no children to visit, so is exited straight away.
+    """
+    on_node_enter, on_node_exit, on_node_array_enter, on_node_array_exit, on_input, on_output = callbacks
+    is_array = isinstance(container, NodeArray)
+    on_enter = on_node_array_enter if is_array else on_node_enter
+    on_exit = on_node_array_exit if is_array else on_node_exit
+    pruned = on_enter and on_enter(container) is PRUNE
+
+    # Stack of the containers above the current one, each with its exit callback and an iterator
+    # over its remaining children, down to a sentinel with no children
+    stack = [(None, None, None)]
+    parent = container
+    children = iter(()) if pruned else iter(container.children)
+    while children is not None:
+        for child in children:
+            kind = child._visit_kind
+            if kind == _VISIT_INPUT and on_input:
+                on_input(child)
+            elif kind == _VISIT_OUTPUT and on_output:
+                on_output(child)
+            elif kind == _VISIT_NODE:
+                stack.append((parent, on_exit, children))
+                parent = child
+                on_exit = on_node_exit
+                pruned = on_node_enter and on_node_enter(child) is PRUNE
+                children = iter(()) if pruned else iter(child._child_dict.values())
+                break
+            elif kind == _VISIT_NODE_ARRAY:
+                stack.append((parent, on_exit, children))
+                parent = child
+                on_exit = on_node_array_exit
+                pruned = on_node_array_enter and on_node_array_enter(child) is PRUNE
+                children = iter(()) if pruned else iter(child._child_list)
+                break
+            elif kind == _VISIT_LEAF:
+                child.visit(visitor)
+            elif kind == _VISIT_CONTAINER:
+                is_array = isinstance(child, NodeArray)
+                on_enter = on_node_array_enter if is_array else on_node_enter
+                stack.append((parent, on_exit, children))
+                parent = child
+                on_exit = on_node_array_exit if is_array else on_node_exit
+                pruned = on_enter and on_enter(child) is PRUNE
+                children = iter(()) if pruned else iter(child.children)
+                break
+        else:
+            if on_exit:
+                on_exit(parent)
+            parent, on_exit, children = stack.pop()
@@ -0,0 +1,122 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Sequence
+
+
+class Observer:
+    """
+    Observers are notified of changes made to values and the hierarchy anywhere in the graph. Like a Visitor,
+    derived classes only need to override the callbacks they are interested in. An observer
+    receives nothing until it is registered with add_observer, and should be unregistered
+    with remove_observer when no longer required.
+    """
+    def on_set_value(self, value, old_value):
+        """
+        Callback after a value has been set.
+        :param value: input or output value that was set
+        :param old_value: what was stored in the value before it was set
+        """
+        pass
+
+    def on_set_element(self, value, index, old_element):
+        """
+        Callback after a single element of a value array has been set in place.
+        :param value: value array that was modified
+        :param index: index of element that was set
+        :param old_element: what was stored in the element before it was set
+        """
+        pass
+
+    def on_set_source(self, value, old_source):
+        """
+        Callback after an input has had its source set or cleared.
+        :param value: input value that was connected or disconnected
+        :param old_source: output the input was sourced from beforehand, or None
+        """
+        pass
+
+    def on_add_child(self, node):
+        """
+        Callback after a node has been added to a parent. A constructed node is added before any
+        children of its own, e.g. from init_custom, whereas a cloned node is added with all its
+        descendants at once.
+        :param node: node that was added, whose parent is now set
+        """
+        pass
+
+    def on_remove_child(self, node, parent, index):
+        """
+        Callback after a node has been removed from its parent, e.g. when undoing its creation.
+        :param node: node that was removed, along with any descendants
+        :param parent: container the node was removed from
+        :param index: position the node was removed from among the parent's children
+        """
+        pass
+
+    def on_set_values(self, changes):
+        """
+        Callback after many values have been set at once, e.g. by set_values. Observers may
+        override this to handle all the changes together, otherwise on_set_value is called for
+        each change in turn.
+        :param changes: List of each value that was set with its old value
+        """
+        for value, old_value in changes:
+            self.on_set_value(value, old_value)
+
+    def on_set_sources(self, inputs):
+        """
+        Callback after many inputs have been connected at once, e.g. by connect_many. Observers
+        may override this to handle all the connections together, otherwise on_set_source is
+        called for each input in turn.
+        :param inputs: List of inputs that were connected, which had no source beforehand
+        """
+        for input_value in inputs:
+            self.on_set_source(input_value, None)
+
+
+# Registered observers, notified in the order they were added
+_observers: List[Observer] = []
+
+
+def add_observer(observer: Observer) -> None:
+    _observers.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    _observers.remove(observer)
+
+
+class _Suppression(threading.local):
+    """
+    Depth of nested suppression in each thread, defaulting to zero so that threads which never
+    suppress notifications read it without a missing attribute lookup.
+    """
+    depth = 0
+
+
+# Threads that are not notifying observers, e.g. whilst lazily importing nodes
+_suppression = _Suppression()
+
+
+def _notified_observers() -> Sequence[Observer]:
+    """
+    The observers to notify of a change made by the current thread, which are none whilst
+    notifications are suppressed.
+    """
+    if _observers and _suppression.depth:
+        return ()
+    return _observers
+
+
+@contextmanager
+def _suppressed_notifications() -> Iterator[None]:
+    """
+    Context manager for making changes that are not notified to observers, e.g. creating nodes as
+    part of an import rather than as a change to existing nodes. Only changes made by the current
+    thread are suppressed, and observers may still be added and removed meanwhile.
+    """
+    _suppression.depth += 1
+    try:
+        yield
+    finally:
+        _suppression.depth -= 1
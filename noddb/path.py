@@ -1,6 +1,6 @@
-from typing import List, Union
-from .node import Node, NodeBase
-import re
+from functools import lru_cache
+from typing import Dict, List, Tuple, Union
+from .node import Node, NodeBase, NodeContainer
 
 
 def split_path(path: str) -> List[Union[str, int]]:
@@ -11,35 +11,115 @@ def split_path(path: str) -> List[Union[str, int]]:
     :param path: Path to a node, e.g. "foo.bar[4].etc[2][0].stuff"
     :return: List of names and indices in path, e.g. ["foo", "bar", 4, "etc", 2, 0, "stuff"]
     """
-    path_items = re.split('[.[]', path)
+    return list(_parse_path(path))
+
+
+@lru_cache(maxsize=4096)
+def _parse_path(path: str) -> Tuple[Union[str, int], ...]:
+    """
+    Tokenise a path into a tuple of components, splitting on dots and then on opening brackets
+    with str.split rather than a regex. Paths tend to be resolved repeatedly, so the most
+    recently used are cached.
+    """
+    names = [name for dotted in path.split('.') for name in dotted.split('[')]
 
     # When the first path element is an array path, e.g. "[0]", an erroneous empty string
     # is the first item. This explicitly removes it.
-    if path_items and not path_items[0]:
-        path_items.pop(0)
+    if names and not names[0]:
+        names = names[1:]
+
+    return tuple([int(name.strip(']')) if name[0].isdigit() else name for name in names])
+
+
+class ParsedPath:
+    """
+    A path that has been split into its components up front, so that it can be resolved
+    repeatedly, e.g. in a hot loop, without being parsed each time.
+    """
+    def __init__(self, path: str):
+        self._path = path
+        self._parts = _parse_path(path)
+
+    @property
+    def parts(self) -> Tuple[Union[str, int], ...]:
+        return self._parts
 
-    def int_if_possible(name):
-        if name[0].isdigit():
-            return int(name.strip(']'))
-        return name
+    def resolve(self, root: Union[Node, dict]) -> NodeBase:
+        """
+        Get the node at this path, equivalent to path_to_node(root, path).
+        :param root: Node or dict at root of search
+        :return: Found node or value
+        """
+        return path_to_node(root, self)
 
-    return [int_if_possible(name) for name in path_items]
+    def __str__(self):
+        return self._path
 
+    def __repr__(self):
+        return f'ParsedPath({self._path!r})'
 
-def path_to_node(root: Union[Node, dict], path: str) -> NodeBase:
+    def __eq__(self, other):
+        return isinstance(other, ParsedPath) and self._path == other._path
+
+    def __hash__(self):
+        return hash(self._path)
+
+
+def path_to_node(root: Union[Node, dict], path: Union[str, ParsedPath]) -> NodeBase:
     """
     Get a node given root node or dict and a relative path. Note that the dict option
     for the root is for convenience when dealing with imported files, where top-level
     nodes are stored in a dict.
     :param root: Node or dict at root of search
-    :param path: Path from root location to find node from
+    :param path: Path from root location to find node from, as a string or ParsedPath
     :return: Found node or value
     """
-    names = split_path(path)
+    if isinstance(path, ParsedPath):
+        parts = path.parts
+        path = str(path)
+    else:
+        parts = None
+
+    # Resolve the full path from the root, for a single lookup in the root's path index
+    if isinstance(root, dict):
+        name_end = len(path)
+        for delimiter in '.[':
+            found = path.find(delimiter)
+            if found >= 0:
+                name_end = min(name_end, found)
+        # Nodes in the dict need not be roots, so the full path is from the node's own path
+        top = root.get(path[:name_end])
+        node = path_index(top.root).get(top.path() + path[name_end:]) if top is not None else None
+    else:
+        full_path = root.path() + path if path.startswith('[') else f'{root.path()}.{path}'
+        node = path_index(root.root).get(full_path)
+
+    if node is not None:
+        return node
 
+    # Fall back on walking non-canonical paths, which also reports errors for missing nodes
     node = root
-    while names:
-        name_or_index = names.pop(0)
+    for name_or_index in parts if parts is not None else _parse_path(path):
         node = node[name_or_index]
 
     return node
+
+
+def path_index(root: NodeBase) -> Dict[str, NodeBase]:
+    """
+    Get the index of full path strings to nodes for the hierarchy under a root node. The index
+    is built on first use, and then kept up to date as nodes are added to the hierarchy. Children
+    of lazily imported containers are added to the index as they are created.
+    :param root: Root node of hierarchy
+    :return: Dictionary of all paths in hierarchy to their nodes
+    """
+    if root._path_index is None:
+        index = {}
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            index[node.path()] = node
+            if isinstance(node, NodeContainer):
+                stack.extend(node._loaded_children())
+        root._path_index = index
+    return root._path_index
@@ -0,0 +1,190 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+from .clone import _attributes, _copied_attribute, _copy_node
+from .node import Node, NodeArray, NodeBase, NodeContainer, NodeException, _added_children
+from .observer import _notified_observers
+from .value import InputValue, OutputValue, ValueBase
+
+
+def cache_prototype(node_class: type) -> type:
+    """
+    Class decorator for custom nodes, so that only the first node of the class runs init_custom.
+    Its children, their values and connections between them are then recorded as a prototype, and
+    later nodes of the class are stamped from the prototype, without the constructors and checks
+    of each child, e.g.
+
+        @cache_prototype
+        class Voice(Node):
+            def init_custom(self):
+                ...
+
+    This is only valid for classes where init_custom always creates the same children, so it must
+    not depend on constructor arguments or where the node is in the hierarchy. Classes derived
+    from a decorated class are cached too, each with their own prototype. If init_custom connects
+    children to values outside the node, then the class is not cached, and every node of the
+    class runs init_custom as usual.
+
+    Attributes set by init_custom are copied from the prototype as clone copies them, so dicts,
+    lists and sets are shallow copied, although their contents are shared by all nodes of the
+    class. Attributes that refer to children refer to the new node's children. Observers are
+    notified of each child of the new node after it is created with all its descendants, as for
+    clone.
+    :param node_class: Class derived from Node
+    :return: The same class
+    """
+    if not issubclass(node_class, Node) or issubclass(node_class, ValueBase):
+        raise NodeException(f'Cannot cache prototype of {node_class.__name__}, which is not a custom node')
+    node_class._prototypes = _PrototypeCache()
+    return node_class
+
+
+def clear_prototypes(node_class: type) -> None:
+    """
+    Discard the prototypes of a decorated class and its derived classes, e.g. if init_custom has
+    changed, so that the next node of each class runs init_custom to record a new prototype.
+    :param node_class: Class decorated with cache_prototype
+    """
+    if node_class._prototypes is not None:
+        node_class._prototypes.prototypes.clear()
+
+
+class _PrototypeCache:
+    """
+    Prototypes of a decorated class and its derived classes, keyed by class, or None for classes
+    that cannot be cached.
+    """
+    __slots__ = ('prototypes',)
+
+    def __init__(self):
+        self.prototypes: Dict[type, Optional[_Prototype]] = {}
+
+    def init_node(self, node: Node):
+        node_class = type(node)
+        if node_class not in self.prototypes:
+            node.init_custom()
+            self.prototypes[node_class] = _Prototype.record(node)
+        elif self.prototypes[node_class] is None:
+            node.init_custom()
+        else:
+            self.prototypes[node_class].stamp(node)
+
+
+class _Prototype:
+    """
+    Copies of the children of a node, flattened in breadth-first order, with the positions of
+    their parents, connections and attributes referring to other nodes, so that they can be
+    stamped under a new node without searching the hierarchy.
+    """
+    __slots__ = ('attributes', 'children', 'connections', 'references')
+
+    def __init__(self, attributes: List[Tuple[str, object]], children: List[Tuple[NodeBase, int, bool]],
+                 connections: List[Tuple[int, int]], references: List[Tuple[int, str, int]]):
+        # Custom attributes of the recorded node, except those referring to its descendants
+        self.attributes = attributes
+
+        # Each child as a copy, the position of its parent and whether the parent is a NodeArray
+        self.children = children
+
+        # Positions of each sourced input and its output, and of each node with an attribute
+        # referring to another node, by position 0 for the node itself and then its descendants
+        self.connections = connections
+        self.references = references
+
+    @classmethod
+    def record(cls, node: Node) -> Optional[_Prototype]:
+        """
+        Record the children of a node just after init_custom.
+        :return: Prototype, or None if the children are connected to values outside the node
+        """
+        nodes, parents = _flatten(node)
+        positions = {original: position for position, original in enumerate(nodes)}
+        connections = _connections(nodes, positions)
+        if connections is None:
+            return None
+        references = [
+            (position, key, positions[value])
+            for position, original in enumerate(nodes)
+            for key, value in _attributes(original) if isinstance(value, NodeBase) and value in positions
+        ]
+
+        # Copy the children so that later changes to the recorded node do not affect the prototype.
+        # Their parents are only set when stamped.
+        children = [
+            (_copy_node(original, original._name, None, None)[0], parent, isinstance(nodes[parent], NodeArray))
+            for original, parent in zip(nodes[1:], parents[1:])
+        ]
+        attributes = [
+            (key, _copied_attribute(value)) for key, value in _attributes(node)
+            if not (isinstance(value, NodeBase) and value in positions)
+        ]
+        return cls(attributes, children, connections, references)
+
+    def stamp(self, node: Node):
+        """
+        Create children under a new node of the prototype's class, which must not have any yet.
+        """
+        copies = self._stamp_children(node)
+        for key, value in self.attributes:
+            setattr(node, key, _copied_attribute(value))
+        for position, key, target in self.references:
+            setattr(copies[position], key, copies[target])
+
+        inputs = []
+        for input_position, output_position in self.connections:
+            input_value = copies[input_position]
+            input_value._connect(copies[output_position])
+            inputs.append(input_value)
+
+        _added_children(list(node._child_dict.values()))
+        if inputs:
+            for observer in _notified_observers():
+                observer.on_set_sources(inputs)
+
+    def _stamp_children(self, node: Node) -> List[NodeBase]:
+        """
+        Copy the children into the hierarchy under a node, without notifying observers.
+        :return: The node followed by the copies, by position
+        """
+        root = node._root
+        copies = [node]
+        for child, parent_position, in_array in self.children:
+            parent = copies[parent_position]
+            copy = _copy_node(child, child._name, parent, root)[0]
+            if in_array:
+                parent._child_list.append(copy)
+            else:
+                parent._child_dict[copy._name] = copy
+            copies.append(copy)
+        return copies
+
+
+def _flatten(node: Node) -> Tuple[List[NodeBase], List[Optional[int]]]:
+    """
+    A node and its descendants in breadth-first order, with the position of the parent of each.
+    """
+    nodes = [node]
+    parents = [None]
+    for position, original in enumerate(nodes):
+        if isinstance(original, NodeContainer) and not isinstance(original, ValueBase):
+            for child in original.children:
+                nodes.append(child)
+                parents.append(position)
+    return nodes, parents
+
+
+def _connections(nodes: List[NodeBase], positions: Dict[NodeBase, int]) -> Optional[List[Tuple[int, int]]]:
+    """
+    The positions of each sourced input and its output.
+    :return: Connections, or None if any value is connected to one outside the nodes
+    """
+    connections = []
+    for position, original in enumerate(nodes):
+        if isinstance(original, InputValue) and original._source is not None:
+            if original._source not in positions:
+                return None
+            connections.append((position, positions[original._source]))
+        elif isinstance(original, OutputValue):
+            if any(input_value not in positions for input_value in original._dependents or ()):
+                return None
+    return connections
@@ -0,0 +1,304 @@
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from typing import Iterator, Optional, Tuple, Union
+
+from .node import Node, NodeArray, NodeBase, NodeContainer, NodeException
+from .index import nodes_of_type
+from .path import path_index
+
+# Kinds of pattern component, each a tuple of the kind followed by its argument
+_NAME = 'name'
+_NAME_MATCH = 'name_match'
+_ANY_NAME = 'any_name'
+_INDEX = 'index'
+_INDEX_RANGE = 'index_range'
+_DESCENDANTS = 'descendants'
+
+
+class QueryException(Exception):
+    """
+    Raised for query patterns that cannot be parsed.
+    """
+    pass
+
+
+def query(root: Union[Node, dict], pattern: str, type: Optional[type] = None) -> Iterator[NodeBase]:
+    """
+    Find all nodes under a root node or dict whose path matches a pattern. Patterns use the same
+    grammar as paths, relative to the root as with path_to_node, with these additions:
+     - "*" in place of a name matches any named child, or any name matching a glob pattern if
+       combined with other characters, e.g. "osc*".
+     - "[*]" matches any element of a node array, and "[a:b]" a range of elements, where either
+       bound may be omitted as with a slice, e.g. "[2:]". Indices may be negative to count from
+       the end of the array, e.g. "[-1]" for the last element.
+     - "**" matches any number of levels of children, including none.
+    For example, query(voices, '[*].**.gain', type=InputFloat) finds every float input named
+    gain at any depth under each element of the voices array.
+
+    Results are found lazily in visit order. Any leading part of the pattern without wildcards
+    is resolved in a single lookup in the path index, so it is worth being as specific as
+    possible before the first wildcard. If the type index has been built for the hierarchy, e.g.
+    by nodes_of_type, a query with a type and ** only checks the paths of nodes of that type,
+    rather than searching all descendants, and results are in the order of the type index.
+    :param root: Node or dict at root of search
+    :param pattern: Path pattern from the root
+    :param type: Only find nodes that are instances of this type, or tuple of types
+    :return: Iterator of matching nodes
+    """
+    parts = _parse_pattern(pattern)
+
+    # Resolve the literal prefix of the pattern with the path index
+    literal_count = 0
+    while literal_count < len(parts) and parts[literal_count][0] in (_NAME, _INDEX):
+        literal_count += 1
+    start = _resolve_literal(root, parts[:literal_count])
+    if start is None:
+        return
+
+    if type is not None and any(part[0] == _DESCENDANTS for part in parts[literal_count:]):
+        candidates = _indexed_candidates(start, type)
+        if candidates is not None:
+            yield from (node for node in candidates if _path_matches(parts, literal_count, start, node))
+            return
+
+    for node in _search(parts, literal_count, start):
+        if type is None or isinstance(node, type):
+            yield node
+
+
+def _search(parts: Tuple[tuple, ...], literal_count: int, start: Union[NodeBase, dict]) -> Iterator[NodeBase]:
+    # Depth-first stack of nodes to match, each with the indices of the pattern components that
+    # its children may match next. As with a regex, several components may be active at once
+    # after a ** component, but each node is only visited once.
+    end = len(parts)
+    stack = [(start, _closure(parts, (literal_count,)))]
+    while stack:
+        node, states = stack.pop()
+        if end in states:
+            yield node
+            if len(states) == 1:
+                continue
+
+        if len(states) == 1 and parts[states[0]][0] != _DESCENDANTS:
+            # Single literal or wildcard component, where named children can be looked up directly
+            kind, argument = parts[states[0]]
+            next_states = _closure(parts, (states[0] + 1,))
+            matches = _match_children(node, kind, argument)
+            stack.extend([(child, next_states) for child in reversed(matches)])
+            continue
+
+        children = _children(node)
+        in_array = isinstance(node, NodeArray)
+        matched = []
+        for position, child in enumerate(children):
+            child_states = _next_states(parts, states, child, position, len(children), in_array)
+            if child_states:
+                matched.append((child, child_states))
+        stack.extend(reversed(matched))
+
+
+def _indexed_candidates(start: Union[NodeBase, dict], node_type) -> Optional[list]:
+    # Only use type indices that have already been built, as building one walks the hierarchy
+    roots = start.values() if isinstance(start, dict) else [start.root]
+    if any(root._type_index is None for root in roots):
+        return None
+    return [node for root in roots for node in nodes_of_type(root, node_type, subclasses=True)]
+
+
+def _path_matches(parts: Tuple[tuple, ...], literal_count: int, start: Union[NodeBase, dict], node: NodeBase) -> bool:
+    # Collect the ancestors of the node up to the start of the search
+    chain = []
+    ancestor = node
+    while ancestor is not None and ancestor is not start:
+        chain.append(ancestor)
+        ancestor = ancestor.parent
+    if ancestor is None and not isinstance(start, dict):
+        return False
+
+    # Match each ancestor in turn from the start, in the same way as the search in query
+    states = _closure(parts, (literal_count,))
+    for child in reversed(chain):
+        parent = child.parent
+        in_array = isinstance(parent, NodeArray)
+        position = int(child.name[1:-1]) if in_array else None
+        count = len(parent.children) if in_array else None
+        states = _next_states(parts, states, child, position, count, in_array)
+        if not states:
+            return False
+    return len(parts) in states
+
+
+def _next_states(parts: Tuple[tuple, ...], states: Tuple[int, ...], child: NodeBase, position: int, count: int,
+                 in_array: bool) -> Tuple[int, ...]:
+    # The pattern components active for a child, given those active for its parent
+    child_states = set()
+    for state in states:
+        if state == len(parts):
+            continue
+        kind, argument = parts[state]
+        if kind == _DESCENDANTS:
+            child_states.add(state)
+        elif _child_matches(kind, argument, child, position, count, in_array):
+            child_states.add(state + 1)
+    return _closure(parts, child_states) if child_states else ()
+
+
+def _closure(parts: Tuple[tuple, ...], states) -> Tuple[int, ...]:
+    # A ** component may match no levels, so the component after it is also active
+    closure = set(states)
+    for state in states:
+        while state < len(parts) and parts[state][0] == _DESCENDANTS:
+            state += 1
+            closure.add(state)
+    return tuple(sorted(closure))
+
+
+def _child_matches(kind: str, argument, child: NodeBase, position: int, count: int, in_array: bool) -> bool:
+    if in_array:
+        if kind == _INDEX:
+            return position == (argument + count if argument < 0 else argument)
+        if kind == _INDEX_RANGE:
+            return position in range(*argument.indices(count))
+        return False
+
+    if kind == _NAME:
+        return child.name == argument
+    if kind == _ANY_NAME:
+        return True
+    if kind == _NAME_MATCH:
+        return fnmatchcase(child.name, argument)
+    return False
+
+
+def _resolve_literal(root: Union[Node, dict], parts: Tuple[tuple, ...]):
+    if not parts:
+        return root
+
+    # Look up the full path in the path index, which only fails for non-canonical paths, e.g. of
+    # nodes that are not created yet by a lazy import, or missing nodes
+    path = _format_parts(parts)
+    if isinstance(root, dict):
+        # Nodes in the dict need not be roots, so the full path is from the node's own path
+        top = root.get(parts[0][1]) if parts[0][0] == _NAME else None
+        node = path_index(top.root).get(top.path() + path[len(parts[0][1]):]) if top is not None else None
+    else:
+        full_path = root.path() + path if path.startswith('[') else f'{root.path()}.{path}'
+        node = path_index(root.root).get(full_path)
+    if node is not None:
+        return node
+
+    node = root
+    for kind, argument in parts:
+        matches = _match_children(node, kind, argument)
+        if not matches:
+            return None
+        node = matches[0]
+    return node
+
+
+def _children(node: Union[NodeBase, dict]) -> list:
+    if isinstance(node, dict):
+        return list(node.values())
+    if isinstance(node, NodeContainer):
+        return node.children
+    return []
+
+
+def _match_children(node: Union[NodeBase, dict], kind: str, argument) -> list:
+    if kind == _NAME:
+        return _match_name(node, argument)
+    if kind in (_ANY_NAME, _NAME_MATCH):
+        return _match_any_name(node, kind, argument)
+    return _match_index(node, kind, argument)
+
+
+def _match_name(node: Union[NodeBase, dict], name: str) -> list:
+    if isinstance(node, dict):
+        child = node.get(name)
+        return [child] if child is not None else []
+    if isinstance(node, Node):
+        try:
+            return [node[name]]
+        except NodeException:
+            return []
+    return []
+
+
+def _match_any_name(node: Union[NodeBase, dict], kind: str, argument) -> list:
+    if isinstance(node, NodeArray):
+        return []
+    children = _children(node)
+    if kind == _NAME_MATCH:
+        children = [child for child in children if fnmatchcase(child.name, argument)]
+    return children
+
+
+def _match_index(node: NodeBase, kind: str, argument) -> list:
+    # Select elements of node arrays by index, where negative indices count from the end
+    if not isinstance(node, NodeArray):
+        return []
+    children = node.children
+    if kind == _INDEX:
+        return [children[argument]] if -len(children) <= argument < len(children) else []
+    return children[argument]
+
+
+@lru_cache(maxsize=1024)
+def _parse_pattern(pattern: str) -> Tuple[tuple, ...]:
+    """
+    Split a pattern into a tuple of components, each a tuple of the component kind and its
+    argument, e.g. "a[*].**" is ((_NAME, "a"), (_INDEX_RANGE, slice(None)), (_DESCENDANTS, None)).
+    """
+    parts = []
+    for dotted in pattern.split('.'):
+        name, *brackets = dotted.split('[')
+        if name:
+            parts.append(_parse_name(name, pattern))
+        elif not brackets:
+            raise QueryException(f"Empty name in query pattern '{pattern}'")
+
+        for bracket in brackets:
+            if not bracket.endswith(']'):
+                raise QueryException(f"Unclosed bracket in query pattern '{pattern}'")
+            parts.append(_parse_index(bracket[:-1], pattern))
+
+    # Consecutive ** components are equivalent to one
+    return tuple(
+        part for index, part in enumerate(parts)
+        if part[0] != _DESCENDANTS or index == 0 or parts[index - 1][0] != _DESCENDANTS
+    )
+
+
+def _parse_name(name: str, pattern: str) -> tuple:
+    if name == '**':
+        return _DESCENDANTS, None
+    if name == '*':
+        return _ANY_NAME, None
+    if '**' in name:
+        raise QueryException(f"'**' must be a whole name in query pattern '{pattern}'")
+    if any(char in name for char in '*?'):
+        return _NAME_MATCH, name
+    return _NAME, name
+
+
+def _parse_index(text: str, pattern: str) -> tuple:
+    if text == '*':
+        return _INDEX_RANGE, slice(None)
+    try:
+        if ':' in text:
+            start, stop = text.split(':')
+            return _INDEX_RANGE, slice(int(start) if start else None, int(stop) if stop else None)
+        return _INDEX, int(text)
+    except ValueError:
+        raise QueryException(f"Invalid index '[{text}]' in query pattern '{pattern}'")
+
+
+def _format_parts(parts: Tuple[tuple, ...]) -> str:
+    # Format literal components back into a path, as keyed in the path index
+    path = ''
+    for kind, argument in parts:
+        if kind == _INDEX:
+            path += f'[{argument}]'
+        else:
+            path += f'.{argument}' if path else argument
+    return path
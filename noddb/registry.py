@@ -0,0 +1,31 @@
+from typing import List
+
+from .node import NodeBase
+from .std_value import standard_value_types
+
+
+class ExportException(Exception):
+    """
+    Export exceptions are raised when unexpected data types are detected whilst traversing
+    the node hierarchy.
+    """
+    pass
+
+
+class ImportException(Exception):
+    """
+    Exception for unexpected types during import. If encountering this error, ensure that
+    your registry custom_nodes contains all the types you are expecting.
+    """
+    pass
+
+
+class Registry:
+    """
+    Common base for registries of the node types that an application can import and export,
+    whatever the persistent format. The registry always contains the standard value types,
+    and container types Node and NodeArray are implicitly supported. Any custom node types
+    must be passed in, e.g. JsonRegistry([FooNode, BarNode, CustomNode]).
+    """
+    def __init__(self, custom_types: List[NodeBase] = []):
+        self.type_dict = {typ.__name__: typ for typ in custom_types + standard_value_types()}
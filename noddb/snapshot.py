@@ -0,0 +1,229 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import List, Tuple, Union
+
+from .binary import _ARRAY, _BOOL, _FLOAT, _INT, _SKIP, _STR, _ValueCollector, _stored_values
+from .node import NodeBase
+from .observer import _notified_observers
+from .value import ValueBase
+
+_MAGIC = b'NODDBSNP'
+_VERSION = 1
+
+# Magic, version, byte order, value count, heap size and topology fingerprint, padded to 64 bytes
+_HEADER = struct.Struct('=8sBBxxIQ32s8x')
+_LITTLE_ENDIAN = 0
+_BIG_ENDIAN = 1
+
+_ALIGNMENT = 8
+
+
+class SnapshotException(Exception):
+    """
+    Raised when values cannot be stored in a snapshot, or when a snapshot does not match the
+    topology it is being loaded into.
+    """
+    pass
+
+
+def save_snapshot(nodes: Union[NodeBase, list], path: Union[str, os.PathLike]) -> None:
+    """
+    Save the values of all inputs and outputs under nodes to a snapshot file. Only values are
+    stored; the same topology must be rebuilt, e.g. by importing json, before loading.
+
+    The file is laid out as fixed-width columns in native byte order, so that it can be mapped
+    into memory and read without parsing:
+     - A header with the value count and a fingerprint of the topology.
+     - A column of one byte per value for its kind, i.e. int, float, bool, string or array.
+     - A column of 8 bytes per value holding ints, bools and floats directly, or the offset of
+       strings and arrays in the heap.
+     - A column of 8 bytes per value for the byte length of strings and arrays in the heap.
+     - The heap, with arrays aligned to 8 bytes and prefixed with their typecode.
+    Sourced inputs are skipped as their values come from their sources.
+    :param nodes: Root node or list of root nodes
+    :param path: File path to write snapshot to
+    """
+    values = _collect_values(nodes)
+    count = len(values)
+    kinds = bytearray(count)
+    slots = bytearray(count * 8)
+    lengths = array('q', bytes(count * 8))
+    int_slots = memoryview(slots).cast('q')
+    float_slots = memoryview(slots).cast('d')
+    heap = bytearray()
+
+    try:
+        # The kind of each value determines how its fixed-width slot is interpreted
+        for index, kind, stored in _stored_values(values, SnapshotException, 'snapshot'):
+            kinds[index] = kind
+            if kind == _FLOAT:
+                float_slots[index] = stored
+            elif kind == _STR:
+                data = stored.encode('utf-8')
+                int_slots[index] = len(heap)
+                lengths[index] = len(data)
+                heap += data
+            elif kind == _ARRAY:
+                heap += bytes(-len(heap) % _ALIGNMENT)
+                heap += stored.typecode.encode('ascii').ljust(_ALIGNMENT, b'\0')
+                int_slots[index] = len(heap)
+                lengths[index] = len(stored) * stored.itemsize
+                heap += stored.tobytes()
+            else:
+                int_slots[index] = stored
+    finally:
+        int_slots.release()
+        float_slots.release()
+
+    byte_order = _LITTLE_ENDIAN if sys.byteorder == 'little' else _BIG_ENDIAN
+    with open(path, 'wb') as fp:
+        fp.write(_HEADER.pack(_MAGIC, _VERSION, byte_order, count, len(heap), _fingerprint(values)))
+        fp.write(kinds)
+        fp.write(bytes(-count % _ALIGNMENT))
+        fp.write(slots)
+        fp.write(lengths.tobytes())
+        fp.write(heap)
+
+
+def load_snapshot(nodes: Union[NodeBase, list], path: Union[str, os.PathLike]) -> None:
+    """
+    Restore values saved with save_snapshot into the same topology. The file is memory-mapped and
+    its columns are bound to the values in bulk, bypassing the per-value type checks in
+    set_value, which is safe because the topology fingerprint must match. Observers are still
+    notified of each value that is set, and push-mode outputs update their inputs.
+    :param nodes: Root node or list of root nodes, matching those the snapshot was saved from
+    :param path: File path of snapshot
+    """
+    values = _collect_values(nodes)
+    with open(path, 'rb') as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            _bind_values(values, view)
+        finally:
+            view.release()
+
+
+def _bind_values(values: List[ValueBase], view: memoryview):
+    count, heap_size = _read_header(values, view)
+    kinds_start = _HEADER.size
+    slots_start = kinds_start + count + (-count % _ALIGNMENT)
+    lengths_start = slots_start + count * 8
+    heap_start = lengths_start + count * 8
+    if len(view) < heap_start + heap_size:
+        raise SnapshotException('Snapshot is truncated')
+
+    # Convert the kind column at once, then decode each slot only as its kind
+    kinds = view[kinds_start:kinds_start + count].tolist()
+    int_slots = view[slots_start:lengths_start].cast('q')
+    float_slots = view[slots_start:lengths_start].cast('d')
+    lengths = view[lengths_start:heap_start].cast('q')
+    heap = view[heap_start:heap_start + heap_size]
+
+    try:
+        for index, (value, kind) in enumerate(zip(values, kinds)):
+            if kind == _SKIP:
+                continue
+            elif kind == _INT:
+                stored = int_slots[index]
+            elif kind == _FLOAT:
+                stored = float_slots[index]
+            elif kind == _BOOL:
+                stored = bool(int_slots[index])
+            else:
+                stored = _read_heap(value, kind, heap, int_slots[index], lengths[index])
+            _bind_value(value, stored)
+    finally:
+        int_slots.release()
+        float_slots.release()
+        lengths.release()
+        heap.release()
+
+
+def _read_header(values: List[ValueBase], view: memoryview) -> Tuple[int, int]:
+    """
+    Check that the header of a snapshot matches the values it is loaded into.
+    :return: Value count and heap size
+    """
+    if len(view) < _HEADER.size or bytes(view[:len(_MAGIC)]) != _MAGIC:
+        raise SnapshotException('Expecting snapshot to start with NODDBSNP header')
+
+    magic, version, byte_order, count, heap_size, fingerprint = _HEADER.unpack_from(view)
+    if version != _VERSION:
+        raise SnapshotException(f'Unsupported snapshot version {version}')
+    if byte_order != (_LITTLE_ENDIAN if sys.byteorder == 'little' else _BIG_ENDIAN):
+        raise SnapshotException('Snapshot was saved with a different byte order')
+    if count != len(values) or fingerprint != _fingerprint(values):
+        raise SnapshotException('Snapshot does not match the topology of the nodes')
+    return count, heap_size
+
+
+def _read_heap(value: ValueBase, kind: int, heap: memoryview, offset: int, length: int) -> Union[str, array]:
+    """
+    Read a string, or an array following its typecode, from the heap.
+    """
+    if kind != _STR and kind != _ARRAY:
+        raise SnapshotException(f'Snapshot contains invalid kind {kind} for "{value.path()}"')
+    start = offset - _ALIGNMENT if kind == _ARRAY else offset
+    if start < 0 or length < 0 or offset + length > len(heap):
+        raise SnapshotException(
+            f'Snapshot heap offset {offset} and length {length} of "{value.path()}" are out of bounds'
+        )
+
+    try:
+        if kind == _STR:
+            return str(heap[offset:offset + length], 'utf-8')
+        stored = array(chr(heap[start]))
+        stored.frombytes(heap[offset:offset + length])
+        return stored
+    except ValueError as e:
+        # Includes invalid utf-8, array typecodes, and lengths that are not a multiple of the item size
+        raise SnapshotException(f'Snapshot contains an invalid value for "{value.path()}": {e}') from e
+
+
+def _bind_value(value: ValueBase, stored):
+    """
+    Set a value without checking its type, as the topology matches the snapshot.
+    """
+    old_value = value._value
+    value._value = stored
+    if value.is_output() and value._push:
+        for input_value in value._dependents or ():
+            input_value._value = stored
+
+    for observer in _notified_observers():
+        observer.on_set_value(value, old_value)
+
+
+def _collect_values(nodes: Union[NodeBase, list]) -> List[ValueBase]:
+    # Allow roots to be a single node or list of nodes
+    if isinstance(nodes, NodeBase):
+        nodes = [nodes]
+
+    values = []
+    collector = _ValueCollector(values)
+    for node in nodes:
+        node.visit(collector)
+    return values
+
+
+def _fingerprint(values: List[ValueBase]) -> bytes:
+    """
+    Hash of the type and source of every value in visiting order, so that a snapshot is only ever
+    loaded into the topology it was saved from. Sources are hashed by their index in the values
+    rather than by path, as the fingerprint is computed on every load.
+    """
+    indices = {value: index for index, value in enumerate(values)}
+    sources = array('q', [-1]) * len(values)
+    for index, value in enumerate(values):
+        if value.is_input() and value._source is not None:
+            # Sources outside the saved nodes are only known to exist
+            sources[index] = indices.get(value._source, -2)
+
+    digest = hashlib.sha256()
+    digest.update(' '.join([type(value).__name__ for value in values]).encode('utf-8'))
+    digest.update(sources.tobytes())
+    return digest.digest()
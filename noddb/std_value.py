@@ -1,47 +1,95 @@
+from array import array
+from typing import Iterable
+
 from .node import NodeBase
 from .value import InputValue, OutputValue
+from .value_array import InputValueArray, OutputValueArray
 
 
 class OutputInt(OutputValue):
+    __slots__ = ()
+
     def __init__(self, node: NodeBase, name: str, value: int = 0):
         super().__init__(node, name, int(value))
 
 
 class OutputFloat(OutputValue):
+    __slots__ = ()
+
     def __init__(self, node: NodeBase, name: str, value: float = 0.0):
         super().__init__(node, name, float(value))
 
 
 class OutputString(OutputValue):
+    __slots__ = ()
+
     def __init__(self, node: NodeBase, name: str, value: str = ''):
         super().__init__(node, name, str(value))
 
 
 class OutputBool(OutputValue):
+    __slots__ = ()
+
     def __init__(self, node: NodeBase, name: str, value: bool = False):
         super().__init__(node, name, bool(value))
 
 
 class InputInt(InputValue):
+    __slots__ = ()
+
     def __init__(self, node: NodeBase, name: str, value: int = 0):
         super().__init__(node, name, int(value))
 
 
 class InputFloat(InputValue):
+    __slots__ = ()
+
     def __init__(self, node: NodeBase, name: str, value: float = 0.0):
         super().__init__(node, name, float(value))
 
 
 class InputString(InputValue):
+    __slots__ = ()
+
     def __init__(self, node: NodeBase, name: str, value: str = ''):
         super().__init__(node, name, str(value))
 
 
 class InputBool(InputValue):
+    __slots__ = ()
+
     def __init__(self, node: NodeBase, name: str, value: bool = False):
         super().__init__(node, name, bool(value))
 
 
+class OutputIntArray(OutputValueArray):
+    __slots__ = ()
+
+    def __init__(self, node: NodeBase, name: str, values: Iterable[int] = ()):
+        super().__init__(node, name, array('q', values))
+
+
+class OutputFloatArray(OutputValueArray):
+    __slots__ = ()
+
+    def __init__(self, node: NodeBase, name: str, values: Iterable[float] = ()):
+        super().__init__(node, name, array('d', values))
+
+
+class InputIntArray(InputValueArray):
+    __slots__ = ()
+
+    def __init__(self, node: NodeBase, name: str, values: Iterable[int] = ()):
+        super().__init__(node, name, array('q', values))
+
+
+class InputFloatArray(InputValueArray):
+    __slots__ = ()
+
+    def __init__(self, node: NodeBase, name: str, values: Iterable[float] = ()):
+        super().__init__(node, name, array('d', values))
+
+
 def standard_value_types():
     return [
         OutputInt,
@@ -51,5 +99,9 @@ def standard_value_types():
         InputInt,
         InputFloat,
         InputString,
-        InputBool
+        InputBool,
+        OutputIntArray,
+        OutputFloatArray,
+        InputIntArray,
+        InputFloatArray
     ]
@@ -0,0 +1,249 @@
+from __future__ import annotations
+from array import array
+from typing import List, Optional
+
+from .observer import Observer, add_observer, remove_observer
+
+# Kinds of operation in a transaction's log, each a tuple of the kind followed by its arguments:
+#  (_SET_VALUE, value, old_value, new_value)
+#  (_SET_ELEMENT, value, index, old_element, new_element)
+#  (_SET_SOURCE, input, old_source, new_source, value before connecting or None)
+#  (_ADD_CHILD, node)
+#  (_REMOVE_CHILD, node, index it was removed from)
+_SET_VALUE = 0
+_SET_ELEMENT = 1
+_SET_SOURCE = 2
+_ADD_CHILD = 3
+_REMOVE_CHILD = 4
+
+
+class TransactionException(Exception):
+    """
+    Raised when a transaction or history is used whilst in the wrong state, e.g. undoing a
+    transaction that is still open, or when there is nothing to undo.
+    """
+    pass
+
+
+class Transaction:
+    """
+    A transaction records the changes made to any nodes whilst it is open as a context manager,
+    so that they can be undone and redone. If an exception is raised inside the transaction then
+    its changes are rolled back before the exception propagates, e.g.
+
+        with Transaction('Connect gain') as transaction:
+            gain >> mixer['gain']
+            mixer['level'].set_value(0.5)
+        transaction.undo()
+
+    Setting values and elements, connecting and disconnecting inputs, and creating nodes are each
+    recorded as a small operation holding the old and new state, so the cost of recording and of
+    undo and redo depends only on the size of the change, not on the size of the graph. Repeated
+    sets of the same value in a row are recorded as one operation, e.g. whilst dragging a slider.
+
+    Undo and redo replay the operations with the usual methods, such as set_value, so observers
+    and incremental evaluators see the changes. Operations must be undone in the reverse order to
+    which they were made, so transactions are normally kept in a History rather than used alone.
+    """
+    def __init__(self, name: str = '', history: Optional[History] = None):
+        self.name = name
+        self._history = history
+        self._operations = []
+        self._log = None
+
+    def __enter__(self) -> Transaction:
+        if self._log is not None:
+            raise TransactionException(f"Transaction '{self.name}' is already open")
+        self._log = _OperationLog(self._operations)
+        add_observer(self._log)
+        if self._history is not None:
+            self._history._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        remove_observer(self._log)
+        self._log = None
+        if self._history is not None:
+            self._history._depth -= 1
+
+        if exc_type is not None:
+            self.undo()
+            self._operations.clear()
+        elif self._history is not None and self._history._depth == 0 and self._operations:
+            # Nested transactions of the same history are recorded as part of the outermost
+            self._history._push(self)
+        return False
+
+    def __len__(self) -> int:
+        return len(self._operations)
+
+    def undo(self) -> None:
+        """
+        Revert the changes made in the transaction, most recent first.
+        """
+        self._check_closed('undo')
+        for operation in reversed(self._operations):
+            _undo_operation(operation)
+
+    def redo(self) -> None:
+        """
+        Make the changes in the transaction again after they have been undone.
+        """
+        self._check_closed('redo')
+        for operation in self._operations:
+            _redo_operation(operation)
+
+    def _check_closed(self, action: str):
+        if self._log is not None:
+            raise TransactionException(f"Cannot {action} transaction '{self.name}' whilst it is open")
+
+
+class History:
+    """
+    Stacks of transactions that can be undone and redone in turn, e.g. for an editor.
+
+        history = History()
+        with history.transaction('Add voice'):
+            Voice(voices)
+        history.undo()
+        history.redo()
+
+    Committing a new transaction clears anything that could be redone. Transactions opened whilst
+    another of the same history is open are part of the outer transaction, and are only added to
+    the history when the outermost closes. Changes made outside of a transaction are not
+    recorded, so should not conflict with the changes in the history, e.g. by connecting values
+    of a node that undo would remove.
+    """
+    def __init__(self, limit: Optional[int] = 100):
+        """
+        :param limit: Maximum number of transactions that can be undone, or None for unlimited
+        """
+        self.limit = limit
+        self._undo_stack: List[Transaction] = []
+        self._redo_stack: List[Transaction] = []
+        self._depth = 0
+
+    def transaction(self, name: str = '') -> Transaction:
+        """
+        Create a transaction that is added to this history when closed without an exception.
+        :param name: Description of the change, e.g. for an undo menu
+        :return: Transaction to open as a context manager
+        """
+        return Transaction(name, self)
+
+    def can_undo(self) -> bool:
+        return bool(self._undo_stack)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo_stack)
+
+    def undo(self) -> Transaction:
+        """
+        Undo the most recent transaction.
+        :return: Transaction that was undone
+        """
+        self._check_closed('undo')
+        if not self._undo_stack:
+            raise TransactionException('Nothing to undo')
+        transaction = self._undo_stack.pop()
+        transaction.undo()
+        self._redo_stack.append(transaction)
+        return transaction
+
+    def redo(self) -> Transaction:
+        """
+        Redo the most recently undone transaction.
+        :return: Transaction that was redone
+        """
+        self._check_closed('redo')
+        if not self._redo_stack:
+            raise TransactionException('Nothing to redo')
+        transaction = self._redo_stack.pop()
+        transaction.redo()
+        self._undo_stack.append(transaction)
+        return transaction
+
+    def clear(self) -> None:
+        self._undo_stack.clear()
+        self._redo_stack.clear()
+
+    def _check_closed(self, action: str):
+        if self._depth:
+            raise TransactionException(f'Cannot {action} whilst a transaction is open')
+
+    def _push(self, transaction: Transaction):
+        self._undo_stack.append(transaction)
+        self._redo_stack.clear()
+        if self.limit is not None and len(self._undo_stack) > self.limit:
+            del self._undo_stack[0]
+
+
+class _OperationLog(Observer):
+    """
+    Appends an operation to a transaction's log for each change whilst the transaction is open.
+    """
+    def __init__(self, operations: list):
+        self.operations = operations
+
+    def on_set_value(self, value, old_value):
+        new_value = value._value
+        if isinstance(new_value, array):
+            # Arrays may be modified in place afterwards, e.g. by set_element
+            new_value = array(new_value.typecode, new_value)
+
+        operations = self.operations
+        if operations and operations[-1][0] == _SET_VALUE and operations[-1][1] is value:
+            operations[-1] = (_SET_VALUE, value, operations[-1][2], new_value)
+        else:
+            operations.append((_SET_VALUE, value, old_value, new_value))
+
+    def on_set_element(self, value, index, old_element):
+        self.operations.append((_SET_ELEMENT, value, index, old_element, value._value[index]))
+
+    def on_set_source(self, value, old_source):
+        # The stored value of a newly connected input is restored when it is disconnected by undo
+        unsourced_value = value._value if old_source is None else None
+        self.operations.append((_SET_SOURCE, value, old_source, value._source, unsourced_value))
+
+    def on_add_child(self, node):
+        self.operations.append((_ADD_CHILD, node))
+
+    def on_remove_child(self, node, parent, index):
+        self.operations.append((_REMOVE_CHILD, node, index))
+
+
+def _undo_operation(operation: tuple):
+    kind = operation[0]
+    if kind == _SET_VALUE:
+        operation[1].set_value(operation[2])
+    elif kind == _SET_ELEMENT:
+        operation[1].set_element(operation[2], operation[3])
+    elif kind == _SET_SOURCE:
+        _reconnect(operation[1], operation[2], operation[4])
+    elif kind == _ADD_CHILD:
+        operation[1]._detach()
+    elif kind == _REMOVE_CHILD:
+        operation[1]._restore(operation[2])
+
+
+def _redo_operation(operation: tuple):
+    kind = operation[0]
+    if kind == _SET_VALUE:
+        operation[1].set_value(operation[3])
+    elif kind == _SET_ELEMENT:
+        operation[1].set_element(operation[2], operation[4])
+    elif kind == _SET_SOURCE:
+        _reconnect(operation[1], operation[3], None)
+    elif kind == _ADD_CHILD:
+        operation[1]._restore()
+    elif kind == _REMOVE_CHILD:
+        operation[1]._detach()
+
+
+def _reconnect(input_value, source, unsourced_value):
+    if input_value.is_sourced():
+        input_value.clear_source()
+    if source is not None:
+        input_value.set_source(source)
+    elif unsourced_value is not None and input_value._value != unsourced_value:
+        input_value.set_value(unsourced_value)
@@ -1,5 +1,7 @@
 from __future__ import annotations
-from .node import Node, NodeBase, NodeContainer
+from typing import List
+from .node import _VISIT_INPUT, _VISIT_OUTPUT, Node, NodeBase, NodeContainer, NodeException
+from .observer import _notified_observers
 from .visitor import Visitor
 
 
@@ -17,11 +19,26 @@ class ValueBase(Node):
     derives from Node to inherit the parent-child behaviour. Concrete values
     are either inputs or outputs, which have different behaviour for setting
     values and for connectability.
+
+    Values are always leaves of the hierarchy, so unlike other nodes they do not allocate
+    a dictionary for children.
     """
+    __slots__ = ('_value',)
+
     def __init__(self, node: NodeContainer, name: str, value):
-        super().__init__(parent=node, name=name)
+        NodeBase.__init__(self, parent=node, name=name)
         self._value = value
 
+    @property
+    def children(self):
+        return []
+
+    def _add_child(self, child: NodeBase):
+        raise NodeException(f'Values cannot have children: {child.typename} added to {self.path()}')
+
+    def __getitem__(self, child_name: str):
+        raise NodeException(f"Value {self.path()} does not have child '{child_name}'")
+
     def is_input(self):
         return False
 
@@ -32,6 +49,19 @@ class ValueBase(Node):
         return self._value
 
     def set_value(self, value):
+        value = self._checked_value(value)
+        old_value = self._value
+        self._store_value(value)
+
+        for observer in _notified_observers():
+            observer.on_set_value(self, old_value)
+
+    def _checked_value(self, value):
+        """
+        Validate a value before it is set, without changing anything.
+        :param value: Value to set
+        :return: Value to store, which derived classes may convert
+        """
         if type(self._value) != type(value):
             raise ValueException(
                 'Cannot set "{}" ({}) to mismatched value {} ({})'.format(
@@ -41,6 +71,9 @@ class ValueBase(Node):
                     type(value).__name__
                 )
             )
+        return value
+
+    def _store_value(self, value):
         self._value = value
 
 
@@ -48,13 +81,51 @@ class OutputValue(ValueBase):
     """
     An output is a value that has a right shift >> operator so it may be
     connected to any number of inputs, overriding their value.
+
+    Outputs keep track of the inputs sourced from them. By default those inputs pull the
+    output value whenever they are read. In push mode the output instead writes its value
+    into all of its inputs when set, so that reading an input is just a lookup.
     """
+    __slots__ = ('_dependents', '_push')
+    _visit_kind = _VISIT_OUTPUT
+
+    def __init__(self, node: NodeBase, name: str, value):
+        super().__init__(node, name, value)
+        # Dictionary of dependent inputs, used as an ordered set, allocated on first connection
+        self._dependents = None
+        self._push = False
+
     def visit(self, visitor: Visitor):
         visitor.on_output(self)
 
     def is_output(self):
         return True
 
+    def _store_value(self, value):
+        self._value = value
+        if self._push:
+            for input_value in self._dependents or ():
+                input_value._value = value
+
+    def dependents(self) -> List[InputValue]:
+        """
+        :return: Inputs that are sourced from this output, in the order they were connected
+        """
+        return list(self._dependents or ())
+
+    def is_push(self):
+        return self._push
+
+    def set_push(self, push: bool):
+        """
+        Enable or disable push mode, where setting this output immediately updates its inputs.
+        :param push: True to push values to inputs, False for inputs to pull values when read
+        """
+        self._push = push
+        if push:
+            for input_value in self._dependents or ():
+                input_value._value = self._value
+
     def __rshift__(self, input_value: InputValue):
         input_value.set_source(self)
 
@@ -65,6 +136,9 @@ class InputValue(ValueBase):
     specific output. This 'sourcing' of the the input value allows data
     to flow through the node-value graph.
     """
+    __slots__ = ('_source',)
+    _visit_kind = _VISIT_INPUT
+
     def __init__(self, node: NodeBase, name: str, value):
         super().__init__(node, name, value)
         self._source = None
@@ -76,11 +150,12 @@ class InputValue(ValueBase):
         return True
 
     def value(self):
-        if self._source:
-            self._value = self._source.value()
+        source = self._source
+        if source is not None and not source._push:
+            self._value = source.value()
         return self._value
 
-    def set_value(self, value):
+    def _checked_value(self, value):
         if self._source:
             raise ValueException(
                 'Cannot set "{}" whilst sourced from "{}"'.format(
@@ -88,7 +163,7 @@ class InputValue(ValueBase):
                     self._source.path()
                 )
             )
-        super().set_value(value)
+        return super()._checked_value(value)
 
     def is_sourced(self):
         return self._source is not None
@@ -99,6 +174,23 @@ class InputValue(ValueBase):
         return None
 
     def set_source(self, output: OutputValue):
+        self._check_source(output)
+        old_value = self._value
+        self._connect(output)
+        NodeBase._topology_revision += 1
+
+        # A push-mode output overwrites the stored value of the input, which is notified first
+        # so that the value before connecting can be restored, e.g. by undo
+        for observer in _notified_observers():
+            if self._value is not old_value:
+                observer.on_set_value(self, old_value)
+            observer.on_set_source(self, None)
+
+    def _check_source(self, output: OutputValue):
+        """
+        Validate that this input can be sourced from an output, without changing anything.
+        :param output: Output to source from
+        """
         if not output.is_output():
             raise ValueException(f'Cannot source from non-output "{output.path()}"')
 
@@ -120,12 +212,25 @@ class InputValue(ValueBase):
                     type(output._value).__name__
                 )
             )
+
+    def _connect(self, output: OutputValue):
         self._source = output
+        if output._dependents is None:
+            output._dependents = {}
+        output._dependents[self] = None
+        if output._push:
+            self._value = output._value
 
     def clear_source(self):
         if not self._source:
             raise ValueException(f'Cannot clear source on non-connected input "{self.path()}"')
+        old_source = self._source
+        del old_source._dependents[self]
         self._source = None
+        NodeBase._topology_revision += 1
+
+        for observer in _notified_observers():
+            observer.on_set_source(self, old_source)
 
     def __lshift__(self, output_value: OutputValue):
         self.set_source(output_value)
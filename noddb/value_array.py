@@ -0,0 +1,200 @@
+from __future__ import annotations
+from array import array
+
+from .node import NodeException
+from .observer import _notified_observers
+from .value import InputValue, OutputValue, ValueBase, ValueException
+
+
+class ValueArray(ValueBase):
+    """
+    Abstract base for a value storing a homogeneous array of numbers in a contiguous
+    array.array buffer, rather than as a NodeArray of individual values. The whole array is a
+    single value, so it is set, sourced and serialised in one go, but elements may also be
+    addressed by index, e.g. path_to_node(root, 'foo.bar[3]').set_value(1.0).
+
+    The typecode of the buffer determines the type of the elements, e.g. 'q' for ints or 'd'
+    for floats, and is checked strictly in the same way as other values. The buffer supports
+    the buffer protocol, so may be wrapped without copying for whole-array operations.
+    """
+    __slots__ = ()
+
+    @property
+    def typecode(self) -> str:
+        return self._value.typecode
+
+    def element_type(self) -> type:
+        return float if self._value.typecode in 'fd' else int
+
+    def _checked_value(self, value):
+        # Always copy, so that the buffer is never shared with the caller
+        try:
+            value = array(self._value.typecode, value)
+        except (TypeError, OverflowError):
+            raise ValueException(
+                'Cannot set "{}" ({}) to mismatched value {} ({})'.format(
+                    self.path(),
+                    _array_typename(self._value),
+                    value,
+                    type(value).__name__
+                )
+            )
+        return super()._checked_value(value)
+
+    def set_element(self, index: int, value) -> None:
+        """
+        Set a single element of the array in place.
+        :param index: Index of element
+        :param value: Value of element, matching the element type exactly
+        """
+        self._store_element(index, self._checked_element(index, value))
+
+    def _checked_element(self, index: int, value):
+        """
+        Check that an element may be set to a value, without setting it, e.g. so that many
+        elements and values can be checked before any are set.
+        :return: Value to store
+        """
+        self._check_index(index)
+        element_type = self.element_type()
+        if type(value) != element_type:
+            raise ValueException(
+                'Cannot set "{}[{}]" ({}) to mismatched value {} ({})'.format(
+                    self.path(),
+                    index,
+                    element_type.__name__,
+                    value,
+                    type(value).__name__
+                )
+            )
+        if element_type is int:
+            try:
+                array(self._value.typecode, (value,))
+            except OverflowError:
+                raise ValueException(
+                    'Cannot set "{}[{}]" ({}) to out of range value {}'.format(
+                        self.path(),
+                        index,
+                        _array_typename(self._value),
+                        value
+                    )
+                )
+        return value
+
+    def _store_element(self, index: int, value):
+        old_element = self._value[index]
+        self._value[index] = value
+
+        for observer in _notified_observers():
+            observer.on_set_element(self, index, old_element)
+
+    def buffer(self) -> memoryview:
+        """
+        View the array buffer without copying, e.g. for numpy.frombuffer. The view is writable,
+        as read-only views need Python 3.8, but writing through it bypasses the type checks,
+        observers, transactions and push-mode updates of set_element, so should only be used
+        for reading.
+        :return: View of the array buffer
+        """
+        return memoryview(self.value())
+
+    def __getitem__(self, index: int) -> ValueArrayElement:
+        self._check_index(index)
+        return ValueArrayElement(self, index)
+
+    def _check_index(self, index: int):
+        if not isinstance(index, int) or index < 0 or index >= len(self._value):
+            raise NodeException(
+                f'ValueArray bounds error: {index} is not in 0-{len(self._value)} for {self.path()}'
+            )
+
+
+class ValueArrayElement:
+    """
+    Lightweight handle to one element of a ValueArray, so that elements may be addressed by
+    path in the same way as individual values.
+    """
+    __slots__ = ('_array_value', '_index')
+
+    def __init__(self, array_value: ValueArray, index: int):
+        self._array_value = array_value
+        self._index = index
+
+    @property
+    def name(self):
+        return f'[{self._index}]'
+
+    @property
+    def parent(self) -> ValueArray:
+        return self._array_value
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    def path(self):
+        return self._array_value.path() + self.name
+
+    def value(self):
+        return self._array_value.value()[self._index]
+
+    def set_value(self, value):
+        self._array_value.set_element(self._index, value)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ValueArrayElement) and
+            self._array_value is other._array_value and
+            self._index == other._index
+        )
+
+    def __hash__(self):
+        return hash((id(self._array_value), self._index))
+
+
+class OutputValueArray(ValueArray, OutputValue):
+    """
+    An output array, which may source input arrays with the same typecode. In pull mode,
+    sourced inputs read the output's buffer directly.
+    """
+    __slots__ = ()
+
+
+class InputValueArray(ValueArray, InputValue):
+    """
+    An input array, which may be sourced from an output array with the same typecode.
+    """
+    __slots__ = ()
+
+    def _checked_element(self, index: int, value):
+        if self._source:
+            raise ValueException(
+                'Cannot set "{}[{}]" whilst sourced from "{}"'.format(
+                    self.path(),
+                    index,
+                    self._source.path()
+                )
+            )
+        return super()._checked_element(index, value)
+
+    def _check_source(self, output: OutputValue):
+        if isinstance(output._value, array) and output._value.typecode != self._value.typecode:
+            raise ValueException(
+                'Cannot source "{}" ({}) to mismatched output "{}" ({})'.format(
+                    self.path(),
+                    _array_typename(self._value),
+                    output.path(),
+                    _array_typename(output._value)
+                )
+            )
+        super()._check_source(output)
+
+    def clear_source(self):
+        super().clear_source()
+
+        # Whilst sourced the input shares the output's buffer, so take a copy on disconnection
+        self._value = array(self._value.typecode, self._value)
+
+
+def _array_typename(value: array) -> str:
+    return f"array('{value.typecode}')"
@@ -9,11 +9,24 @@ class VisitorException(Exception):
     pass
 
 
+# Returned from on_node_enter or on_node_array_enter to skip the descendants of that node
+PRUNE = object()
+
+
 class Visitor:
+    """
+    Base class for visitors of a node hierarchy. Derived classes only need to override the
+    callbacks they are interested in; callbacks that are not overridden are skipped entirely
+    during traversal, rather than being called as no-ops.
+
+    Entering a node or node array may return PRUNE to skip its descendants, e.g. to stop at
+    custom nodes. The matching exit callback is still made, so enters and exits always pair up.
+    """
     def on_node_enter(self, node):
         """
         Callback when entering, or descending into, a node in hierarchy.
         :param node: node in hierarchy
+        :return: PRUNE to skip descendants of node, otherwise None
         """
         pass
 
@@ -28,6 +41,7 @@ class Visitor:
         """
         Callback when entering, or descending into, a node array.
         :param node: node in hierarchy
+        :return: PRUNE to skip descendants of node array, otherwise None
         """
         pass
 
@@ -53,3 +67,27 @@ class Visitor:
         :return:
         """
         pass
+
+
+_CALLBACK_NAMES = (
+    'on_node_enter',
+    'on_node_exit',
+    'on_node_array_enter',
+    'on_node_array_exit',
+    'on_input',
+    'on_output'
+)
+
+
+def _overridden_callbacks(visitor: Visitor) -> tuple:
+    """
+    Get the visitor's bound callbacks in the order of _CALLBACK_NAMES, with None in place of
+    any that are not overridden from Visitor, so that traversal can skip them.
+    """
+    callbacks = []
+    for name in _CALLBACK_NAMES:
+        callback = getattr(visitor, name)
+        if getattr(callback, '__func__', None) is getattr(Visitor, name):
+            callback = None
+        callbacks.append(callback)
+    return tuple(callbacks)
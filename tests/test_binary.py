@@ -0,0 +1,121 @@
+import json
+
+import pytest
+from pytest import approx
+
+from noddb.binary import BinaryRegistry, _SectionWriter
+from noddb.json import JsonRegistry
+from noddb.node import Node, NodeArray
+from noddb.registry import ExportException, ImportException
+from noddb.std_value import InputBool, InputFloat, InputInt, InputString, OutputBool, OutputFloat, OutputInt
+from noddb.std_value import InputFloatArray, OutputIntArray
+
+
+class CustomNode(Node):
+    def init_custom(self):
+        InputBool(self, 'inny', False)
+        OutputInt(self, 'outy', 2)
+
+
+def build_graph():
+    foo = Node(None, 'foo')
+    x = OutputBool(foo, 'x', True)
+    bar = NodeArray(foo, 'bar')
+    y = OutputInt(bar, None, -3)
+    etc = Node(bar)
+    fzz = CustomNode(bar)
+    z = InputInt(etc, 'z', 5)
+    last_arr = NodeArray(bar)
+    InputBool(last_arr, None, False)
+    last_bool = InputBool(last_arr, None, True)
+    InputString(etc, 'text', 'héllo')
+    InputFloat(etc, 'gain', 0.25)
+    OutputFloat(etc, 'level', 1e300)
+    InputFloatArray(etc, 'bank', [1.5, -2.5])
+    OutputIntArray(etc, 'counts', [1 << 40])
+    Node(foo, 'empty')
+    NodeArray(foo, 'empty_array')
+    y >> z
+    x >> fzz['inny']
+
+    extra_root = CustomNode(None, 'extra_root')
+    extra_root['outy'] >> last_bool
+    return [foo, extra_root]
+
+
+def test_binary_round_trip():
+    roots = build_graph()
+    registry = BinaryRegistry([CustomNode])
+    data = registry.export_binary(roots)
+    nodes = registry.import_binary(data)
+    assert list(nodes) == ['foo', 'extra_root']
+
+    json_registry = JsonRegistry([CustomNode])
+    assert json_registry.export_json(list(nodes.values())) == json_registry.export_json(roots)
+    assert nodes['foo']['bar'][1]['bank'].value().tolist() == approx([1.5, -2.5])
+    assert nodes['foo']['bar'][3][1].source() == nodes['extra_root']['outy']
+
+
+def test_binary_smaller_than_json():
+    root = Node(None, 'root')
+    voices = NodeArray(root, 'voices')
+    for index in range(200):
+        voice = CustomNode(voices)
+        InputFloat(Node(voices), 'gain', index / 3)
+        voice['outy'].set_value(index)
+
+    data = BinaryRegistry([CustomNode]).export_binary(root)
+    text = json.dumps(JsonRegistry([CustomNode]).export_json(root))
+    assert len(data) * 3 < len(text)
+
+
+def test_binary_errors():
+    with pytest.raises(ExportException) as excinfo:
+        BinaryRegistry().export_binary(CustomNode(None, 'custom'))
+    assert str(excinfo.value) == "Unexpected node type 'CustomNode' during export"
+
+    with pytest.raises(ExportException) as excinfo:
+        BinaryRegistry().export_binary(OutputInt(None, 'big', 1 << 64))
+    assert str(excinfo.value) == 'Cannot export "big", 18446744073709551616 does not fit in 64 bits'
+
+    out = OutputInt(None, 'out')
+    inp = InputInt(None, 'inp')
+    out >> inp
+    with pytest.raises(ExportException) as excinfo:
+        BinaryRegistry().export_binary(inp)
+    assert str(excinfo.value) == 'Cannot export source of "inp" from "out" outside exported nodes'
+
+    data = BinaryRegistry([CustomNode]).export_binary(build_graph())
+    with pytest.raises(ImportException) as excinfo:
+        BinaryRegistry().import_binary(data)
+    assert str(excinfo.value) == "Unexpected node type 'CustomNode' during import"
+
+    with pytest.raises(ImportException) as excinfo:
+        BinaryRegistry([CustomNode]).import_binary(data[:-5])
+    assert str(excinfo.value) == 'Binary data is truncated'
+
+    with pytest.raises(ImportException) as excinfo:
+        BinaryRegistry().import_binary(b'{"nodes": {}}')
+    assert str(excinfo.value) == 'Expecting binary data to start with NODDB header'
+
+
+def test_binary_corrupt_hierarchy():
+    def hierarchy(record_types, record_names, child_counts):
+        writer = _SectionWriter()
+        writer.write_strings(['Node', 'NodeArray'])
+        writer.write_strings(['root'])
+        writer.write_ints(record_types)
+        writer.write_ints(record_names)
+        writer.write_ints(child_counts)
+        return b'NODDB\x01' + writer.getvalue()
+
+    # Type and name indices out of range, a container without a child count, and missing children
+    for data in (
+        hierarchy([0, 2], [1, 0], [1]),
+        hierarchy([0], [2], [0]),
+        hierarchy([1, 1], [1, 0], [1]),
+        hierarchy([0], [1], [2])
+    ):
+        with pytest.raises(ImportException) as excinfo:
+            BinaryRegistry().import_binary(data)
+        assert str(excinfo.value) == 'Binary hierarchy is corrupt'
@@ -0,0 +1,154 @@
+import pytest
+
+from noddb.bulk import connect_many, set_values, set_values_by_node
+from noddb.node import Node, NodeException
+from noddb.observer import Observer, add_observer, remove_observer
+from noddb.std_value import InputFloat, InputInt, InputIntArray, OutputFloat, OutputInt
+from noddb.value import ValueException
+
+
+class BatchLog(Observer):
+    def __init__(self):
+        self.batches = []
+
+    def on_set_values(self, changes):
+        self.batches.append(('values', [(value.path(), old_value) for value, old_value in changes]))
+
+    def on_set_sources(self, inputs):
+        self.batches.append(('sources', [value.path() for value in inputs]))
+
+    def on_set_element(self, value, index, old_element):
+        self.batches.append(('element', value.path(), index, old_element))
+
+
+def create_nodes():
+    root = Node(None, 'root')
+    InputInt(root, 'a')
+    InputFloat(root, 'b')
+    OutputInt(root, 'out').set_push(True)
+    OutputFloat(root, 'gain')
+    return root
+
+
+def test_set_values():
+    root = create_nodes()
+    log = BatchLog()
+    add_observer(log)
+    try:
+        set_values(root, {'a': 2, 'b': 0.5})
+        assert root['a'].value() == 2
+        assert root['b'].value() == 0.5
+        assert log.batches == [('values', [('root.a', 0), ('root.b', 0.0)])]
+
+        set_values_by_node([(root['out'], 3)])
+        assert log.batches[-1] == ('values', [('root.out', 0)])
+
+        # Nothing is notified if no values are set
+        set_values(root, {})
+        assert len(log.batches) == 2
+    finally:
+        remove_observer(log)
+
+
+def test_set_values_all_or_nothing():
+    root = create_nodes()
+
+    with pytest.raises(ValueException, match='mismatched value'):
+        set_values(root, {'a': 2, 'b': 'loud'})
+    assert root['a'].value() == 0
+
+    with pytest.raises(NodeException):
+        set_values(root, {'a': 2, 'missing': 1})
+    assert root['a'].value() == 0
+
+    with pytest.raises(ValueException, match='not a value'):
+        set_values({'root': root}, {'root.a': 2, 'root': 1})
+    assert root['a'].value() == 0
+
+
+def test_set_values_elements():
+    root = create_nodes()
+    samples = InputIntArray(root, 'samples', [1, 2, 3])
+    log = BatchLog()
+    add_observer(log)
+    try:
+        set_values(root, {'a': 2, 'samples[1]': 5})
+        assert root['a'].value() == 2
+        assert samples.value().tolist() == [1, 5, 3]
+        assert log.batches == [('values', [('root.a', 0)]), ('element', 'root.samples', 1, 2)]
+
+        with pytest.raises(ValueException, match='mismatched value'):
+            set_values(root, {'a': 3, 'samples[0]': 1.5})
+        with pytest.raises(ValueException, match='out of range'):
+            set_values(root, {'a': 3, 'samples[0]': 1 << 64})
+        with pytest.raises(ValueException, match='along with the whole array'):
+            set_values(root, {'samples': [1], 'samples[2]': 4})
+        assert root['a'].value() == 2
+        assert samples.value().tolist() == [1, 5, 3]
+        assert len(log.batches) == 2
+    finally:
+        remove_observer(log)
+
+
+def test_set_values_push():
+    root = create_nodes()
+    root['a'] << root['out']
+    set_values(root, {'out': 5})
+    assert root['a'].value() == 5
+
+    with pytest.raises(ValueException, match='whilst sourced'):
+        set_values(root, {'b': 1.0, 'a': 1})
+    assert root['b'].value() == 0.0
+
+
+def test_connect_many():
+    root = create_nodes()
+    log = BatchLog()
+    add_observer(log)
+    try:
+        root['out'].set_value(4)
+        connect_many([(root['out'], root['a']), (root['gain'], root['b'])])
+        assert root['a'].source() is root['out']
+        assert root['b'].source() is root['gain']
+        assert root['a'].value() == 4
+        assert log.batches == [('values', [('root.a', 0)]), ('sources', ['root.a', 'root.b'])]
+    finally:
+        remove_observer(log)
+
+
+def test_connect_many_all_or_nothing():
+    root = create_nodes()
+
+    with pytest.raises(ValueException, match='mismatched output'):
+        connect_many([(root['out'], root['a']), (root['out'], root['b'])])
+    assert not root['a'].is_sourced()
+
+    with pytest.raises(ValueException, match='already connected'):
+        connect_many([(root['out'], root['a']), (root['out'], root['a'])])
+    assert not root['a'].is_sourced()
+
+    with pytest.raises(ValueException, match='non-input'):
+        connect_many([(root['out'], root['a']), (root['out'], root['gain'])])
+    assert not root['a'].is_sourced()
+
+
+def test_default_batch_callbacks():
+    class ChangeLog(Observer):
+        def __init__(self):
+            self.changes = []
+
+        def on_set_value(self, value, old_value):
+            self.changes.append((value.path(), old_value))
+
+        def on_set_source(self, value, old_source):
+            self.changes.append((value.path(), old_source))
+
+    root = create_nodes()
+    log = ChangeLog()
+    add_observer(log)
+    try:
+        set_values(root, {'a': 1, 'b': 2.0})
+        connect_many([(root['gain'], root['b'])])
+        assert log.changes == [('root.a', 0), ('root.b', 0.0), ('root.b', None)]
+    finally:
+        remove_observer(log)
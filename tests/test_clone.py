@@ -0,0 +1,120 @@
+import pytest
+
+from noddb.clone import clone
+from noddb.index import nodes_of_type
+from noddb.json import JsonRegistry
+from noddb.node import Node, NodeArray, NodeException
+from noddb.path import path_index
+from noddb.std_value import InputFloat, InputFloatArray, OutputFloat
+from noddb.transaction import Transaction
+
+
+class Voice(Node):
+    def init_custom(self):
+        self.init_count = getattr(self, 'init_count', 0) + 1
+        self.gain = InputFloat(self, 'gain', 1.0)
+        self.out = OutputFloat(self, 'out')
+        self.label = 'voice'
+        self.args = {'octave': 0}
+        oscillators = NodeArray(self, 'oscillators')
+        for _ in range(2):
+            InputFloat(Node(oscillators), 'detune')
+
+
+def create_nodes():
+    root = Node(None, 'root')
+    OutputFloat(root, 'lfo', 0.25)
+    voices = NodeArray(root, 'voices')
+    voice = Voice(voices)
+    voice['oscillators'][0]['detune'] << voice['out']
+    voice['oscillators'][1]['detune'] << root['lfo']
+    voice['gain'].set_value(0.5)
+    InputFloatArray(voice, 'samples', [1.0, 2.0])
+    return root
+
+
+def test_clone():
+    root = create_nodes()
+    voices = root['voices']
+    voice = voices[0]
+    copy = clone(voice, voices)
+
+    assert copy.path() == 'root.voices[1]'
+    assert voices.children == [voice, copy]
+    assert type(copy) is Voice
+    assert copy.init_count == 1
+    assert copy['gain'].value() == 0.5
+    assert copy.gain is copy['gain']
+    assert copy.out is copy['out']
+    assert copy.label == 'voice'
+
+    # Mutable attributes are shallow copied
+    copy.args['octave'] = 1
+    assert voice.args == {'octave': 0}
+
+    # Internal sources are remapped, external sources are shared
+    assert copy['oscillators'][0]['detune'].source() is copy['out']
+    assert copy['oscillators'][1]['detune'].source() is root['lfo']
+    assert root['lfo'].dependents() == [voice['oscillators'][1]['detune'], copy['oscillators'][1]['detune']]
+
+    # Values are independent of the original
+    copy['samples'].set_element(0, 3.0)
+    assert voice['samples'].value().tolist() == [1.0, 2.0]
+
+    registry = JsonRegistry([Voice])
+    exported = registry.export_json(root)
+    assert exported['values']['root.voices[1].gain'] == 0.5
+    assert exported['sources']['root.voices[1].oscillators[0].detune'] == 'root.voices[1].out'
+
+
+def test_clone_named():
+    root = create_nodes()
+    voice = root['voices'][0]
+
+    copy = clone(voice, root, 'solo')
+    assert copy.path() == 'root.solo'
+    assert copy['oscillators'][1].path() == 'root.solo.oscillators[1]'
+
+    other = clone(voice, None, 'other')
+    assert other.root is other
+    assert other['oscillators'][0]['detune'].root is other
+    assert other['oscillators'][0]['detune'].source() is other['out']
+
+    with pytest.raises(NodeException, match='must be named'):
+        clone(voice, None)
+    with pytest.raises(NodeException, match='already in root'):
+        clone(voice, root, 'solo')
+
+
+def test_clone_indices():
+    root = create_nodes()
+    voices = root['voices']
+    index = path_index(root)
+    assert nodes_of_type(root, Voice) == [voices[0]]
+
+    copy = clone(voices[0], voices)
+    assert index['root.voices[1].oscillators[1].detune'] is copy['oscillators'][1]['detune']
+    assert nodes_of_type(root, Voice) == [voices[0], copy]
+
+    with Transaction() as transaction:
+        clone(voices[0], voices)
+    transaction.undo()
+    assert voices.children == [voices[0], copy]
+    assert 'root.voices[2]' not in index
+    assert len(root['lfo'].dependents()) == 2
+
+
+def test_clone_lazy_import():
+    root = Node(None, 'root')
+    lz = Node(root, 'lz')
+    InputFloat(Node(lz, 'inner'), 'w', 4.0)
+    registry = JsonRegistry([])
+    nodes = registry.import_json(registry.export_json(root), lazy=True)
+    original = nodes['root']['lz']
+    assert original._loaded_children() == []
+
+    copy = clone(original, nodes['root'], 'copy')
+    assert copy['inner']['w'].value() == 4.0
+    assert copy['inner']['w'].path() == 'root.copy.inner.w'
+    assert copy.children == [copy['inner']]
+    assert original['inner']['w'] is not copy['inner']['w']
@@ -60,3 +60,19 @@ def test_custom_import():
 
     root['adder'].evaluate()
     assert root['C'].value() == 18
+
+
+def test_custom_attributes():
+    class TaggedNode(AddNode):
+        def init_custom(self):
+            super().init_custom()
+            self.tag = 'extra'
+
+    class CompactNode(Node):
+        __slots__ = ()
+
+        def init_custom(self):
+            InputInt(self, 'a')
+
+    assert TaggedNode(None, 'tagged').tag == 'extra'
+    assert not hasattr(CompactNode(None, 'compact'), '__dict__')
@@ -0,0 +1,320 @@
+from array import array
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from noddb.evaluate import AsyncEvaluator, Evaluator, EvaluatorException, gather_values, scatter_values
+from noddb.node import Node, NodeArray
+from noddb.std_value import InputFloat, InputInt, OutputFloat, OutputInt
+from noddb.transaction import History
+
+
+class AddNode(Node):
+    def init_custom(self):
+        InputInt(self, 'a')
+        InputInt(self, 'b')
+        OutputInt(self, 'sum')
+
+    def evaluate(self, log=None):
+        if log is not None:
+            log.append(self.path())
+        self['sum'].set_value(self['a'].value() + self['b'].value())
+
+
+def test_evaluate_order():
+    root = Node(None, 'root')
+    x = OutputInt(root, 'x', 2)
+
+    # Declare nodes in reverse of their dependency order
+    chain = NodeArray(root, 'chain')
+    last = AddNode(chain)
+    middle = AddNode(chain)
+    first = AddNode(chain)
+    x >> first['a']
+    x >> first['b']
+    first['sum'] >> middle['a']
+    first['sum'] >> middle['b']
+    middle['sum'] >> last['a']
+    x >> last['b']
+
+    evaluator = Evaluator(root)
+    assert evaluator.order == [first, middle, last]
+    assert evaluator.levels == [[first], [middle], [last]]
+
+    log = []
+    evaluator.run(log)
+    assert log == ['root.chain[2]', 'root.chain[1]', 'root.chain[0]']
+    assert last['sum'].value() == 10
+
+
+def test_evaluate_levels_across_roots():
+    a = AddNode(None, 'a')
+    b = AddNode(None, 'b')
+    c = AddNode(None, 'c')
+    a['sum'] >> c['a']
+    b['sum'] >> c['b']
+
+    evaluator = Evaluator([c, b, a])
+    assert evaluator.levels == [[b, a], [c]]
+
+
+def test_evaluate_replan():
+    root = Node(None, 'root')
+    a = AddNode(root, 'a')
+    b = AddNode(root, 'b')
+
+    evaluator = Evaluator(root)
+    assert evaluator.order == [a, b]
+
+    b['sum'] >> a['a']
+    assert evaluator.order == [b, a]
+
+    b['sum'] >> a['b']
+    a['a'].clear_source()
+    assert evaluator.order == [b, a]
+
+    a['b'].clear_source()
+    c = AddNode(root, 'c')
+    c['sum'] >> a['a']
+    assert evaluator.order == [b, c, a]
+
+
+def test_evaluate_cycle():
+    root = Node(None, 'root')
+    a = AddNode(root, 'a')
+    b = AddNode(root, 'b')
+    a['sum'] >> b['a']
+    b['sum'] >> a['a']
+
+    with pytest.raises(EvaluatorException) as excinfo:
+        Evaluator(root).run()
+    assert str(excinfo.value) == 'Cannot order evaluation, cycle detected involving "root.a"'
+
+
+def test_evaluate_dirty():
+    root = Node(None, 'root')
+    x = OutputInt(root, 'x', 1)
+    a = AddNode(root, 'a')
+    b = AddNode(root, 'b')
+    c = AddNode(root, 'c')
+    x >> a['a']
+    a['sum'] >> c['a']
+    b['sum'] >> c['b']
+
+    with Evaluator(root, incremental=True) as evaluator:
+        # Nodes are dirty until first evaluated
+        log = []
+        evaluator.evaluate_dirty(log)
+        assert log == ['root.a', 'root.b', 'root.c']
+
+        log = []
+        evaluator.evaluate_dirty(log)
+        assert log == []
+
+        # Changing an output dirties its consumers and everything downstream
+        x.set_value(5)
+        evaluator.evaluate_dirty(log)
+        assert log == ['root.a', 'root.c']
+        assert c['sum'].value() == 5
+
+        # Changing an input dirties its owner
+        log = []
+        b['a'].set_value(3)
+        evaluator.evaluate_dirty(log)
+        assert log == ['root.b', 'root.c']
+        assert c['sum'].value() == 8
+
+        # New nodes and reconnected inputs are dirty
+        log = []
+        d = AddNode(root, 'd')
+        c['sum'] >> d['a']
+        evaluator.evaluate_dirty(log)
+        assert log == ['root.d']
+        assert d['sum'].value() == 8
+
+        # A full run leaves nothing dirty
+        log = []
+        b['b'].set_value(1)
+        evaluator.run()
+        evaluator.evaluate_dirty(log)
+        assert log == []
+
+    with pytest.raises(EvaluatorException) as excinfo:
+        evaluator.evaluate_dirty()
+    assert str(excinfo.value) == 'evaluate_dirty requires an incremental evaluator'
+
+
+def test_evaluate_dirty_undo():
+    root = Node(None, 'root')
+    x = OutputInt(root, 'x', 1)
+    a = AddNode(root, 'a')
+    x >> a['a']
+    history = History()
+
+    with Evaluator(root, incremental=True) as evaluator:
+        evaluator.evaluate_dirty()
+        with history.transaction():
+            AddNode(root, 'y')
+        assert len(evaluator.order) == 2
+
+        # The new node is dirty until evaluated, but no longer planned once undone
+        history.undo()
+        log = []
+        evaluator.evaluate_dirty(log)
+        assert log == []
+
+        history.redo()
+        x.set_value(2)
+        evaluator.evaluate_dirty(log)
+        assert log == ['root.a', 'root.y']
+        assert a['sum'].value() == 2
+
+
+def test_evaluate_batch():
+    class BatchAddNode(AddNode):
+        batches = []
+
+        @classmethod
+        def evaluate_batch(cls, nodes, log=None):
+            cls.batches.append([node.name for node in nodes])
+            a = gather_values(nodes, 'a')
+            b = gather_values(nodes, 'b')
+            assert a.typecode == 'q'
+            scatter_values(nodes, 'sum', [x + y for x, y in zip(a, b)])
+
+    root = Node(None, 'root')
+    x = OutputInt(root, 'x', 3)
+    first = [BatchAddNode(root, f'first{index}') for index in range(3)]
+    plain = AddNode(root, 'plain')
+    second = BatchAddNode(root, 'second')
+    for index, node in enumerate(first):
+        x >> node['a']
+        node['b'].set_value(index)
+    first[2]['sum'] >> second['a']
+    plain['sum'] >> second['b']
+    plain['a'].set_value(10)
+
+    log = []
+    Evaluator(root).run(log)
+    assert BatchAddNode.batches == [['first0', 'first1', 'first2'], ['second']]
+    assert log == ['root.plain']
+    assert [node['sum'].value() for node in first] == [3, 4, 5]
+    assert second['sum'].value() == 15
+
+
+def test_gather_scatter():
+    class Scale(Node):
+        def init_custom(self):
+            InputFloat(self, 'x')
+            OutputFloat(self, 'y')
+
+    nodes = [Scale(None, f'scale{index}') for index in range(3)]
+    for index, node in enumerate(nodes):
+        node['x'].set_value(float(index))
+
+    x = gather_values(nodes, 'x')
+    assert x.typecode == 'd'
+    assert x.tolist() == [0.0, 1.0, 2.0]
+
+    # Elements are converted to the value type, e.g. from an array of ints
+    scatter_values(nodes, 'y', array('q', [0, 1, 2]))
+    assert [node['y'].value() for node in nodes] == [0.0, 1.0, 2.0]
+    assert type(nodes[1]['y'].value()) == float
+
+
+def _build_parallel_graph():
+    root = Node(None, 'root')
+    x = OutputInt(root, 'x', 1)
+    layer = [AddNode(root, f'first{index}') for index in range(10)]
+    for index, node in enumerate(layer):
+        x >> node['a']
+        node['b'].set_value(index)
+    total = AddNode(root, 'total')
+    layer[3]['sum'] >> total['a']
+    layer[7]['sum'] >> total['b']
+    return root, layer, total
+
+
+@pytest.mark.parametrize('executor_type', [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_evaluate_parallel(executor_type):
+    root, layer, total = _build_parallel_graph()
+    with executor_type(max_workers=4) as executor:
+        Evaluator(root, executor=executor, chunk_size=3).run()
+    assert [node['sum'].value() for node in layer] == list(range(1, 11))
+    assert total['sum'].value() == 12
+
+
+def test_evaluate_parallel_error():
+    class FailNode(AddNode):
+        def evaluate(self):
+            raise RuntimeError(f'failed {self.name}')
+
+    root = Node(None, 'root')
+    for index in range(4):
+        FailNode(root, f'fail{index}')
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        with pytest.raises(RuntimeError) as excinfo:
+            Evaluator(root, executor=executor, chunk_size=1).run()
+    assert str(excinfo.value) == 'failed fail0'
+
+    with pytest.raises(EvaluatorException) as excinfo:
+        Evaluator(root, chunk_size=0)
+    assert str(excinfo.value) == 'Chunk size must be at least 1, found 0'
+
+
+def test_evaluate_async():
+    class SlowAddNode(AddNode):
+        async def evaluate(self, log):
+            log.append(f'start:{self.name}')
+            await asyncio.sleep(0.01)
+            self['sum'].set_value(self['a'].value() + self['b'].value())
+            log.append(f'end:{self.name}')
+
+    class SyncAddNode(AddNode):
+        def evaluate(self, log):
+            log.append(f'sync:{self.name}')
+            super().evaluate()
+
+    root = Node(None, 'root')
+    a = SlowAddNode(root, 'a')
+    b = SlowAddNode(root, 'b')
+    c = SyncAddNode(root, 'c')
+    a['a'].set_value(1)
+    b['a'].set_value(2)
+    a['sum'] >> c['a']
+    b['sum'] >> c['b']
+
+    log = []
+    asyncio.run(AsyncEvaluator(root).run(log))
+    assert log == ['start:a', 'start:b', 'end:a', 'end:b', 'sync:c']
+    assert c['sum'].value() == 3
+
+    async def evaluate_dirty(log):
+        with AsyncEvaluator(root, incremental=True) as evaluator:
+            await evaluator.run(log)
+            b['b'].set_value(5)
+            log.clear()
+            await evaluator.evaluate_dirty(log)
+
+    asyncio.run(evaluate_dirty(log))
+    assert log == ['start:b', 'end:b', 'sync:c']
+    assert c['sum'].value() == 8
+
+
+def test_evaluate_async_error():
+    class FailNode(AddNode):
+        async def evaluate(self):
+            await asyncio.sleep(0)
+            raise RuntimeError(f'failed {self.name}')
+
+    root = Node(None, 'root')
+    first = FailNode(root, 'first')
+    second = AddNode(root, 'second')
+    first['sum'] >> second['a']
+
+    with pytest.raises(RuntimeError) as excinfo:
+        asyncio.run(AsyncEvaluator(root).run())
+    assert str(excinfo.value) == 'failed first'
@@ -0,0 +1,65 @@
+from noddb.index import nodes_of_type, type_index
+from noddb.json import JsonRegistry
+from noddb.node import Node, NodeArray
+from noddb.query import query
+from noddb.std_value import InputFloat, InputInt, OutputBool
+from noddb.value import InputValue
+
+
+class AddNode(Node):
+    def init_custom(self):
+        InputInt(self, 'a')
+        InputInt(self, 'b')
+        OutputBool(self, 'ok')
+
+
+def test_nodes_of_type():
+    root = Node(None, 'root')
+    first = AddNode(root, 'first')
+    array = NodeArray(root, 'array')
+    second = AddNode(array)
+
+    assert root._type_index is None
+    assert nodes_of_type(root, AddNode) == [first, second]
+    assert nodes_of_type(root, 'OutputBool') == [first['ok'], second['ok']]
+    assert nodes_of_type(root, Node) == [root]
+    assert nodes_of_type(array, NodeArray) == [array]
+    assert nodes_of_type(root, InputFloat) == []
+
+    # The index is maintained as nodes are added
+    third = AddNode(array)
+    gain = InputFloat(third, 'gain')
+    assert nodes_of_type(root, AddNode) == [first, second, third]
+    assert nodes_of_type(root, InputFloat) == [gain]
+    assert set(type_index(root)) == {'Node', 'NodeArray', 'AddNode', 'InputInt', 'OutputBool', 'InputFloat'}
+
+    assert nodes_of_type(root, InputValue, subclasses=True) == [
+        first['a'], first['b'], second['a'], second['b'], third['a'], third['b'], gain
+    ]
+    assert nodes_of_type(root, Node, subclasses=True)[:4] == [root, first, second, third]
+
+
+def test_nodes_of_type_lazy_import():
+    root = Node(None, 'root')
+    AddNode(Node(NodeArray(root, 'array'), None), 'add')
+    registry = JsonRegistry([AddNode])
+    nodes = registry.import_json(registry.export_json(root), lazy=True)
+
+    # Building the index creates all lazily imported nodes
+    assert [node.path() for node in nodes_of_type(nodes['root'], AddNode)] == ['root.array[0].add']
+    assert [node.path() for node in nodes_of_type(nodes['root'], Node)] == ['root', 'root.array[0]']
+
+
+def test_query_type_index():
+    root = Node(None, 'root')
+    voices = NodeArray(root, 'voices')
+    for _ in range(3):
+        AddNode(Node(voices), 'add')
+    AddNode(root, 'other')
+
+    patterns = ['**', 'voices[1:].**', 'voices[*].**.a', '**.add.*', 'voices.**']
+    expected = [[node.path() for node in query(root, pattern, type=InputInt)] for pattern in patterns]
+    type_index(root)
+    for pattern, paths in zip(patterns, expected):
+        assert [node.path() for node in query(root, pattern, type=InputInt)] == paths
+        assert [node.path() for node in query({'root': root}, 'root.' + pattern, type=InputInt)] == paths
@@ -1,11 +1,15 @@
+import io
+import json
+
 import pytest
 from pytest import approx
 
-from noddb.node import Node, NodeArray
+from noddb.node import Node, NodeArray, NodeException
 from noddb.json import JsonRegistry, ExportException, ImportException
+from noddb.path import path_to_node
 from noddb.std_value import InputBool, InputInt, InputFloat, InputString
 from noddb.std_value import OutputBool, OutputInt, OutputFloat, OutputString
-from noddb.value import InputValue, OutputValue
+from noddb.value import InputValue, OutputValue, ValueException
 
 
 def test_export_minimal():
@@ -258,3 +262,248 @@ def test_source_import_set():
     assert nodes['foo']['a'].value() == approx(6)
     assert nodes['bar']['b'].is_sourced() is True
     assert nodes['bar']['b'].value() == approx(6)
+
+
+def test_export_stream():
+    class CustomNode(Node):
+        def init_custom(self):
+            InputBool(self, 'inny', False)
+            OutputInt(self, 'outy', 2)
+
+    foo = Node(None, 'foo')
+    x = OutputBool(foo, 'x', True)
+    bar = NodeArray(foo, 'bar')
+    y = OutputInt(bar, None, 3)
+    z = InputInt(Node(bar), 'z "quoted"', 5)
+    fzz = CustomNode(bar)
+    NodeArray(bar)
+    InputString(foo, 's', 'tab\t')
+    InputFloat(foo, 'f', 0.25)
+    y >> z
+    x >> fzz['inny']
+    extra_root = CustomNode(None, 'extra_root')
+    empty = Node(None, 'empty')
+
+    registry = JsonRegistry([CustomNode])
+    stream = io.StringIO()
+    registry.export_json_stream([foo, extra_root, empty], stream)
+    assert json.loads(stream.getvalue()) == registry.export_json([foo, extra_root, empty])
+
+    stream = io.StringIO()
+    registry.export_json_stream(Node(None, 'a'), stream)
+    assert stream.getvalue() == '{"nodes": {"a": {}}, "values": {}, "sources": {}}'
+
+    with pytest.raises(ExportException) as excinfo:
+        JsonRegistry().export_json_stream(CustomNode(None, 'unregistered'), io.StringIO())
+    assert str(excinfo.value) == "Unexpected node type 'CustomNode' during export"
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 65536])
+def test_import_stream(chunk_size):
+    class AddNode(Node):
+        def init_custom(self):
+            InputInt(self, 'a')
+            InputInt(self, 'b')
+            OutputInt(self, 'sum')
+
+    registry = JsonRegistry([AddNode])
+    document = {
+        'nodes': {
+            'root': {
+                'A': 'OutputInt',
+                'adder': 'AddNode',
+                'list': ['InputString', {'f': 'OutputFloat'}, []],
+                'empty': {}
+            },
+            'other': 'InputBool'
+        },
+        'values': {
+            'root.A': 7,
+            'root.adder.b': -11,
+            'root.list[0]': 'esc"aped \u00e9',
+            'root.list[1].f': 1.5e-3,
+            'other': True
+        },
+        'sources': {
+            'root.adder.a': 'root.A'
+        }
+    }
+    text = json.dumps(document, indent=2)
+    nodes = registry.import_json_stream(io.StringIO(text), chunk_size)
+    assert registry.export_json(list(nodes.values())) == registry.export_json(
+        list(registry.import_json(document).values())
+    )
+    assert nodes['root']['adder']['a'].source() == nodes['root']['A']
+    assert nodes['root']['list'][0].value() == 'esc"aped é'
+
+    # Values and sources before nodes are deferred until the nodes exist
+    reordered = {'sources': document['sources'], 'values': document['values'], 'nodes': document['nodes']}
+    nodes = registry.import_json_stream(io.StringIO(json.dumps(reordered)), chunk_size)
+    assert nodes['root']['adder']['b'].value() == -11
+    assert nodes['root']['adder']['a'].source() == nodes['root']['A']
+
+
+def test_import_stream_round_trip():
+    foo = Node(None, 'foo')
+    bar = NodeArray(foo, 'bar')
+    OutputInt(bar, None, 3) >> InputInt(Node(bar), 'z', 5)
+    InputFloat(foo, 'f', 0.1)
+
+    registry = JsonRegistry()
+    stream = io.StringIO()
+    registry.export_json_stream(foo, stream)
+    stream.seek(0)
+    nodes = registry.import_json_stream(stream, 16)
+    assert registry.export_json(nodes['foo']) == registry.export_json(foo)
+
+
+def test_bad_import_stream():
+    registry = JsonRegistry()
+
+    def import_text(text):
+        with pytest.raises(ImportException) as excinfo:
+            registry.import_json_stream(io.StringIO(text))
+        return str(excinfo.value)
+
+    assert import_text('{"nodes": {}, "values": {}}') == 'Expecting nodes, values and sources entries at root'
+    assert import_text('{"nodes": {}, "values": [], "sources": {}}') == \
+        'Expecting dict type for nodes, values and sources'
+    assert import_text('{"nodes": {"badtype": true}, "values": {}, "sources": {}}') == \
+        "Expecting dict, list or string values for nodes, found <class 'bool'>"
+    assert import_text('{"nodes": {"a": "Nope"}}') == "Unexpected node type 'Nope' during import"
+    assert import_text('{"nodes": {"a" {}}}') == "Invalid json, expecting ':' at '{}}}'"
+    assert import_text('{"nodes": {"a": "InputInt"}, "values": {"a": 1x}}') == \
+        "Invalid json, invalid value '1x' at '1x}}'"
+    assert import_text('{"nodes": {"a": "InputInt') == 'Invalid json, unterminated string at \'"InputInt\''
+
+
+def test_export_apply_delta():
+    registry = JsonRegistry()
+    root = Node(None, 'root')
+    a = OutputInt(root, 'a', 1)
+    b = OutputInt(root, 'b', 2)
+    x = InputInt(root, 'x')
+    y = InputInt(root, 'y')
+    z = InputFloat(root, 'z', 1.5)
+    a >> x
+    a >> y
+    saved = registry.export_json(root)
+
+    registry.checkpoint('autosave')
+    try:
+        assert registry.export_delta('autosave') == {'values': {}, 'sources': {}}
+
+        b.set_value(5)
+        x.clear_source()
+        x.set_value(3)
+        y.clear_source()
+        b >> y
+        delta = registry.export_delta('autosave')
+        assert delta == {
+            'values': {'root.b': 5, 'root.x': 3},
+            'sources': {'root.x': None, 'root.y': 'root.b'}
+        }
+
+        restored = registry.import_json(saved)
+        registry.apply_delta(restored, json.loads(json.dumps(delta)))
+        assert registry.export_json(list(restored.values())) == registry.export_json(root)
+
+        # Restarting the checkpoint discards changes recorded so far
+        registry.checkpoint('autosave')
+        z.set_value(2.5)
+        assert registry.export_delta('autosave') == {'values': {'root.z': 2.5}, 'sources': {}}
+
+        # A delta cannot describe added nodes, and one with an unknown path changes nothing
+        y.clear_source()
+        InputInt(root, 'new').set_value(1)
+        with pytest.raises(ExportException, match='nodes have been added or removed'):
+            registry.export_delta('autosave')
+        restored = registry.import_json(saved)
+        with pytest.raises(NodeException):
+            registry.apply_delta(restored, {'values': {'root.new': 1}, 'sources': {'root.y': None}})
+        assert restored['root']['y'].source() is restored['root']['a']
+        with pytest.raises(ImportException, match='Cannot apply source of "root.a" as it is not an input'):
+            registry.apply_delta(restored, {'values': {}, 'sources': {'root.a': None}})
+        with pytest.raises(ValueException):
+            registry.apply_delta(restored, {'values': {'root.y': 'text'}, 'sources': {'root.y': None}})
+        assert restored['root']['y'].source() is restored['root']['a']
+    finally:
+        registry.remove_checkpoint('autosave')
+
+    z.set_value(3.5)
+    with pytest.raises(ExportException, match="Unknown checkpoint 'autosave'"):
+        registry.export_delta('autosave')
+
+    with pytest.raises(ImportException, match='Expecting dict type for delta'):
+        registry.apply_delta(root, {'values': {}})
+
+
+def test_lazy_import():
+    class CustomNode(Node):
+        def init_custom(self):
+            InputBool(self, 'inny', False)
+            OutputInt(self, 'outy', 2)
+
+    foo = Node(None, 'foo')
+    x = OutputBool(foo, 'x', True)
+    bar = NodeArray(foo, 'bar')
+    y = OutputInt(bar, None, 3)
+    etc = Node(bar)
+    fzz = CustomNode(bar)
+    z = InputInt(etc, 'z', 5)
+    last_arr = NodeArray(bar)
+    InputBool(last_arr, None, False)
+    last_bool = InputBool(last_arr, None, True)
+    Node(foo, 'empty')
+    InputInt(Node(Node(foo, 'deep'), 'inner'), 'w', 4)
+    y >> z
+    x >> fzz['inny']
+    extra_root = CustomNode(None, 'extra_root')
+    extra_root['outy'] >> last_bool
+
+    registry = JsonRegistry([CustomNode])
+    saved = registry.export_json([foo, extra_root])
+    nodes = registry.import_json(saved, lazy=True)
+    assert list(nodes) == ['foo', 'extra_root']
+
+    # The root custom node's output is sourced by an input in foo, which is created with it
+    assert nodes['extra_root']['outy'].dependents() == [path_to_node(nodes, 'foo.bar[3][1]')]
+    assert nodes['foo']['bar'][3][1].value() == 2
+    assert nodes['foo']['deep']._loaded_children() == []
+    assert path_to_node(nodes, 'foo.deep.inner.w').value() == 4
+    assert nodes['foo']['deep']['inner']._loaded_children() == [nodes['foo']['deep']['inner']['w']]
+
+    # Accessing an input by path creates the path to it and its source
+    z = path_to_node(nodes, 'foo.bar[1].z')
+    assert z.source() is nodes['foo']['bar'][0]
+    assert z.value() == 3
+    assert nodes['foo']['empty'].typename == 'Node'
+    assert not nodes['foo']['bar'][1].is_custom()
+
+    assert registry.export_json(list(nodes.values())) == saved
+
+
+def test_lazy_import_errors():
+    registry = JsonRegistry()
+    nodes = registry.import_json({'nodes': {'foo': {'a': 'Unknown'}}, 'values': {}, 'sources': {}}, lazy=True)
+    with pytest.raises(ImportException, match="Unexpected node type 'Unknown'"):
+        nodes['foo']['a']
+
+    # A failed import leaves nothing behind, so that every access fails in the same way
+    saved = {
+        'nodes': {'foo': {'a': {'x': 'InputInt', 'bad': 'Unknown', 'y': 'InputInt'}}},
+        'values': {'foo.a.x': 3},
+        'sources': {}
+    }
+    nodes = registry.import_json(saved, lazy=True)
+    for _ in range(2):
+        with pytest.raises(ImportException, match="Unexpected node type 'Unknown'"):
+            nodes['foo']['a'].children
+        assert nodes['foo']['a']._loaded_children() == []
+
+    nodes = registry.import_json(
+        {'nodes': {'foo': {'b': {'x': 'InputInt'}}}, 'values': {'foo.b.x': 'loud'}, 'sources': {}}, lazy=True
+    )
+    for _ in range(2):
+        with pytest.raises(ValueException, match='mismatched value'):
+            nodes['foo']['b'].children
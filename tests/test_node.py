@@ -1,3 +1,5 @@
+import sys
+
 import pytest
 
 from noddb.node import Node, NodeArray, NodeException
@@ -91,3 +93,49 @@ def test_get_item():
     with pytest.raises(NodeException) as excinfo:
         root['alice']['jimbob']
     assert str(excinfo.value) == "Node megacorp.alice does not have child 'jimbob'"
+
+
+def test_path_parts():
+    root = Node(None, 'root')
+    arr = NodeArray(root, 'arr')
+    Node(arr)
+    foo = Node(arr)
+    bar = Node(foo, 'bar')
+    assert root.path_parts() == ('root',)
+    assert foo.path_parts() == ('root', 'arr', 1)
+    assert bar.path_parts() == ('root', 'arr', 1, 'bar')
+
+
+def test_path_invalidation():
+    root = NodeArray(None, 'root')
+    a = Node(root)
+    b = Node(root)
+    c = Node(b, 'c')
+    assert c.path() == 'root[1].c'
+    assert c.path_parts() == ('root', 1, 'c')
+
+    # Re-index the array as if the first element had been removed
+    root._child_list.remove(a)
+    b._name = '[0]'
+    assert c.path() == 'root[1].c'
+    b._invalidate_path()
+    assert b.path() == 'root[0]'
+    assert c.path() == 'root[0].c'
+    assert c.path_parts() == ('root', 0, 'c')
+
+
+def test_deep_path():
+    depth = sys.getrecursionlimit() * 2
+    root = Node(None, 'root')
+    node = root
+    for _ in range(depth):
+        node = Node(NodeArray(node, 'a'))
+
+    # The deepest path is requested first, before any ancestor's path is memoised
+    assert node.path() == 'root' + '.a[0]' * depth
+    assert node.path_parts() == ('root',) + ('a', 0) * depth
+
+    root._name = 'top'
+    root._invalidate_path()
+    assert node.path().startswith('top.a[0]')
+    assert node.path_parts()[0] == 'top'
@@ -0,0 +1,68 @@
+import threading
+
+from noddb.node import Node
+from noddb.observer import Observer, _observers, _suppressed_notifications, add_observer, remove_observer
+from noddb.std_value import InputInt, OutputInt
+
+
+def test_observe_changes():
+    class ChangeLog(Observer):
+        def __init__(self):
+            self.log = []
+
+        def on_set_value(self, value, old_value):
+            self.log.append(f'value:{value.path()}:{old_value}->{value.value()}')
+
+        def on_set_source(self, value, old_source):
+            old_path = old_source.path() if old_source else None
+            new_path = value.source().path() if value.source() else None
+            self.log.append(f'source:{value.path()}:{old_path}->{new_path}')
+
+    root = Node(None, 'root')
+    a = OutputInt(root, 'a', 1)
+    b = InputInt(root, 'b', 2)
+
+    observer = ChangeLog()
+    add_observer(observer)
+    a.set_value(3)
+    a >> b
+    b.clear_source()
+    b.set_value(4)
+    remove_observer(observer)
+    a.set_value(5)
+
+    assert observer.log == [
+        'value:root.a:1->3',
+        'source:root.b:None->root.a',
+        'source:root.b:root.a->None',
+        'value:root.b:2->4'
+    ]
+
+
+def test_suppressed_notifications():
+    class ValueLog(Observer):
+        def __init__(self):
+            self.log = []
+
+        def on_set_value(self, value, old_value):
+            self.log.append(value.path())
+
+    root = Node(None, 'root')
+    a = OutputInt(root, 'a')
+    b = OutputInt(root, 'b')
+    observer = ValueLog()
+    add_observer(observer)
+    try:
+        with _suppressed_notifications():
+            a.set_value(1)
+
+            # Only the current thread is suppressed, and observers stay registered
+            thread = threading.Thread(target=b.set_value, args=(2,))
+            thread.start()
+            thread.join()
+            assert _observers == [observer]
+        a.set_value(3)
+    finally:
+        remove_observer(observer)
+
+    assert observer.log == ['root.b', 'root.a']
@@ -1,6 +1,6 @@
 import pytest
-from noddb.node import Node, NodeArray
-from noddb.path import split_path, path_to_node
+from noddb.node import Node, NodeArray, NodeException
+from noddb.path import ParsedPath, split_path, path_index, path_to_node
 from noddb.std_value import InputInt
 
 
@@ -43,3 +43,61 @@ def test_path_to_node():
 
     assert path_to_node(foo, 'bar') == bar
     assert path_to_node(bar, '[0]') == custom
+
+
+def test_path_index():
+    root = Node(None, 'root')
+    foo = Node(root, 'foo')
+    bar = NodeArray(foo, 'bar')
+    a = InputInt(bar, None)
+
+    index = path_index(root)
+    assert index == {
+        'root': root,
+        'root.foo': foo,
+        'root.foo.bar': bar,
+        'root.foo.bar[0]': a
+    }
+    assert path_index(foo.root) is index
+
+    # Index is maintained as nodes are added
+    b = InputInt(bar, None)
+    assert index['root.foo.bar[1]'] == b
+    assert path_to_node(root, 'foo.bar[1]') == b
+    assert path_to_node(bar, '[1]') == b
+    assert path_to_node({'root': root}, 'root.foo.bar[1]') == b
+
+    # Nodes in a dict are resolved relative to themselves, even if they are not roots
+    outer = Node(None, 'foo')
+    Node(outer, 'bar')
+    inner = Node(outer, 'foo')
+    inner_bar = Node(inner, 'bar')
+    path_index(outer)
+    assert path_to_node({'foo': inner}, 'foo.bar') is inner_bar
+    assert path_to_node({'other': inner}, 'other.bar') is inner_bar
+    assert path_to_node({'foo': foo}, 'foo.bar[1]') is b
+
+    # Non-canonical paths fall back to walking the hierarchy
+    assert path_to_node(root, 'foo.bar[01]') == b
+
+    with pytest.raises(NodeException) as excinfo:
+        path_to_node(root, 'foo.etc')
+    assert str(excinfo.value) == "Node root.foo does not have child 'etc'"
+
+
+def test_parsed_path():
+    root = Node(None, 'root')
+    bar = NodeArray(root, 'bar')
+    Node(bar)
+    a = InputInt(Node(bar), 'a')
+
+    parsed = ParsedPath('bar[1].a')
+    assert parsed.parts == ('bar', 1, 'a')
+    assert str(parsed) == 'bar[1].a'
+    assert parsed == ParsedPath('bar[1].a')
+    assert parsed.resolve(root) == a
+    assert path_to_node(root, parsed) == a
+    assert path_to_node({'root': root}, ParsedPath('root.bar[1].a')) == a
+
+    # Parsed paths still resolve if non-canonical
+    assert ParsedPath('bar.1.a').resolve(root) == a
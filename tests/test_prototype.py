@@ -0,0 +1,133 @@
+import pytest
+
+from noddb.index import nodes_of_type
+from noddb.json import JsonRegistry
+from noddb.node import Node, NodeArray, NodeException
+from noddb.observer import Observer, add_observer, remove_observer
+from noddb.path import path_index
+from noddb.prototype import cache_prototype, clear_prototypes
+from noddb.std_value import InputFloat, InputFloatArray, OutputFloat
+from noddb.transaction import Transaction
+
+
+class Oscillator(Node):
+    def init_custom(self):
+        self.detune = InputFloat(self, 'detune')
+
+
+init_calls = []
+
+
+@cache_prototype
+class Voice(Node):
+    def init_custom(self):
+        init_calls.append(self)
+        self.gain = InputFloat(self, 'gain', 1.0)
+        self.out = OutputFloat(self, 'out')
+        self.label = 'voice'
+        self.args = {'octave': 0}
+        InputFloatArray(self, 'samples', [1.0, 2.0])
+        oscillators = NodeArray(self, 'oscillators')
+        for _ in range(2):
+            Oscillator(oscillators)['detune'] << self.out
+
+
+class Layer(Voice):
+    def init_custom(self):
+        super().init_custom()
+        InputFloat(self, 'mix')
+
+
+def test_cache_prototype():
+    init_calls.clear()
+    clear_prototypes(Voice)
+    root = Node(None, 'root')
+    voices = NodeArray(root, 'voices')
+    first = Voice(voices)
+    first['gain'].set_value(0.5)
+    first['samples'].set_element(0, 3.0)
+    first.args['octave'] = 1
+    second = Voice(voices)
+    assert init_calls == [first]
+
+    assert second['gain'].value() == 1.0
+    assert second['samples'].value().tolist() == [1.0, 2.0]
+    assert second.path() == 'root.voices[1]'
+    assert second['oscillators'][1].path() == 'root.voices[1].oscillators[1]'
+    assert second['oscillators'][1].root is root
+
+    # Attributes and sources refer to the new node's children
+    assert second.gain is second['gain']
+    assert second.label == 'voice'
+    assert second.args == {'octave': 0}
+    assert second['oscillators'][0].detune is second['oscillators'][0]['detune']
+    assert second['oscillators'][0]['detune'].source() is second.out
+    assert second.out.dependents() == [second['oscillators'][0]['detune'], second['oscillators'][1]['detune']]
+    assert first.out.dependents() == [first['oscillators'][0]['detune'], first['oscillators'][1]['detune']]
+
+    # Derived classes have their own prototype
+    layers = [Layer(voices), Layer(voices)]
+    assert init_calls == [first, layers[0]]
+    assert layers[1]['mix'].path() == 'root.voices[3].mix'
+
+    # Stamped nodes are the same as those from init_custom
+    clear_prototypes(Voice)
+    recorded = Voice(None, 'voice')
+    stamped = Voice(None, 'voice')
+    assert init_calls[-1] is recorded
+    registry = JsonRegistry([Voice, Oscillator])
+    assert registry.export_json(stamped) == registry.export_json(recorded)
+
+
+def test_cache_prototype_indices_and_observers():
+    class ChangeLog(Observer):
+        def __init__(self):
+            self.log = []
+
+        def on_add_child(self, node):
+            self.log.append(node.path())
+
+        def on_set_sources(self, inputs):
+            self.log.append([value.path() for value in inputs])
+
+    clear_prototypes(Voice)
+    root = Node(None, 'root')
+    Voice(root, 'first')
+    index = path_index(root)
+    assert nodes_of_type(root, Oscillator) == [root['first']['oscillators'][0], root['first']['oscillators'][1]]
+
+    log = ChangeLog()
+    add_observer(log)
+    try:
+        with Transaction() as transaction:
+            second = Voice(root, 'second')
+    finally:
+        remove_observer(log)
+    assert log.log == [
+        'root.second', 'root.second.gain', 'root.second.out', 'root.second.samples', 'root.second.oscillators',
+        ['root.second.oscillators[0].detune', 'root.second.oscillators[1].detune']
+    ]
+    assert index['root.second.oscillators[1].detune'] is second['oscillators'][1]['detune']
+    assert len(nodes_of_type(root, Oscillator)) == 4
+
+    transaction.undo()
+    assert 'root.second.oscillators[1].detune' not in index
+    assert len(nodes_of_type(root, Oscillator)) == 2
+
+
+def test_cache_prototype_external_sources():
+    root = Node(None, 'root')
+    OutputFloat(root, 'lfo')
+
+    @cache_prototype
+    class External(Node):
+        def init_custom(self):
+            InputFloat(self, 'gain') << self.parent['lfo']
+
+    External(root, 'first')
+    second = External(root, 'second')
+    assert second['gain'].source() is root['lfo']
+    assert External._prototypes.prototypes == {External: None}
+
+    with pytest.raises(NodeException, match='not a custom node'):
+        cache_prototype(InputFloat)
@@ -0,0 +1,115 @@
+import pytest
+
+from noddb.json import JsonRegistry
+from noddb.node import Node, NodeArray
+from noddb.query import QueryException, query
+from noddb.std_value import InputFloat, InputInt, OutputFloat
+
+
+class Voice(Node):
+    def init_custom(self):
+        InputFloat(self, 'gain', 1.0)
+        osc = Node(self, 'osc')
+        InputFloat(osc, 'gain', 0.5)
+        InputInt(osc, 'octave')
+        OutputFloat(self, 'level')
+
+
+def build_synth():
+    root = Node(None, 'root')
+    voices = NodeArray(root, 'voices')
+    for _ in range(4):
+        Voice(voices)
+    InputFloat(root, 'gain', 0.8)
+    return root
+
+
+def paths(nodes):
+    return [node.path() for node in nodes]
+
+
+def test_query_literal():
+    root = build_synth()
+    assert paths(query(root, 'voices[1].osc.gain')) == ['root.voices[1].osc.gain']
+    assert paths(query({'root': root}, 'root.gain')) == ['root.gain']
+    assert paths(query(root, 'voices[4].gain')) == []
+    assert paths(query(root, 'missing.gain')) == []
+    assert paths(query(root, 'gain[0]')) == []
+
+    # Negative indices count from the end of an array
+    assert paths(query(root, 'voices[-1].gain')) == ['root.voices[3].gain']
+    assert paths(query(root, 'voices[-5].gain')) == []
+    assert paths(query(root, '**.voices[-2]')) == ['root.voices[2]']
+
+    # Nodes in a dict are matched relative to themselves, even if they are not roots
+    voice = root['voices'][1]
+    assert paths(query({'root': voice}, 'root.gain')) == ['root.voices[1].gain']
+    assert paths(query({'voice': voice}, 'voice.osc.*')) == ['root.voices[1].osc.gain', 'root.voices[1].osc.octave']
+
+
+def test_query_wildcards():
+    root = build_synth()
+    assert paths(query(root, 'voices[*].gain')) == [f'root.voices[{index}].gain' for index in range(4)]
+    assert paths(query(root, 'voices[1:3].osc.*')) == [
+        'root.voices[1].osc.gain',
+        'root.voices[1].osc.octave',
+        'root.voices[2].osc.gain',
+        'root.voices[2].osc.octave'
+    ]
+    assert paths(query(root, 'voices[:1].*')) == [
+        'root.voices[0].gain',
+        'root.voices[0].osc',
+        'root.voices[0].level'
+    ]
+    assert paths(query(root, 'voices[3:].o*')) == ['root.voices[3].osc']
+    assert paths(query({'root': root}, '*.gain')) == ['root.gain']
+
+    # Wildcard names do not match array elements, and indices do not match named children
+    assert paths(query(root, '*.gain')) == []
+    assert paths(query(root, 'voices.*')) == []
+    assert paths(query(root, '[*]')) == []
+
+
+def test_query_descendants():
+    root = build_synth()
+    assert paths(query(root, 'voices[2].**.gain')) == ['root.voices[2].gain', 'root.voices[2].osc.gain']
+    assert paths(query(root, '**.gain', type=InputFloat)) == [
+        'root.voices[0].gain',
+        'root.voices[0].osc.gain',
+        'root.voices[1].gain',
+        'root.voices[1].osc.gain',
+        'root.voices[2].gain',
+        'root.voices[2].osc.gain',
+        'root.voices[3].gain',
+        'root.voices[3].osc.gain',
+        'root.gain'
+    ]
+    assert paths(query(root, 'voices[0].**', type=(InputInt, OutputFloat))) == [
+        'root.voices[0].osc.octave',
+        'root.voices[0].level'
+    ]
+    assert paths(query(root, 'voices[0].**')) == paths(query(root, 'voices[0].**.**'))
+    assert len(list(query(root, '**.*.**', type=Voice))) == 4
+
+    # Results are found lazily
+    results = query(root, '**', type=InputFloat)
+    assert next(results).path() == 'root.voices[0].gain'
+
+
+def test_query_lazy_import():
+    registry = JsonRegistry([Voice])
+    nodes = registry.import_json(registry.export_json(build_synth()), lazy=True)
+    assert paths(query(nodes, 'root.voices[1:3].osc.gain')) == ['root.voices[1].osc.gain', 'root.voices[2].osc.gain']
+    assert paths(query(nodes, 'root.voices[3].osc.gain')) == ['root.voices[3].osc.gain']
+
+
+def test_query_bad_patterns():
+    root = build_synth()
+    for pattern, message in [
+        ('voices[*', 'Unclosed bracket'),
+        ('voices[x]', "Invalid index '\\[x\\]'"),
+        ('voices..gain', 'Empty name'),
+        ('voices.a**', "'\\*\\*' must be a whole name")
+    ]:
+        with pytest.raises(QueryException, match=message):
+            list(query(root, pattern))
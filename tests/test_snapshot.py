@@ -0,0 +1,132 @@
+import struct
+
+import pytest
+from pytest import approx
+
+from noddb.json import JsonRegistry
+from noddb.node import Node, NodeArray
+from noddb.observer import Observer, add_observer, remove_observer
+from noddb.snapshot import _HEADER, SnapshotException, load_snapshot, save_snapshot
+from noddb.std_value import InputBool, InputFloat, InputInt, InputString, OutputBool, OutputFloat, OutputInt
+from noddb.std_value import InputFloatArray, OutputIntArray
+
+
+def build_graph():
+    foo = Node(None, 'foo')
+    x = OutputBool(foo, 'x', True)
+    bar = NodeArray(foo, 'bar')
+    y = OutputInt(bar, None, -3)
+    etc = Node(bar)
+    z = InputInt(etc, 'z', 5)
+    InputString(etc, 'text', 'héllo')
+    InputFloat(etc, 'gain', 0.25)
+    OutputFloat(etc, 'level', 1e300)
+    InputFloatArray(etc, 'bank', [1.5, -2.5])
+    OutputIntArray(etc, 'counts', [1 << 40, -1])
+    InputBool(etc, 'flag')
+    y >> z
+    x >> InputBool(foo, 'follow')
+    return foo
+
+
+def test_snapshot_round_trip(tmp_path):
+    foo = build_graph()
+    path = tmp_path / 'foo.snapshot'
+    save_snapshot(foo, path)
+
+    restored = JsonRegistry().import_json(JsonRegistry().export_json(build_graph()))['foo']
+    restored['bar'][1]['text'].set_value('')
+    restored['bar'][1]['bank'].set_value([])
+    restored['bar'][1]['level'].set_value(0.0)
+    load_snapshot(restored, path)
+
+    registry = JsonRegistry()
+    assert registry.export_json(restored) == registry.export_json(foo)
+    assert restored['bar'][1]['text'].value() == 'héllo'
+    assert restored['bar'][1]['bank'].value().tolist() == approx([1.5, -2.5])
+    assert restored['bar'][1]['counts'].value().tolist() == [1 << 40, -1]
+    assert restored['bar'][1]['flag'].value() is False
+    assert restored['follow'].value() is True
+
+
+def test_snapshot_push_and_observers(tmp_path):
+    root = Node(None, 'root')
+    out = OutputInt(root, 'out', 7)
+    inp = InputInt(root, 'inp')
+    out >> inp
+    out.set_push(True)
+    path = tmp_path / 'root.snapshot'
+    save_snapshot(root, path)
+    out.set_value(0)
+
+    class Recorder(Observer):
+        def __init__(self):
+            self.changes = []
+
+        def on_set_value(self, value, old_value):
+            self.changes.append((value.path(), old_value))
+
+    recorder = Recorder()
+    add_observer(recorder)
+    try:
+        load_snapshot(root, path)
+    finally:
+        remove_observer(recorder)
+
+    assert inp._value == 7
+    assert recorder.changes == [('root.out', 0)]
+
+
+def test_snapshot_mismatched_topology(tmp_path):
+    path = tmp_path / 'foo.snapshot'
+    save_snapshot(build_graph(), path)
+
+    other = build_graph()
+    InputInt(other, 'extra')
+    with pytest.raises(SnapshotException, match='does not match the topology'):
+        load_snapshot(other, path)
+
+    other = build_graph()
+    other['follow'].clear_source()
+    with pytest.raises(SnapshotException, match='does not match the topology'):
+        load_snapshot(other, path)
+
+    with open(path, 'r+b') as fp:
+        fp.truncate(100)
+    with pytest.raises(SnapshotException, match='truncated'):
+        load_snapshot(build_graph(), path)
+
+
+def test_snapshot_errors(tmp_path):
+    path = tmp_path / 'bad.snapshot'
+    path.write_bytes(b'not a snapshot' * 8)
+    with pytest.raises(SnapshotException, match='NODDBSNP header'):
+        load_snapshot(build_graph(), path)
+
+    root = Node(None, 'root')
+    OutputInt(root, 'big', 1 << 64)
+    with pytest.raises(SnapshotException, match='does not fit in 64 bits'):
+        save_snapshot(root, path)
+
+
+def test_snapshot_corrupt_heap(tmp_path):
+    def build_strings():
+        root = Node(None, 'root')
+        InputString(root, 's', 'hi')
+        InputFloatArray(root, 'a', [1.0])
+        return root
+
+    path = tmp_path / 'corrupt.snapshot'
+    save_snapshot(build_strings(), path)
+    data = path.read_bytes()
+
+    # Two values, so the slots follow the kind column padded to 8 bytes, then the lengths and heap
+    slots_start = _HEADER.size + 8
+    heap_start = slots_start + 32
+    path.write_bytes(data[:slots_start] + struct.pack('=q', 1000) + data[slots_start + 8:])
+    with pytest.raises(SnapshotException, match='out of bounds'):
+        load_snapshot(build_strings(), path)
+
+    path.write_bytes(data[:heap_start + 8] + b'Z' + data[heap_start + 9:])
+    with pytest.raises(SnapshotException, match='invalid value for "root.a"'):
+        load_snapshot(build_strings(), path)
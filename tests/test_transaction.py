@@ -0,0 +1,208 @@
+import pytest
+
+from noddb.bulk import set_values
+from noddb.index import nodes_of_type
+from noddb.json import JsonRegistry
+from noddb.node import Node, NodeArray
+from noddb.path import path_index
+from noddb.std_value import InputFloat, InputFloatArray, InputInt, OutputFloat, OutputInt
+from noddb.transaction import History, Transaction, TransactionException
+
+
+class Voice(Node):
+    def init_custom(self):
+        OutputFloat(self, 'out')
+        InputFloat(self, 'gain', 1.0)
+        self['gain'] << self['out']
+
+
+def create_nodes():
+    root = Node(None, 'root')
+    InputInt(root, 'a', 1)
+    InputFloat(root, 'b')
+    OutputInt(root, 'out', 7)
+    NodeArray(root, 'voices')
+    return root
+
+
+def test_undo_redo_values():
+    root = create_nodes()
+    registry = JsonRegistry()
+    before = registry.export_json(root)
+
+    with Transaction('Edit') as transaction:
+        root['a'].set_value(2)
+        root['a'].set_value(3)
+        root['b'].set_value(0.5)
+        set_values(root, {'a': 4})
+    # Consecutive sets of the same value are recorded as one operation
+    assert len(transaction) == 3
+    after = registry.export_json(root)
+
+    transaction.undo()
+    assert registry.export_json(root) == before
+    transaction.redo()
+    assert registry.export_json(root) == after
+
+
+def test_undo_redo_sources():
+    root = create_nodes()
+    registry = JsonRegistry()
+    before = registry.export_json(root)
+
+    with Transaction() as transaction:
+        root['a'] << root['out']
+        assert root['a'].value() == 7
+    transaction.undo()
+    assert not root['a'].is_sourced()
+    assert root['a'].value() == 1
+    assert registry.export_json(root) == before
+
+    transaction.redo()
+    assert root['a'].source() is root['out']
+
+    # The value before connecting a push-mode output is also restored
+    root['out'].set_push(True)
+    root['a'].clear_source()
+    root['a'].set_value(2)
+    with Transaction() as transaction:
+        root['out'] >> root['a']
+        root['out'].set_value(8)
+        assert root['a'].value() == 8
+    transaction.undo()
+    assert not root['a'].is_sourced()
+    assert root['a'].value() == 2
+    assert root['out'].value() == 7
+
+
+def test_undo_redo_elements():
+    root = Node(None, 'root')
+    samples = InputFloatArray(root, 'samples', [0.0] * 4)
+
+    with Transaction() as transaction:
+        samples.set_element(1, 0.5)
+        samples.set_value([1.0, 2.0])
+        samples.set_element(0, 3.0)
+    assert samples.value().tolist() == [3.0, 2.0]
+
+    transaction.undo()
+    assert samples.value().tolist() == [0.0] * 4
+    transaction.redo()
+    assert samples.value().tolist() == [3.0, 2.0]
+
+
+def test_undo_redo_nodes():
+    root = create_nodes()
+    voices = root['voices']
+    Voice(voices)
+    path_index(root)
+    nodes_of_type(root, Voice)
+    registry = JsonRegistry([Voice])
+    before = registry.export_json(root)
+
+    with Transaction() as transaction:
+        voice = Voice(voices)
+        voice['gain'].clear_source()
+        voice['gain'].set_value(0.5)
+        extra = InputInt(root, 'extra')
+        root['a'].set_value(5)
+    after = registry.export_json(root)
+
+    transaction.undo()
+    assert registry.export_json(root) == before
+    assert voices.children == [voices[0]]
+    assert 'root.voices[1]' not in path_index(root)
+    assert 'root.extra' not in path_index(root)
+    assert nodes_of_type(root, Voice) == [voices[0]]
+
+    transaction.redo()
+    assert registry.export_json(root) == after
+    assert voices[1] is voice
+    assert root['extra'] is extra
+    assert path_index(root)['root.voices[1].gain'] is voice['gain']
+    assert nodes_of_type(root, Voice) == [voices[0], voice]
+
+
+def test_undo_removal_order():
+    root = Node(None, 'root')
+    array = NodeArray(root, 'array')
+    Node(root, 'a')
+    Node(array)
+    history = History()
+    with history.transaction():
+        b = Node(root, 'b')
+        element = Node(array)
+        InputInt(element, 'x')
+
+    # Siblings added outside the history follow the nodes it will remove
+    c = Node(root, 'c')
+    last = Node(array)
+
+    with Transaction() as transaction:
+        history.undo()
+    assert list(root._child_dict) == ['array', 'a', 'c']
+    assert array.children == [array[0], last]
+    assert last.path() == 'root.array[1]'
+
+    # Undoing the removal restores the nodes where they were rather than at the end
+    transaction.undo()
+    assert list(root._child_dict) == ['array', 'a', 'b', 'c']
+    assert root['b'] is b and root['c'] is c
+    assert array.children[1:] == [element, last]
+    assert element['x'].path() == 'root.array[1].x'
+    assert last.path() == 'root.array[2]'
+    assert path_index(root)['root.array[2]'] is last
+
+    transaction.redo()
+    assert list(root._child_dict) == ['array', 'a', 'c']
+    assert path_index(root)['root.array[1]'] is last
+
+
+def test_rollback():
+    root = create_nodes()
+    with pytest.raises(KeyError):
+        with Transaction() as transaction:
+            root['a'].set_value(2)
+            Voice(root['voices'])
+            raise KeyError('fail')
+    assert root['a'].value() == 1
+    assert root['voices'].children == []
+    assert len(transaction) == 0
+
+
+def test_history():
+    root = create_nodes()
+    history = History(limit=2)
+    assert not history.can_undo()
+
+    for value in (2, 3, 4):
+        with history.transaction(f'Set {value}'):
+            root['a'].set_value(value)
+
+            # Nested transactions are part of the outer transaction
+            with history.transaction('Nested'):
+                root['b'].set_value(float(value))
+
+    assert history.undo().name == 'Set 4'
+    assert root['a'].value() == 3
+    assert history.undo().name == 'Set 3'
+    assert root['a'].value() == 2
+    assert root['b'].value() == 2.0
+    assert not history.can_undo()
+    with pytest.raises(TransactionException, match='Nothing to undo'):
+        history.undo()
+
+    assert history.redo().name == 'Set 3'
+    assert root['a'].value() == 3
+
+    # A new transaction clears the redo stack, and empty transactions are not added
+    with history.transaction('Set 5'):
+        root['a'].set_value(5)
+    with history.transaction('Empty'):
+        pass
+    assert not history.can_redo()
+    assert history.undo().name == 'Set 5'
+
+    with history.transaction('Open'):
+        with pytest.raises(TransactionException, match='whilst a transaction is open'):
+            history.undo()
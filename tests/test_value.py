@@ -1,6 +1,7 @@
 import pytest
 from noddb.value import InputValue, OutputValue, ValueException
-from noddb.node import Node
+from noddb.node import Node, NodeException
+from noddb.std_value import InputInt
 
 
 def test_input_value():
@@ -122,3 +123,60 @@ def test_connect():
     n['a'] >> n['b']
     assert b.source() == a
     assert b.value() == 'stuff'
+
+
+def test_dependents():
+    n = Node(None, 'n')
+    a = OutputValue(n, 'a', 1)
+    b = InputValue(n, 'b', 2)
+    c = InputValue(n, 'c', 3)
+    assert a.dependents() == []
+
+    a >> b
+    a >> c
+    assert a.dependents() == [b, c]
+
+    b.clear_source()
+    assert a.dependents() == [c]
+    c.clear_source()
+    assert a.dependents() == []
+
+
+def test_push_mode():
+    n = Node(None, 'n')
+    a = OutputValue(n, 'a', 1)
+    b = InputValue(n, 'b', 2)
+    a >> b
+    assert a.is_push() is False
+
+    a.set_push(True)
+    assert a.is_push() is True
+    assert b._value == 1
+
+    a.set_value(5)
+    assert b._value == 5
+    assert b.value() == 5
+
+    c = InputValue(n, 'c', 3)
+    a >> c
+    assert c._value == 5
+
+    a.set_push(False)
+    a.set_value(7)
+    assert b._value == 5
+    assert b.value() == 7
+
+
+def test_value_is_leaf():
+    n = Node(None, 'n')
+    a = InputInt(n, 'a')
+    assert not hasattr(a, '__dict__')
+    assert a.children == []
+
+    with pytest.raises(NodeException) as excinfo:
+        Node(a, 'b')
+    assert str(excinfo.value) == 'Values cannot have children: Node added to n.a'
+
+    with pytest.raises(NodeException) as excinfo:
+        a['b']
+    assert str(excinfo.value) == "Value n.a does not have child 'b'"
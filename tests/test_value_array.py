@@ -0,0 +1,152 @@
+from array import array
+
+import pytest
+from pytest import approx
+
+from noddb.evaluate import Evaluator
+from noddb.json import JsonRegistry
+from noddb.node import Node, NodeException
+from noddb.path import path_to_node
+from noddb.std_value import InputFloatArray, InputIntArray, OutputFloatArray, OutputIntArray
+from noddb.value import ValueException
+from noddb.visitor import Visitor
+
+
+def test_value_array():
+    root = Node(None, 'root')
+    gains = InputFloatArray(root, 'gains', [0.5, 1.0, 2.0])
+    assert gains.typecode == 'd'
+    assert len(gains.value()) == 3
+    assert gains.value() == array('d', [0.5, 1.0, 2.0])
+
+    gains.set_value([3.0, 4.0])
+    assert gains.value().tolist() == [3.0, 4.0]
+
+    gains[1].set_value(5.0)
+    assert gains[1].value() == 5.0
+    assert gains[1].path() == 'root.gains[1]'
+    assert path_to_node(root, 'gains[1]') == gains[1]
+    assert path_to_node(root, 'gains[1]').value() == 5.0
+
+    view = gains.buffer()
+    view[0] = 9.0
+    assert gains.value().tolist() == [9.0, 5.0]
+
+    with pytest.raises(ValueException) as excinfo:
+        gains.set_value(['a'])
+    assert str(excinfo.value) == "Cannot set \"root.gains\" (array('d')) to mismatched value ['a'] (list)"
+
+    with pytest.raises(ValueException) as excinfo:
+        gains[0].set_value(1)
+    assert str(excinfo.value) == 'Cannot set "root.gains[0]" (float) to mismatched value 1 (int)'
+
+    with pytest.raises(NodeException) as excinfo:
+        gains[2]
+    assert str(excinfo.value) == 'ValueArray bounds error: 2 is not in 0-2 for root.gains'
+
+    counts = InputIntArray(root, 'counts', [1])
+    with pytest.raises(ValueException) as excinfo:
+        counts.set_value([1 << 64])
+    assert str(excinfo.value) == f"Cannot set \"root.counts\" (array('q')) to mismatched value [{1 << 64}] (list)"
+    with pytest.raises(ValueException, match='out of range'):
+        counts[0].set_value(1 << 64)
+    assert counts.value().tolist() == [1]
+
+
+def test_value_array_source():
+    root = Node(None, 'root')
+    a = OutputIntArray(root, 'a', [1, 2])
+    b = InputIntArray(root, 'b')
+    c = InputFloatArray(root, 'c')
+
+    a >> b
+    assert b.value().tolist() == [1, 2]
+    a[0].set_value(7)
+    assert b[0].value() == 7
+
+    with pytest.raises(ValueException) as excinfo:
+        b[0].set_value(3)
+    assert str(excinfo.value) == 'Cannot set "root.b[0]" whilst sourced from "root.a"'
+
+    with pytest.raises(ValueException) as excinfo:
+        a >> c
+    assert str(excinfo.value) == "Cannot source \"root.c\" (array('d')) to mismatched output \"root.a\" (array('q'))"
+
+    # Disconnected inputs keep a copy of the output's last value
+    b.clear_source()
+    b[1].set_value(8)
+    assert a.value().tolist() == [7, 2]
+    assert b.value().tolist() == [7, 8]
+
+
+def test_value_array_json():
+    root = Node(None, 'root')
+    InputFloatArray(root, 'gains', [0.5, 1.0])
+    OutputIntArray(root, 'counts', [3])
+    InputIntArray(root, 'sourced')
+    root['counts'] >> root['sourced']
+
+    registry = JsonRegistry()
+    exported = registry.export_json(root)
+    assert exported == {
+        'nodes': {
+            'root': {
+                'gains': 'InputFloatArray',
+                'counts': 'OutputIntArray',
+                'sourced': 'InputIntArray'
+            }
+        },
+        'values': {
+            'root.gains': approx([0.5, 1.0]),
+            'root.counts': [3]
+        },
+        'sources': {
+            'root.sourced': 'root.counts'
+        }
+    }
+
+    nodes = registry.import_json(exported)
+    assert type(nodes['root']['gains']) == InputFloatArray
+    assert nodes['root']['gains'].value().tolist() == approx([0.5, 1.0])
+    assert nodes['root']['sourced'].value().tolist() == [3]
+
+
+def test_value_array_visit_and_evaluate():
+    class ScaleNode(Node):
+        def init_custom(self):
+            InputFloatArray(self, 'x')
+            OutputFloatArray(self, 'y')
+
+        def evaluate(self):
+            self['y'].set_value([value * 2.0 for value in self['x'].value()])
+
+    class CountArrays(Visitor):
+        def __init__(self):
+            self.inputs = 0
+            self.outputs = 0
+
+        def on_input(self, value):
+            self.inputs += 1
+
+        def on_output(self, value):
+            self.outputs += 1
+
+    root = Node(None, 'root')
+    first = ScaleNode(root, 'first')
+    second = ScaleNode(root, 'second')
+    first['y'] >> second['x']
+
+    counter = CountArrays()
+    root.visit(counter)
+    assert counter.inputs == 2
+    assert counter.outputs == 2
+
+    with Evaluator(root, incremental=True) as evaluator:
+        evaluator.run()
+        first['x'].set_value([1.0, 2.0])
+        evaluator.evaluate_dirty()
+        assert second['y'].value().tolist() == [4.0, 8.0]
+
+        first['x'][0].set_value(3.0)
+        evaluator.evaluate_dirty()
+        assert second['y'].value().tolist() == [12.0, 8.0]
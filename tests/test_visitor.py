@@ -1,6 +1,10 @@
-from noddb.node import Node, NodeArray
+import sys
+
+import pytest
+
+from noddb.node import Node, NodeArray, NodeException, walk
 from noddb.value import InputValue, OutputValue
-from noddb.visitor import Visitor
+from noddb.visitor import PRUNE, Visitor
 
 
 def test_visit_values():
@@ -121,3 +125,189 @@ def test_visit_containers():
         'exit_array:root_array[2]',
         'exit_array:root_array'
     ]
+
+
+class LogVisits(Visitor):
+    def __init__(self):
+        self.log = []
+
+    def on_node_enter(self, node: Node):
+        self.log.append(f'enter:{node.path()}')
+
+    def on_node_exit(self, node: Node):
+        self.log.append(f'exit:{node.path()}')
+
+    def on_node_array_enter(self, node: Node):
+        self.log.append(f'enter_array:{node.path()}')
+
+    def on_node_array_exit(self, node: Node):
+        self.log.append(f'exit_array:{node.path()}')
+
+    def on_input(self, value: InputValue):
+        self.log.append(f'input:{value.path()}')
+
+    def on_output(self, value: OutputValue):
+        self.log.append(f'output:{value.path()}')
+
+
+def test_visit_overridden():
+    class Hidden(Node):
+        # Custom visit that reports itself but not its children
+        def visit(self, visitor: Visitor):
+            visitor.on_node_enter(self)
+
+    class Wrapped(NodeArray):
+        def visit(self, visitor: Visitor):
+            visitor.on_node_enter(self)
+            super().visit(visitor)
+
+    class Flagged(InputValue):
+        def visit(self, visitor: Visitor):
+            visitor.on_output(self)
+
+    class Custom(Node):
+        def init_custom(self):
+            InputValue(self, 'x', 1)
+
+    root = Node(None, 'root')
+    InputValue(Hidden(root, 'hidden'), 'x', 1)
+    wrapped = Wrapped(root, 'wrapped')
+    Flagged(Node(wrapped), 'flag', True)
+    Custom(wrapped)
+
+    logger = LogVisits()
+    root.visit(logger)
+    assert logger.log == [
+        'enter:root',
+        'enter:root.hidden',
+        'enter:root.wrapped',
+        'enter_array:root.wrapped',
+        'enter:root.wrapped[0]',
+        'output:root.wrapped[0].flag',
+        'exit:root.wrapped[0]',
+        'enter:root.wrapped[1]',
+        'input:root.wrapped[1].x',
+        'exit:root.wrapped[1]',
+        'exit_array:root.wrapped',
+        'exit:root'
+    ]
+
+
+def test_visit_deep():
+    depth = sys.getrecursionlimit() * 2
+    root = Node(None, 'root')
+    node = root
+    for _ in range(depth):
+        node = Node(NodeArray(node, 'a'))
+    InputValue(node, 'x', 0)
+
+    logger = LogVisits()
+    root.visit(logger)
+    assert len(logger.log) == depth * 4 + 3
+    assert logger.log[-depth * 2 - 2].startswith('input:root.a[0].a[0]')
+    assert sum(1 for _ in walk(root)) == depth * 2 + 2
+
+
+def test_walk():
+    root = Node(None, 'root')
+    foo = Node(root, 'foo')
+    InputValue(foo, 'x', True)
+    bar = NodeArray(root, 'bar')
+    OutputValue(Node(bar), 'y', False)
+    InputValue(bar, None, 0)
+
+    assert [(node.path(), depth) for node, depth in walk(root)] == [
+        ('root', 0),
+        ('root.foo', 1),
+        ('root.foo.x', 2),
+        ('root.bar', 1),
+        ('root.bar[0]', 2),
+        ('root.bar[0].y', 3),
+        ('root.bar[1]', 2)
+    ]
+
+    assert [(node.path(), depth) for node, depth in walk(root, order='post')] == [
+        ('root.foo.x', 2),
+        ('root.foo', 1),
+        ('root.bar[0].y', 3),
+        ('root.bar[0]', 2),
+        ('root.bar[1]', 2),
+        ('root.bar', 1),
+        ('root', 0)
+    ]
+
+    assert list(walk(foo['x'])) == [(foo['x'], 0)]
+    assert list(walk(foo['x'], order='post')) == [(foo['x'], 0)]
+
+    with pytest.raises(NodeException, match="Unknown walk order 'in'"):
+        list(walk(root, order='in'))
+
+
+def test_visit_skips_callbacks(monkeypatch):
+    def not_overridden(self, node):
+        raise AssertionError('Callbacks that are not overridden should not be called')
+
+    for name in ('on_node_enter', 'on_node_exit', 'on_node_array_enter', 'on_node_array_exit', 'on_output'):
+        monkeypatch.setattr(Visitor, name, not_overridden)
+
+    class InputsOnly(Visitor):
+        def __init__(self):
+            self.paths = []
+
+        def on_input(self, value: InputValue):
+            self.paths.append(value.path())
+
+    root = Node(None, 'root')
+    InputValue(Node(NodeArray(root, 'a')), 'x', 0)
+    OutputValue(root, 'y', 0)
+    InputValue(root, 'z', 0)
+
+    visitor = InputsOnly()
+    root.visit(visitor)
+    assert visitor.paths == ['root.a[0].x', 'root.z']
+
+    # Callbacks may also be overridden on the instance
+    outputs = []
+    visitor.on_output = outputs.append
+    root.visit(visitor)
+    assert outputs == [root['y']]
+
+
+def test_visit_prune():
+    class PruneNamed(LogVisits):
+        def __init__(self, names):
+            super().__init__()
+            self.names = names
+
+        def on_node_enter(self, node: Node):
+            super().on_node_enter(node)
+            if node.name in self.names:
+                return PRUNE
+
+        def on_node_array_enter(self, node: Node):
+            super().on_node_array_enter(node)
+            if node.name in self.names:
+                return PRUNE
+
+    root = Node(None, 'root')
+    foo = Node(root, 'foo')
+    InputValue(Node(foo, 'etc'), 'x', 0)
+    bar = NodeArray(root, 'bar')
+    Node(bar)
+    OutputValue(root, 'y', 0)
+
+    logger = PruneNamed({'foo', 'bar'})
+    root.visit(logger)
+    assert logger.log == [
+        'enter:root',
+        'enter:root.foo',
+        'exit:root.foo',
+        'enter_array:root.bar',
+        'exit_array:root.bar',
+        'output:root.y',
+        'exit:root'
+    ]
+
+    logger = PruneNamed({'root'})
+    root.visit(logger)
+    assert logger.log == ['enter:root', 'exit:root']